@@ -3,6 +3,8 @@
 Classifier is an image classifier specialization of Net.
 """
 
+from itertools import islice
+
 import numpy as np
 
 import caffe
@@ -50,7 +52,8 @@ class Classifier(caffe.Net):
 
         Parameters
         ----------
-        inputs : iterable of (H x W x K) input ndarrays.
+        inputs : iterable of (H x W x K) input ndarrays; it is consumed
+            one batch at a time.
         oversample : boolean
             average predictions across center, corners, and mirrors
             when True (default). Center-only prediction when False.
@@ -60,38 +63,72 @@ class Classifier(caffe.Net):
         predictions: (N x C) ndarray of class probabilities for N images and C
             classes.
         """
-        # Scale to standardize input dimensions.
-        input_ = np.zeros((len(inputs),
-                           self.image_dims[0],
-                           self.image_dims[1],
-                           inputs[0].shape[2]),
-                          dtype=np.float32)
-        for ix, in_ in enumerate(inputs):
-            input_[ix] = caffe.io.resize_image(in_, self.image_dims)
-
-        if oversample:
-            # Generate center, corner, and mirrored crops.
-            input_ = caffe.io.oversample(input_, self.crop_dims)
-        else:
-            # Take center crop.
-            center = np.array(self.image_dims) / 2.0
-            crop = np.tile(center, (1, 2))[0] + np.concatenate([
-                -self.crop_dims / 2.0,
-                self.crop_dims / 2.0
-            ])
-            input_ = input_[:, crop[0]:crop[2], crop[1]:crop[3], :]
-
-        # Classify
-        caffe_in = np.zeros(np.array(input_.shape)[[0, 3, 1, 2]],
-                            dtype=np.float32)
-        for ix, in_ in enumerate(input_):
-            caffe_in[ix] = self.transformer.preprocess(self.inputs[0], in_)
-        out = self.forward_all(**{self.inputs[0]: caffe_in})
-        predictions = out[self.outputs[0]]
-
-        # For oversampling, average predictions across crops.
-        if oversample:
-            predictions = predictions.reshape((len(predictions) / 10, 10, -1))
-            predictions = predictions.mean(1)
-
-        return predictions
+        in_ = self.inputs[0]
+        n_crops = 10 if oversample else 1
+        channel_swap, scale, channel_offset, offset = \
+            self.transformer.fold(in_)
+
+        # Crops are written straight into the input blob, so a batch holds
+        # whole images: the blob is resized if its batch size is not a
+        # multiple of the number of crops per image.
+        in_shape = self.blobs[in_].data.shape
+        n_images = max(in_shape[0] // n_crops, 1)
+        reshape = n_images * n_crops != in_shape[0]
+        if reshape:
+            self.blobs[in_].reshape(n_images * n_crops, *in_shape[1:])
+            self.reshape()
+        caffe_in = self.blobs[in_].data
+
+        crop_y, crop_x = (np.array(self.image_dims) / 2.0 -
+                          self.crop_dims / 2.0).astype(int)
+        crop_h, crop_w = self.crop_dims
+        # Only the center crop is interpolated when not oversampling; the
+        # pixels are the same as those of resize_image() followed by the
+        # crop.
+        window = None if oversample else (crop_y, crop_x, crop_h, crop_w)
+        inputs = iter(inputs)
+        predictions = []
+        try:
+            while True:
+                batch_inputs = list(islice(inputs, n_images))
+                if not batch_inputs:
+                    break
+                # Scale to standardize input dimensions.
+                images = caffe.io.resize_images(batch_inputs, self.image_dims,
+                                                crop=window)
+                n = len(images)
+
+                # Swap, scale and center the channels before cropping: every
+                # pixel is touched once here instead of once per crop.
+                if channel_swap is not None:
+                    images = images[..., channel_swap]
+                if scale != 1:
+                    images *= scale
+                if channel_offset.any():
+                    images -= channel_offset
+
+                batch = caffe_in[:n * n_crops]
+                if oversample:
+                    # Generate center, corner, and mirrored crops.
+                    caffe.io.oversample(images, self.crop_dims, out=batch,
+                                        channels_first=True)
+                else:
+                    batch[...] = images.transpose(0, 3, 1, 2)
+                if offset is not None:
+                    batch -= offset
+
+                # Classify
+                out = self.forward()[self.outputs[0]][:n * n_crops]
+
+                # For oversampling, average predictions across crops. The
+                # crops of an image are adjacent in the output blob, so this
+                # is one reduction from blob memory.
+                predictions.append(np.mean(
+                    out.reshape((n, n_crops, -1)), axis=1).reshape(
+                        (n,) + out.shape[1:]))
+        finally:
+            if reshape:
+                self.blobs[in_].reshape(*in_shape)
+                self.reshape()
+
+        return np.concatenate(predictions)
@@ -0,0 +1,328 @@
+"""
+Caffe network cost analysis: estimate the compute and memory needs of the
+NetParameter protobuffer.
+
+The layers are walked with get_net_layers(), which caffe.draw also uses to
+draw the net, inferring the shape of every blob from the net input shapes.
+For every layer the FLOPs of a forward pass (multiply-adds count as two),
+the bytes of its parameter blobs and the bytes of the top blobs it
+allocates are reported; in-place layers allocate nothing. A backward pass
+costs about twice the forward FLOPs and doubles the activation bytes for
+the diffs.
+"""
+
+from collections import namedtuple
+import numpy as np
+
+from caffe.proto import caffe_pb2
+
+# V1 layer type names that do not follow the CamelCase rule.
+_V1_TYPE_NAMES = {
+    'ABSVAL': 'AbsVal',
+    'ARGMAX': 'ArgMax',
+    'BNLL': 'BNLL',
+    'HDF5_DATA': 'HDF5Data',
+    'HDF5_OUTPUT': 'HDF5Output',
+    'IM2COL': 'Im2col',
+    'LRN': 'LRN',
+    'MVN': 'MVN',
+    'RELU': 'ReLU',
+    'SOFTMAX_LOSS': 'SoftmaxWithLoss',
+    'TANH': 'TanH',
+}
+
+# Layers computing one value per input value.
+ELEMENTWISE_LAYER_TYPES = ('AbsVal', 'BNLL', 'Dropout', 'Exp', 'Log', 'Power',
+                           'PReLU', 'ReLU', 'Sigmoid', 'TanH', 'Threshold')
+
+LayerCost = namedtuple('LayerCost', ['name', 'type', 'top_shapes', 'flops',
+                                     'param_bytes', 'activation_bytes'])
+
+
+def get_v1_type_name(layer_type):
+    """Get the layer type string of a V1LayerParameter type enum value.
+    """
+    name = caffe_pb2.V1LayerParameter.LayerType.Name(layer_type)
+    if name in _V1_TYPE_NAMES:
+        return _V1_TYPE_NAMES[name]
+    return ''.join(word.capitalize() for word in name.split('_'))
+
+
+def upgrade_v1_net(caffe_net):
+    """Convert the V1 `layers` of a net to `layer` entries.
+
+    Only the structure is converted: names, blobs and the layer parameters
+    shared by both formats. This is enough to draw the net or analyze its
+    cost, but not to load it.
+
+    Parameters
+    ----------
+    caffe_net : a caffe.proto.caffe_pb2.NetParameter protocol buffer.
+
+    Returns
+    -------
+    NetParameter with the layers of `caffe_net` in the current format.
+    """
+    net = caffe_pb2.NetParameter()
+    net.CopyFrom(caffe_net)
+    del net.layers[:]
+    layer_fields = caffe_pb2.LayerParameter.DESCRIPTOR.fields_by_name
+    for v1_layer in caffe_net.layers:
+        layer = net.layer.add()
+        layer.type = get_v1_type_name(v1_layer.type)
+        for field, value in v1_layer.ListFields():
+            if (field.name not in layer_fields or
+                    field.name in ('type', 'blobs', 'param')):
+                continue
+            if field.message_type is not None:
+                if (layer_fields[field.name].message_type is not
+                        field.message_type):
+                    continue
+                if field.label == field.LABEL_REPEATED:
+                    getattr(layer, field.name).extend(value)
+                else:
+                    getattr(layer, field.name).CopyFrom(value)
+            elif field.label == field.LABEL_REPEATED:
+                getattr(layer, field.name).extend(value)
+            else:
+                setattr(layer, field.name, value)
+    return net
+
+
+def get_net_layers(caffe_net):
+    """Get the layers of `caffe_net` in net order and in the current format.
+
+    V1 nets are upgraded with upgrade_v1_net() first.
+    """
+    if len(caffe_net.layers):
+        caffe_net = upgrade_v1_net(caffe_net)
+    return caffe_net.layer
+
+
+def get_input_shapes(caffe_net):
+    """Get the shapes of the net inputs declared in `caffe_net`.
+    """
+    shapes = {}
+    for i, name in enumerate(caffe_net.input):
+        if len(caffe_net.input_shape):
+            shapes[name] = tuple(caffe_net.input_shape[i].dim)
+        else:
+            shapes[name] = tuple(caffe_net.input_dim[4 * i:4 * i + 4])
+    return shapes
+
+
+def _spatial_param(values, value_h, value_w, default):
+    if value_h or value_w:
+        return value_h, value_w
+    if len(values):
+        return values[0], values[0]
+    return default, default
+
+
+def _conv_geometry(param):
+    kernel = _spatial_param(param.kernel_size, param.kernel_h,
+                            param.kernel_w, 1)
+    stride = _spatial_param(param.stride, param.stride_h, param.stride_w, 1)
+    pad = _spatial_param(param.pad, param.pad_h, param.pad_w, 0)
+    return kernel, stride, pad
+
+
+def _pooling_geometry(param, height, width):
+    if param.global_pooling:
+        return (height, width), (1, 1), (0, 0)
+    kernel = ((param.kernel_h, param.kernel_w) if param.kernel_h
+              else (param.kernel_size,) * 2)
+    stride = ((param.stride_h, param.stride_w) if param.stride_h
+              else (param.stride,) * 2)
+    pad = ((param.pad_h, param.pad_w) if param.pad_h or param.pad_w
+           else (param.pad,) * 2)
+    return kernel, stride, pad
+
+
+def _pooled_size(size, kernel, stride, pad):
+    # Same rounding as PoolingLayer::Reshape().
+    pooled = int(np.ceil(float(size + 2 * pad - kernel) / stride)) + 1
+    if pad and (pooled - 1) * stride >= size + pad:
+        pooled -= 1
+    return pooled
+
+
+def get_layer_cost(layer, bottom_shapes, itemsize=4):
+    """Infer the top shapes and the cost of one layer.
+
+    Parameters
+    ----------
+    layer : a caffe.proto.caffe_pb2.LayerParameter protocol buffer.
+    bottom_shapes : list with the shape tuple of every bottom blob.
+    itemsize : bytes per blob element.
+
+    Returns
+    -------
+    LayerCost of the layer.
+    """
+    shape = bottom_shapes[0] if bottom_shapes else ()
+    count = int(np.prod(shape)) if shape else 0
+    n_params = 0
+    flops = 0
+    if layer.type in ('Convolution', 'Deconvolution'):
+        param = layer.convolution_param
+        n, c, h, w = shape
+        (kernel_h, kernel_w), (stride_h, stride_w), (pad_h, pad_w) = \
+            _conv_geometry(param)
+        group = param.group
+        if layer.type == 'Convolution':
+            out_h = (h + 2 * pad_h - kernel_h) // stride_h + 1
+            out_w = (w + 2 * pad_w - kernel_w) // stride_w + 1
+            # Every output pixel is a dot product over the kernel window.
+            flops = (2 * n * param.num_output * out_h * out_w *
+                     (c // group) * kernel_h * kernel_w)
+        else:
+            out_h = stride_h * (h - 1) + kernel_h - 2 * pad_h
+            out_w = stride_w * (w - 1) + kernel_w - 2 * pad_w
+            # Every input pixel is scattered over the kernel window.
+            flops = (2 * n * c * h * w * (param.num_output // group) *
+                     kernel_h * kernel_w)
+        n_params = param.num_output * (c // group) * kernel_h * kernel_w
+        if param.bias_term:
+            n_params += param.num_output
+        top_shapes = [(n, param.num_output, out_h, out_w)]
+    elif layer.type == 'Pooling':
+        n, c, h, w = shape
+        (kernel_h, kernel_w), (stride_h, stride_w), (pad_h, pad_w) = \
+            _pooling_geometry(layer.pooling_param, h, w)
+        out_h = _pooled_size(h, kernel_h, stride_h, pad_h)
+        out_w = _pooled_size(w, kernel_w, stride_w, pad_w)
+        top_shapes = [(n, c, out_h, out_w)]
+        flops = n * c * out_h * out_w * kernel_h * kernel_w
+    elif layer.type == 'InnerProduct':
+        param = layer.inner_product_param
+        axis = param.axis % len(shape)
+        n_in = int(np.prod(shape[axis:]))
+        outer = int(np.prod(shape[:axis]))
+        top_shapes = [tuple(shape[:axis]) + (param.num_output,)]
+        flops = 2 * outer * n_in * param.num_output
+        n_params = param.num_output * n_in
+        if param.bias_term:
+            n_params += param.num_output
+    elif layer.type == 'LRN':
+        top_shapes = [shape]
+        # Windowed sum of squares, scale and power per element.
+        flops = count * (2 * layer.lrn_param.local_size + 3)
+    elif layer.type in ('Softmax', 'SoftmaxWithLoss'):
+        top_shapes = [shape] if layer.type == 'Softmax' else [()]
+        flops = 4 * count
+    elif layer.type == 'Concat':
+        axis = layer.concat_param.axis
+        top_shapes = [tuple(shape[:axis]) +
+                      (sum(s[axis] for s in bottom_shapes),) +
+                      tuple(shape[axis + 1:])]
+    elif layer.type == 'Eltwise':
+        top_shapes = [shape]
+        flops = count * (len(bottom_shapes) - 1)
+    elif layer.type == 'Flatten':
+        top_shapes = [tuple(shape[:1]) + (int(np.prod(shape[1:])),)]
+    elif layer.type == 'DummyData':
+        top_shapes = [tuple(s.dim) for s in layer.dummy_data_param.shape]
+    elif layer.type in ELEMENTWISE_LAYER_TYPES:
+        top_shapes = [shape]
+        flops = count
+    else:
+        # Unknown cost: assume the bottoms are passed through.
+        top_shapes = list(bottom_shapes[:len(layer.top)])
+    if len(top_shapes) < len(layer.top):
+        top_shapes += [top_shapes[-1] if top_shapes else ()] * (
+            len(layer.top) - len(top_shapes))
+
+    activation_bytes = sum(int(np.prod(s)) * itemsize
+                           for top, s in zip(layer.top, top_shapes)
+                           if top not in layer.bottom)
+    return LayerCost(layer.name, layer.type, top_shapes, flops,
+                     n_params * itemsize, activation_bytes)
+
+
+def get_net_costs(caffe_net, input_hw=None, input_shapes=None, itemsize=4):
+    """Infer the cost of every layer of `caffe_net`.
+
+    Parameters
+    ----------
+    caffe_net : a caffe.proto.caffe_pb2.NetParameter protocol buffer; V1
+        nets are upgraded first.
+    input_hw : optional (height, width) overriding the spatial size of all
+        4-D net inputs.
+    input_shapes : optional {blob name: shape} for the inputs, e.g. the tops
+        of data layers.
+    itemsize : bytes per blob element.
+
+    Returns
+    -------
+    list of LayerCost, one per layer in net order.
+    """
+    shapes = get_input_shapes(caffe_net)
+    if input_shapes is not None:
+        shapes.update(input_shapes)
+    if input_hw is not None:
+        for name, shape in shapes.items():
+            if len(shape) == 4:
+                shapes[name] = tuple(shape[:2]) + tuple(input_hw)
+    costs = []
+    for layer in get_net_layers(caffe_net):
+        bottom_shapes = [shapes[bottom] for bottom in layer.bottom]
+        cost = get_layer_cost(layer, bottom_shapes, itemsize)
+        for top, shape in zip(layer.top, cost.top_shapes):
+            shapes[top] = shape
+        costs.append(cost)
+    return costs
+
+
+def get_cost_label(cost, separator):
+    """Define a node label line with the cost of a layer.
+    """
+    return 'MFLOPs: %.1f%sparams: %s%sactivations: %s' % (
+        cost.flops / 1e6, separator, format_bytes(cost.param_bytes),
+        separator, format_bytes(cost.activation_bytes))
+
+
+def format_bytes(n_bytes):
+    for unit in ('B', 'KB', 'MB'):
+        if n_bytes < 1024:
+            return '%.1f %s' % (n_bytes, unit)
+        n_bytes /= 1024.0
+    return '%.1f GB' % n_bytes
+
+
+def format_cost_table(costs):
+    """Format layer costs as a text table with totals.
+
+    Parameters
+    ----------
+    costs : list of LayerCost as returned by get_net_costs().
+
+    Returns
+    -------
+    string :
+        The table, one line per layer.
+    """
+    rows = [('layer', 'type', 'top shape', 'MFLOPs', 'params',
+             'activations')]
+    for cost in costs:
+        top_shape = 'x'.join(str(d) for d in cost.top_shapes[0]) \
+            if cost.top_shapes else ''
+        rows.append((cost.name, cost.type, top_shape,
+                     '%.1f' % (cost.flops / 1e6),
+                     format_bytes(cost.param_bytes),
+                     format_bytes(cost.activation_bytes)))
+    flops = sum(cost.flops for cost in costs)
+    param_bytes = sum(cost.param_bytes for cost in costs)
+    activation_bytes = sum(cost.activation_bytes for cost in costs)
+    rows.append(('total', '', '', '%.1f' % (flops / 1e6),
+                 format_bytes(param_bytes), format_bytes(activation_bytes)))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = ['  '.join(value.ljust(width) if i < 3 else value.rjust(width)
+                       for i, (value, width) in enumerate(zip(row, widths)))
+             for row in rows]
+    lines.insert(1, '-' * len(lines[0]))
+    lines.insert(len(lines) - 1, '-' * len(lines[0]))
+    lines.append('forward + backward: ~%.2f GFLOPs, ~%s with diffs'
+                 % (3 * flops / 1e9,
+                    format_bytes(2 * (param_bytes + activation_bytes))))
+    return '\n'.join(lines)
@@ -13,6 +13,7 @@ The selective_search_ijcv_with_python code required for the selective search
 proposal mode is available at
     https://github.com/sergeyk/selective_search_ijcv_with_python
 """
+from collections import deque
 import numpy as np
 import os
 
@@ -53,7 +54,7 @@ class Detector(caffe.Net):
 
         self.configure_crop(context_pad)
 
-    def detect_windows(self, images_windows):
+    def detect_windows(self, images_windows, image_loader=None):
         """
         Do windowed detection over given images and windows. Windows are
         extracted then warped to the input dimensions of the net.
@@ -61,42 +62,95 @@ class Detector(caffe.Net):
         Parameters
         ----------
         images_windows: (image filename, window list) iterable.
-        context_crop: size of context border to crop in pixels.
+        image_loader: optional caffe.io.ImageLoader to decode the images
+            ahead on worker processes.
 
         Returns
         -------
         detections: list of {filename: image filename, window: crop coordinates,
             predictions: prediction vector} dicts.
         """
-        # Extract windows.
-        window_inputs = []
-        for image_fname, windows in images_windows:
-            image = caffe.io.load_image(image_fname).astype(np.float32)
-            for window in windows:
-                window_inputs.append(self.crop(image, window))
-
-        # Run through the net (warping windows to input dimensions).
+        return list(self.detect_windows_iter(images_windows, image_loader))
+
+    def detect_windows_iter(self, images_windows, image_loader=None):
+        """
+        Streaming version of detect_windows(). Each image is loaded once and
+        its windows are warped in chunks into a net-batch-sized input buffer,
+        which is run through the net whenever it is full. Memory therefore
+        stays proportional to the batch size rather than to the total
+        number of windows.
+
+        Parameters
+        ----------
+        images_windows: (image filename, window list) iterable.
+        image_loader: optional caffe.io.ImageLoader to decode the images
+            ahead on worker processes.
+
+        Yields
+        ------
+        detection: {filename: image filename, window: crop coordinates,
+            predictions: prediction vector} dict, in input order.
+        """
         in_ = self.inputs[0]
-        caffe_in = np.zeros((len(window_inputs), window_inputs[0].shape[2])
-                            + self.blobs[in_].data.shape[2:],
-                            dtype=np.float32)
-        for ix, window_in in enumerate(window_inputs):
-            caffe_in[ix] = self.transformer.preprocess(in_, window_in)
-        out = self.forward_all(**{in_: caffe_in})
-        predictions = out[self.outputs[0]].squeeze(axis=(2, 3))
+        caffe_in = np.zeros(self.blobs[in_].data.shape, dtype=np.float32)
+        batch_size = len(caffe_in)
+        channel_swap, scale, channel_offset, offset = \
+            self.transformer.fold(in_)
+        channel_offset = channel_offset[:, np.newaxis, np.newaxis]
+        pending = []
+
+        # The window lists wait here while their images are being loaded;
+        # only as many as the loader reads ahead are held.
+        loading = deque()
+
+        def fnames():
+            for image_fname, windows in images_windows:
+                loading.append((image_fname, windows))
+                yield image_fname
+        if image_loader is None:
+            images = (caffe.io.load_image(f) for f in fnames())
+        else:
+            images = image_loader.imap(fnames())
+        for image in images:
+            image_fname, windows = loading.popleft()
+            image = image.astype(np.float32, copy=False)
+            start = 0
+            while start < len(windows):
+                # Warp and preprocess as many windows as fit into the input
+                # batch at once.
+                chunk = windows[start:start + batch_size - len(pending)]
+                crops = self.crop_windows(image, chunk)
+                if channel_swap is not None:
+                    crops = crops[..., channel_swap]
+                batch = caffe_in[len(pending):len(pending) + len(crops)]
+                np.multiply(crops.transpose(0, 3, 1, 2), scale, out=batch)
+                batch -= channel_offset
+                if offset is not None:
+                    batch -= offset
+                pending.extend((image_fname, window) for window in chunk)
+                start += len(chunk)
+                if len(pending) == batch_size:
+                    for detection in self._detect_batch(caffe_in, pending):
+                        yield detection
+                    pending = []
+        if pending:
+            for detection in self._detect_batch(caffe_in, pending):
+                yield detection
 
+    def _detect_batch(self, caffe_in, pending):
+        """
+        Run one input batch through the net and package the predictions of
+        its first len(pending) windows.
+        """
+        out = self.forward(**{self.inputs[0]: caffe_in})
+        predictions = out[self.outputs[0]].squeeze(axis=(2, 3))
         # Package predictions with images and windows.
-        detections = []
-        ix = 0
-        for image_fname, windows in images_windows:
-            for window in windows:
-                detections.append({
-                    'window': window,
-                    'prediction': predictions[ix],
-                    'filename': image_fname
-                })
-                ix += 1
-        return detections
+        for ix, (image_fname, window) in enumerate(pending):
+            yield {
+                'window': window,
+                'prediction': predictions[ix].copy(),
+                'filename': image_fname
+            }
 
     def detect_selective_search(self, image_fnames):
         """
@@ -136,47 +190,71 @@ class Detector(caffe.Net):
         -------
         crop: cropped window.
         """
+        if self.context_pad:
+            return self.crop_windows(im, np.asarray([window]))[0]
         # Crop window from the image.
-        crop = im[window[0]:window[2], window[1]:window[3]]
+        return im[window[0]:window[2], window[1]:window[3]]
 
-        if self.context_pad:
-            box = window.copy()
+    def crop_windows(self, im, windows):
+        """
+        Crop and warp many windows of one image to the net input dimensions
+        at once, including surrounding context according to the
+        `context_pad` configuration. Context outside the image is filled
+        with the mean.
+
+        Parameters
+        ----------
+        im: H x W x K image ndarray to crop.
+        windows: N x 4 array of bounding boxes as ymin, xmin, ymax, xmax.
+
+        Returns
+        -------
+        crops: N x crop_h x crop_w x K ndarray of warped windows.
+        """
+        windows = np.asarray(windows, dtype=float).reshape(-1, 4)
+        im_h, im_w = im.shape[:2]
+        crops = np.empty((len(windows),) + tuple(self.crop_dims),
+                         dtype=np.float32)
+        crops[...] = self.crop_mean if self.context_pad else 0
+
+        if not self.context_pad:
+            # Like slicing, windows are cut at the image border
+            boxes = np.clip(windows, 0., [im_h, im_w, im_h, im_w])
+            dst_boxes = np.zeros_like(windows)
+            dst_boxes[:, 2:] = self.crop_dims[:2]
+        else:
             crop_size = self.blobs[self.inputs[0]].width  # assumes square
             scale = crop_size / (1. * crop_size - self.context_pad * 2)
             # Crop a box + surrounding context.
-            half_h = (box[2] - box[0] + 1) / 2.
-            half_w = (box[3] - box[1] + 1) / 2.
-            center = (box[0] + half_h, box[1] + half_w)
-            scaled_dims = scale * np.array((-half_h, -half_w, half_h, half_w))
-            box = np.round(np.tile(center, 2) + scaled_dims)
-            full_h = box[2] - box[0] + 1
-            full_w = box[3] - box[1] + 1
+            half_h = (windows[:, 2] - windows[:, 0] + 1) / 2.
+            half_w = (windows[:, 3] - windows[:, 1] + 1) / 2.
+            center = np.column_stack((windows[:, 0] + half_h,
+                                      windows[:, 1] + half_w))
+            scaled_dims = scale * np.column_stack((-half_h, -half_w,
+                                                   half_h, half_w))
+            boxes = np.round(np.tile(center, 2) + scaled_dims)
+            full_h = boxes[:, 2] - boxes[:, 0] + 1
+            full_w = boxes[:, 3] - boxes[:, 1] + 1
             scale_h = crop_size / full_h
             scale_w = crop_size / full_w
-            pad_y = round(max(0, -box[0]) * scale_h)  # amount out-of-bounds
-            pad_x = round(max(0, -box[1]) * scale_w)
-
-            # Clip box to image dimensions.
-            im_h, im_w = im.shape[:2]
-            box = np.clip(box, 0., [im_h, im_w, im_h, im_w])
-            clip_h = box[2] - box[0] + 1
-            clip_w = box[3] - box[1] + 1
-            assert(clip_h > 0 and clip_w > 0)
-            crop_h = round(clip_h * scale_h)
-            crop_w = round(clip_w * scale_w)
-            if pad_y + crop_h > crop_size:
-                crop_h = crop_size - pad_y
-            if pad_x + crop_w > crop_size:
-                crop_w = crop_size - pad_x
-
-            # collect with context padding and place in input
-            # with mean padding
-            context_crop = im[box[0]:box[2], box[1]:box[3]]
-            context_crop = caffe.io.resize_image(context_crop, (crop_h, crop_w))
-            crop = np.ones(self.crop_dims, dtype=np.float32) * self.crop_mean
-            crop[pad_y:(pad_y + crop_h), pad_x:(pad_x + crop_w)] = context_crop
-
-        return crop
+            # amount out-of-bounds
+            pad_y = np.floor(np.maximum(0, -boxes[:, 0]) * scale_h + 0.5)
+            pad_x = np.floor(np.maximum(0, -boxes[:, 1]) * scale_w + 0.5)
+
+            # Clip boxes to image dimensions.
+            boxes = np.clip(boxes, 0., [im_h, im_w, im_h, im_w])
+            clip_h = boxes[:, 2] - boxes[:, 0] + 1
+            clip_w = boxes[:, 3] - boxes[:, 1] + 1
+            assert(np.all(clip_h > 0) and np.all(clip_w > 0))
+            crop_h = np.minimum(np.floor(clip_h * scale_h + 0.5),
+                                crop_size - pad_y)
+            crop_w = np.minimum(np.floor(clip_w * scale_w + 0.5),
+                                crop_size - pad_x)
+            dst_boxes = np.column_stack((pad_y, pad_x,
+                                         pad_y + crop_h, pad_x + crop_w))
+
+        # Warp all crops in one pass into the mean-filled buffer.
+        return caffe.io.crop_and_resize(im, boxes, dst_boxes, crops)
 
     def configure_crop(self, context_pad):
         """
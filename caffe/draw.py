@@ -10,6 +10,7 @@ Caffe network visualization: draw the NetParameter protobuffer.
 """
 
 from caffe.proto import caffe_pb2
+from caffe.cost import get_cost_label, get_net_layers
 import pydot
 
 # Internal layer and blob styles.
@@ -50,7 +51,7 @@ def get_edge_label(layer):
     return edge_label
 
 
-def get_layer_label(layer, rankdir):
+def get_layer_label(layer, rankdir, cost=None):
     """Define node label based on layer type.
 
     Parameters
@@ -58,6 +59,8 @@ def get_layer_label(layer, rankdir):
     layer : ?
     rankdir : {'LR', 'TB', 'BT'}
         Direction of graph layout.
+    cost : caffe.cost.LayerCost, optional
+        Cost of the layer to append to the label.
 
     Returns
     -------
@@ -102,6 +105,9 @@ def get_layer_label(layer, rankdir):
                       layer.pooling_param.pad)
     else:
         node_label = '"%s%s(%s)"' % (layer.name, separator, layer.type)
+    if cost is not None:
+        node_label = '%s%s%s"' % (node_label[:-1], separator,
+                                  get_cost_label(cost, separator))
     return node_label
 
 
@@ -118,16 +124,19 @@ def choose_color_by_layertype(layertype):
     return color
 
 
-def get_pydot_graph(caffe_net, rankdir, label_edges=True):
+def get_pydot_graph(caffe_net, rankdir, label_edges=True, layer_costs=None):
     """Create a data structure which represents the `caffe_net`.
 
     Parameters
     ----------
-    caffe_net : object
+    caffe_net : a caffe.proto.caffe_pb2.NetParameter protocol buffer; V1
+        nets are upgraded first.
     rankdir : {'LR', 'TB', 'BT'}
         Direction of graph layout.
     label_edges : boolean, optional
         Label the edges (default is True).
+    layer_costs : list of caffe.cost.LayerCost, optional
+        Annotate the layers with their cost, see caffe.cost.get_net_costs().
 
     Returns
     -------
@@ -138,8 +147,9 @@ def get_pydot_graph(caffe_net, rankdir, label_edges=True):
                             rankdir=rankdir)
     pydot_nodes = {}
     pydot_edges = []
-    for layer in caffe_net.layer:
-        node_label = get_layer_label(layer, rankdir)
+    costs = dict((cost.name, cost) for cost in layer_costs or [])
+    for layer in get_net_layers(caffe_net):
+        node_label = get_layer_label(layer, rankdir, costs.get(layer.name))
         node_name = "%s_%s" % (layer.name, layer.type)
         if (len(layer.bottom) == 1 and len(layer.top) == 1 and
            layer.bottom[0] == layer.top[0]):
@@ -177,7 +187,7 @@ def get_pydot_graph(caffe_net, rankdir, label_edges=True):
     return pydot_graph
 
 
-def draw_net(caffe_net, rankdir, ext='png'):
+def draw_net(caffe_net, rankdir, ext='png', layer_costs=None):
     """Draws a caffe net and returns the image string encoded using the given
     extension.
 
@@ -186,16 +196,19 @@ def draw_net(caffe_net, rankdir, ext='png'):
     caffe_net : a caffe.proto.caffe_pb2.NetParameter protocol buffer.
     ext : string, optional
         The image extension (the default is 'png').
+    layer_costs : list of caffe.cost.LayerCost, optional
+        Annotate the layers with their cost.
 
     Returns
     -------
     string :
         Postscript representation of the graph.
     """
-    return get_pydot_graph(caffe_net, rankdir).create(format=ext)
+    return get_pydot_graph(caffe_net, rankdir,
+                           layer_costs=layer_costs).create(format=ext)
 
 
-def draw_net_to_file(caffe_net, filename, rankdir='LR'):
+def draw_net_to_file(caffe_net, filename, rankdir='LR', layer_costs=None):
     """Draws a caffe net, and saves it to file using the format given as the
     file extension. Use '.raw' to output raw text that you can manually feed
     to graphviz to draw graphs.
@@ -207,7 +220,9 @@ def draw_net_to_file(caffe_net, filename, rankdir='LR'):
         The path to a file where the networks visualization will be stored.
     rankdir : {'LR', 'TB', 'BT'}
         Direction of graph layout.
+    layer_costs : list of caffe.cost.LayerCost, optional
+        Annotate the layers with their cost.
     """
     ext = filename[filename.rfind('.')+1:]
     with open(filename, 'wb') as fid:
-        fid.write(draw_net(caffe_net, rankdir, ext))
+        fid.write(draw_net(caffe_net, rankdir, ext, layer_costs))
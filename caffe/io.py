@@ -1,7 +1,13 @@
+import json
+import os
+import tempfile
 import numpy as np
-import skimage.io
-from scipy.ndimage import zoom
-from skimage.transform import resize
+from collections import OrderedDict, deque
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
+# skimage and scipy.ndimage are imported where they are used: they take
+# longer to import than the rest of caffe and are not needed by callers
+# that bring their own decoded images.
 
 try:
     # Python3 will most likely not be able to load protobuf
@@ -15,16 +21,101 @@ except:
 
 
 ## proto / datum / ndarray conversion
+
+# Wire types and field numbers used for bulk (de)serialization of the
+# repeated float fields, see caffe.proto.
+_WIRE_FIXED64 = 1
+_WIRE_LENGTH_DELIMITED = 2
+_WIRE_FIXED32 = 5
+_BLOB_DATA_FIELD = 5
+_BLOB_DIFF_FIELD = 6
+_DATUM_FLOAT_DATA_FIELD = 6
+
+
+def _encode_varint(value):
+    out = bytearray()
+    while True:
+        bits = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _decode_varint(buf, pos):
+    result = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _packed_float_field(field_number, arr):
+    """Encode `arr` as a packed repeated float field in wire format."""
+    payload = np.ascontiguousarray(arr, dtype='<f4').tobytes()
+    return (_encode_varint(field_number << 3 | _WIRE_LENGTH_DELIMITED) +
+            _encode_varint(len(payload)) + payload)
+
+
+def _float_field_to_array(serialized, field_number):
+    """
+    Extract a repeated float field from a serialized message as a float32
+    ndarray, moving whole buffers instead of single elements. Both the
+    packed and the unpacked encoding are understood.
+    """
+    buf = bytearray(serialized)
+    unpacked_tag = _encode_varint(field_number << 3 | _WIRE_FIXED32)
+    record = np.dtype([('tag', 'u1', (len(unpacked_tag),)), ('value', '<f4')])
+    chunks = []
+    pos = 0
+    while pos < len(buf):
+        key, value_pos = _decode_varint(buf, pos)
+        number, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            _, pos = _decode_varint(buf, value_pos)
+        elif wire_type == _WIRE_FIXED64:
+            pos = value_pos + 8
+        elif wire_type == _WIRE_FIXED32:
+            if number != field_number:
+                pos = value_pos + 4
+                continue
+            # Unpacked records of one field are written back to back; view
+            # the run as (tag, value) records.
+            n = (len(buf) - pos) // record.itemsize
+            records = np.frombuffer(buf, dtype=record, count=n, offset=pos)
+            is_tag = np.all(records['tag'] == np.frombuffer(unpacked_tag,
+                                                            dtype='u1'),
+                            axis=1)
+            run = n if is_tag.all() else int(np.argmin(is_tag))
+            chunks.append(records['value'][:run])
+            pos += run * record.itemsize
+        elif wire_type == _WIRE_LENGTH_DELIMITED:
+            length, pos = _decode_varint(buf, value_pos)
+            if number == field_number:
+                chunks.append(np.frombuffer(buf, dtype='<f4',
+                                            count=length // 4, offset=pos))
+            pos += length
+        else:
+            raise ValueError('Unsupported wire type %d' % wire_type)
+    if not chunks:
+        return np.empty(0, dtype=np.float32)
+    return np.concatenate(chunks).astype(np.float32)
+
+
 def blobproto_to_array(blob, return_diff=False):
     """
     Convert a blob proto to an array. In default, we will just return the data,
     unless return_diff is True, in which case we will return the diff.
     """
     # Read the data into an array
-    if return_diff:
-        data = np.array(blob.diff)
-    else:
-        data = np.array(blob.data)
+    field = _BLOB_DIFF_FIELD if return_diff else _BLOB_DATA_FIELD
+    data = _float_field_to_array(blob.SerializeToString(), field).astype(float)
 
     # Reshape the array
     if blob.HasField('num') or blob.HasField('channels') or blob.HasField('height') or blob.HasField('width'):
@@ -40,9 +131,10 @@ def array_to_blobproto(arr, diff=None):
     """
     blob = caffe_pb2.BlobProto()
     blob.shape.dim.extend(arr.shape)
-    blob.data.extend(arr.astype(float).flat)
+    serialized = _packed_float_field(_BLOB_DATA_FIELD, arr)
     if diff is not None:
-        blob.diff.extend(diff.astype(float).flat)
+        serialized += _packed_float_field(_BLOB_DIFF_FIELD, diff)
+    blob.MergeFromString(serialized)
     return blob
 
 
@@ -73,9 +165,10 @@ def array_to_datum(arr, label=0):
     datum = caffe_pb2.Datum()
     datum.channels, datum.height, datum.width = arr.shape
     if arr.dtype == np.uint8:
-        datum.data = arr.tostring()
+        datum.data = arr.tobytes()
     else:
-        datum.float_data.extend(arr.flat)
+        datum.MergeFromString(_packed_float_field(_DATUM_FLOAT_DATA_FIELD,
+                                                  arr))
     datum.label = label
     return datum
 
@@ -85,11 +178,161 @@ def datum_to_array(datum):
     as one can easily get it by calling datum.label.
     """
     if len(datum.data):
-        return np.fromstring(datum.data, dtype=np.uint8).reshape(
-            datum.channels, datum.height, datum.width)
+        # Copy, so the array is writable like it was with np.fromstring
+        return np.frombuffer(datum.data, dtype=np.uint8).reshape(
+            datum.channels, datum.height, datum.width).copy()
     else:
-        return np.array(datum.float_data).astype(float).reshape(
-            datum.channels, datum.height, datum.width)
+        return _float_field_to_array(
+            datum.SerializeToString(), _DATUM_FLOAT_DATA_FIELD
+        ).astype(float).reshape(datum.channels, datum.height, datum.width)
+
+
+## caffemodel weight cache
+
+def caffemodel_to_weight_cache(caffemodel, cache_prefix):
+    """
+    Convert a binary caffemodel to a flat float32 weight file and a small
+    JSON index (`cache_prefix.index`). The weight file gets a unique name
+    (`cache_prefix.<random>.weights`) that is recorded in the index together
+    with its size and the size and mtime of the caffemodel. The index is
+    renamed into place last, so readers always see an index and a weight
+    file that belong together. The weight file can then be memory-mapped by
+    load_weight_cache() without parsing the protobuf again.
+
+    Parameters
+    ----------
+    caffemodel : path to the .caffemodel file.
+    cache_prefix : path prefix for the cache files.
+    """
+    stat = os.stat(caffemodel)
+    net_param = caffe_pb2.NetParameter()
+    with open(caffemodel, 'rb') as f:
+        net_param.ParseFromString(f.read())
+    layers = net_param.layer if len(net_param.layer) else net_param.layers
+
+    cache_dir, cache_name = os.path.split(os.path.abspath(cache_prefix))
+    old_weights = _weight_cache_file(cache_prefix)
+    fd, weights_file = tempfile.mkstemp(prefix=cache_name + '.',
+                                        suffix='.weights', dir=cache_dir)
+    index_tmp = cache_prefix + '.index.tmp%d' % os.getpid()
+    try:
+        blobs = []
+        offset = 0
+        with os.fdopen(fd, 'wb') as f:
+            for layer in layers:
+                for i, blob in enumerate(layer.blobs):
+                    arr = blobproto_to_array(blob).astype(np.float32)
+                    arr.tofile(f)
+                    blobs.append({'layer': layer.name, 'blob': i,
+                                  'offset': offset,
+                                  'shape': list(arr.shape)})
+                    offset += arr.nbytes
+        index = {
+            'weights': os.path.basename(weights_file),
+            'nbytes': offset,
+            'source_size': stat.st_size,
+            'source_mtime': stat.st_mtime,
+            'blobs': blobs,
+        }
+        with open(index_tmp, 'w') as f:
+            json.dump(index, f)
+        os.rename(index_tmp, cache_prefix + '.index')
+    except:
+        for tmp in (weights_file, index_tmp):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
+    if old_weights is not None and os.path.exists(old_weights):
+        # Workers that mapped the old file keep their pages
+        os.remove(old_weights)
+
+
+def _read_weight_cache_index(cache_prefix):
+    try:
+        with open(cache_prefix + '.index') as f:
+            index = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or 'weights' not in index:
+        # Written by an older version
+        return None
+    return index
+
+
+def _weight_cache_file(cache_prefix, index=None):
+    if index is None:
+        index = _read_weight_cache_index(cache_prefix)
+        if index is None:
+            return None
+    cache_dir = os.path.dirname(os.path.abspath(cache_prefix))
+    return os.path.join(cache_dir, index['weights'])
+
+
+def load_weight_cache(cache_prefix):
+    """
+    Memory-map a weight cache written by caffemodel_to_weight_cache().
+
+    Returns
+    -------
+    weights : {layer name: list of read-only float32 ndarrays} OrderedDict.
+        The arrays are views of the mapped file, so no weights are copied
+        and the pages are shared between processes.
+    """
+    # A concurrent rebuild may replace the index and remove the weight file
+    # it referenced between reading the one and opening the other.
+    for attempt in range(2):
+        index = _read_weight_cache_index(cache_prefix)
+        if index is None:
+            raise IOError('no valid weight cache at %s' % cache_prefix)
+        weights_file = _weight_cache_file(cache_prefix, index)
+        try:
+            nbytes = os.path.getsize(weights_file)
+        except OSError:
+            if attempt == 0:
+                continue
+            raise
+        break
+    if nbytes != index['nbytes']:
+        raise IOError('weight cache %s has %d bytes, its index expects %d'
+                      % (weights_file, nbytes, index['nbytes']))
+    weights = OrderedDict()
+    if not index['blobs']:
+        return weights
+    mapped = np.memmap(weights_file, dtype=np.float32, mode='r')
+    itemsize = mapped.itemsize
+    for entry in index['blobs']:
+        size = int(np.prod(entry['shape']))
+        start = entry['offset'] // itemsize
+        arr = mapped[start:start + size].reshape(entry['shape'])
+        weights.setdefault(entry['layer'], []).append(arr)
+    return weights
+
+
+def cached_weights(caffemodel, cache_prefix=None):
+    """
+    Load the weights of `caffemodel` through a memory-mapped cache, building
+    the cache first if it is missing or was built from a caffemodel with a
+    different size or mtime.
+
+    Parameters
+    ----------
+    caffemodel : path to the .caffemodel file.
+    cache_prefix : path prefix for the cache files. Defaults to the
+        caffemodel path.
+
+    Returns
+    -------
+    weights : see load_weight_cache().
+    """
+    if cache_prefix is None:
+        cache_prefix = caffemodel
+    stat = os.stat(caffemodel)
+    index = _read_weight_cache_index(cache_prefix)
+    if (index is None or index['source_size'] != stat.st_size or
+            index['source_mtime'] != stat.st_mtime or
+            not os.path.exists(_weight_cache_file(cache_prefix, index))):
+        caffemodel_to_weight_cache(caffemodel, cache_prefix)
+    return load_weight_cache(cache_prefix)
 
 
 ## Pre-processing
@@ -160,6 +403,48 @@ class Transformer:
             caffe_in *= input_scale
         return caffe_in
 
+    def fold(self, in_):
+        """
+        Fold the scaling and mean subtraction of preprocess() into a single
+        affine map, caffe_in = swapped * scale - channel_offset - offset,
+        so that a batch can be preprocessed in one pass.
+
+        The channel swap, scale and per-channel offset commute with cropping
+        and can be applied to the images before they are cropped; an
+        elementwise mean is only defined on crops of the input dimensions.
+
+        Parameters
+        ----------
+        in_ : name of input blob to preprocess for
+
+        Returns
+        -------
+        channel_swap : channel order or None.
+        scale : scalar scale.
+        channel_offset : (K,) float32 ndarray of per-channel offsets.
+        offset : (K x H x W) float32 ndarray of elementwise offsets or None.
+        """
+        self.__check_input(in_)
+        raw_scale = self.raw_scale.get(in_)
+        mean = self.mean.get(in_)
+        input_scale = self.input_scale.get(in_)
+        scale = 1.0
+        if raw_scale is not None:
+            scale *= raw_scale
+        if input_scale is not None:
+            scale *= input_scale
+        channel_offset = np.zeros(self.inputs[in_][1], dtype=np.float32)
+        offset = None
+        if mean is not None:
+            mean = np.asarray(mean, dtype=np.float32)
+            if input_scale is not None:
+                mean = mean * input_scale
+            if mean.shape[1:] == (1, 1):
+                channel_offset += mean.ravel()
+            else:
+                offset = mean
+        return self.channel_swap.get(in_), scale, channel_offset, offset
+
     def deprocess(self, in_, data):
         """
         Invert Caffe formatting; see preprocess().
@@ -292,6 +577,7 @@ def load_image(filename, color=True):
         of size (H x W x 3) in RGB or
         of size (H x W x 1) in grayscale.
     """
+    import skimage.io
     img = skimage.img_as_float(skimage.io.imread(filename)).astype(np.float32)
     if img.ndim == 2:
         img = img[:, :, np.newaxis]
@@ -302,6 +588,126 @@ def load_image(filename, color=True):
     return img
 
 
+def _shared_memory_dir():
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def _load_image_to_shared_file(args):
+    """Pool worker: decode an image into a memory-backed .npy file and
+    return its path, so that the pixels never go through pickling."""
+    filename, color, shm_dir = args
+    img = load_image(filename, color)
+    fd, path = tempfile.mkstemp(suffix='.npy', prefix='caffe_img_',
+                                dir=shm_dir)
+    os.close(fd)
+    try:
+        shared = np.lib.format.open_memmap(path, mode='w+', dtype=img.dtype,
+                                           shape=img.shape)
+        shared[...] = img
+        del shared
+    except:
+        os.remove(path)
+        raise
+    return path
+
+
+def _attach_shared_file(path):
+    try:
+        return np.load(path, mmap_mode='r+')
+    finally:
+        # The mapping stays valid after the file is unlinked.
+        os.remove(path)
+
+
+class ImageLoader:
+    """
+    Decode images on a pool of worker processes.
+
+    Decoded images are handed back through memory-backed files (/dev/shm
+    when available) and mapped by the caller, instead of being pickled.
+    At most `max_pending` images are in flight and results are returned
+    in input order.
+
+    Parameters
+    ----------
+    n_workers : number of decoding processes; defaults to the number of
+        CPUs.
+    max_pending : maximum number of images decoded ahead of the consumer;
+        defaults to twice the number of workers.
+    color : see load_image().
+    """
+    def __init__(self, n_workers=None, max_pending=None, color=True):
+        self.n_workers = n_workers or cpu_count()
+        self.max_pending = max_pending or 2 * self.n_workers
+        self.color = color
+        self.shm_dir = _shared_memory_dir()
+        self.pool = Pool(self.n_workers)
+
+    def imap(self, filenames):
+        """
+        Load images lazily and in order.
+
+        Parameters
+        ----------
+        filenames : iterable of image file names.
+
+        Yields
+        ------
+        image : (H x W x K) float32 ndarray as returned by load_image().
+        """
+        filenames = iter(filenames)
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < self.max_pending:
+                    try:
+                        filename = next(filenames)
+                    except StopIteration:
+                        break
+                    pending.append(self.pool.apply_async(
+                        _load_image_to_shared_file,
+                        ((filename, self.color, self.shm_dir),)))
+                if not pending:
+                    return
+                yield _attach_shared_file(pending.popleft().get())
+        finally:
+            # Remove the files of images that were decoded but not consumed.
+            for result in pending:
+                try:
+                    os.remove(result.get())
+                except Exception:
+                    pass
+
+    def load(self, filenames):
+        """Load all images of `filenames` into a list."""
+        return list(self.imap(filenames))
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_images(filenames, color=True, n_workers=None):
+    """
+    Load several images in parallel; see ImageLoader.
+
+    Returns
+    -------
+    images : list of (H x W x K) float32 ndarrays in the order of
+        `filenames`.
+    """
+    with ImageLoader(n_workers, color=color) as loader:
+        return loader.load(filenames)
+
+
 def resize_image(im, new_dims, interp_order=1):
     """
     Resize an image array with interpolation.
@@ -322,6 +728,7 @@ def resize_image(im, new_dims, interp_order=1):
             # skimage is fast but only understands {1,3} channel images
             # in [0, 1].
             im_std = (im - im_min) / (im_max - im_min)
+            from skimage.transform import resize
             resized_std = resize(im_std, new_dims, order=interp_order)
             resized_im = resized_std * (im_max - im_min) + im_min
         else:
@@ -332,12 +739,224 @@ def resize_image(im, new_dims, interp_order=1):
             return ret
     else:
         # ndimage interpolates anything but more slowly.
+        from scipy.ndimage import zoom
         scale = tuple(np.array(new_dims, dtype=float) / np.array(im.shape[:2]))
         resized_im = zoom(im, scale + (1,), order=interp_order)
     return resized_im.astype(np.float32)
 
 
-def oversample(images, crop_dims):
+def _resize_coords(in_size, out_size, start, stop, centers):
+    """Source coordinates of output pixels `start` to `stop` along one axis.
+
+    With `centers` the pixel centers are aligned, as in skimage's resize();
+    otherwise the corner pixels are, as in scipy.ndimage.zoom().
+    """
+    out_ix = np.arange(start, stop, dtype=np.float64)
+    if centers:
+        return (out_ix + 0.5) * (in_size / float(out_size)) - 0.5
+    if out_size == 1:
+        return np.zeros_like(out_ix)
+    return out_ix * ((in_size - 1) / float(out_size - 1))
+
+
+def _mirror(ix, size):
+    # Mirror out-of-range indices about the edge pixels (ndimage 'mirror').
+    if size == 1:
+        return np.zeros_like(ix)
+    period = 2 * (size - 1)
+    ix = np.abs(ix) % period
+    return np.where(ix >= size, period - ix, ix)
+
+
+def _linear_taps(coords, in_size):
+    lo = np.floor(coords)
+    frac = (coords - lo).astype(np.float32)
+    lo = lo.astype(np.intp)
+    return _mirror(lo, in_size), _mirror(lo + 1, in_size), frac
+
+
+def _nearest_taps(coords, in_size):
+    return _mirror(np.floor(coords + 0.5).astype(np.intp), in_size)
+
+
+def _resize_into(im, out, interp_order, new_dims=None, offset=(0, 0)):
+    """Resize one (H x W x K) image into `out` in float32, the way
+    resize_image() does.
+
+    With `new_dims`, `out` receives the window at `offset` of the image
+    resized to `new_dims`; only the pixels of that window are interpolated.
+    """
+    im = im.astype(np.float32, copy=False)
+    (in_h, in_w), (out_h, out_w) = im.shape[:2], out.shape[:2]
+    if new_dims is None:
+        new_dims = (out_h, out_w)
+    new_h, new_w = new_dims
+    y, x = offset
+    if interp_order not in (0, 1):
+        out[...] = resize_image(im, new_dims, interp_order)[
+            y:y + out_h, x:x + out_w]
+        return out
+    # resize_image() goes through skimage for 1 and 3 channels, which
+    # aligns pixel centers, mirrors at the edges and smooths with a
+    # Gaussian when downsampling, and through ndimage.zoom() otherwise.
+    skimage_like = im.shape[-1] in (1, 3)
+    if skimage_like and (new_h < in_h or new_w < in_w):
+        from scipy.ndimage import gaussian_filter
+        sigma = (max(0, (in_h / float(new_h) - 1) / 2),
+                 max(0, (in_w / float(new_w) - 1) / 2), 0)
+        im = gaussian_filter(im, sigma, mode='mirror')
+    coords_y = _resize_coords(in_h, new_h, y, y + out_h, skimage_like)
+    coords_x = _resize_coords(in_w, new_w, x, x + out_w, skimage_like)
+    if interp_order == 0:
+        out[...] = im[_nearest_taps(coords_y, in_h)][
+            :, _nearest_taps(coords_x, in_w)]
+    else:
+        y0, y1, wy = _linear_taps(coords_y, in_h)
+        x0, x1, wx = _linear_taps(coords_x, in_w)
+        rows = im[y0]
+        rows += (im[y1] - rows) * wy[:, np.newaxis, np.newaxis]
+        np.subtract(rows[:, x1], rows[:, x0], out=out)
+        out *= wx[np.newaxis, :, np.newaxis]
+        out += rows[:, x0]
+    return out
+
+
+_thread_pools = {}
+
+
+def _thread_pool(n_threads):
+    if n_threads not in _thread_pools:
+        _thread_pools[n_threads] = ThreadPool(n_threads)
+    return _thread_pools[n_threads]
+
+
+def resize_images(images, new_dims, interp_order=1, out=None,
+                  n_threads=None, crop=None):
+    """
+    Resize a batch of images across a thread pool.
+
+    Orders 0 and 1 give the same pixels as resize_image(), including its
+    anti-aliasing when downsampling, up to float32 rounding; the images
+    are interpolated directly in float32 without the min-max normalization
+    round trip. Other orders fall back to resize_image().
+
+    Parameters
+    ----------
+    images : (N x H x W x K) ndarray or list of (H x W x K) ndarrays. Images
+        in a list may differ in size.
+    new_dims : (height, width) tuple of new dimensions.
+    interp_order : interpolation order, default is linear.
+    out : optional (N x height x width x K) float32 ndarray for the result.
+    n_threads : number of threads; defaults to the number of CPUs.
+    crop : optional (y, x, height, width) window of the resized images to
+        return. Only the pixels inside the window are interpolated, which
+        is much cheaper than resizing and then cropping.
+
+    Returns
+    -------
+    out : (N x height x width x K) float32 ndarray of resized images.
+    """
+    new_dims = int(new_dims[0]), int(new_dims[1])
+    if crop is None:
+        crop = (0, 0) + new_dims
+    y, x, crop_h, crop_w = [int(c) for c in crop]
+    if (y < 0 or x < 0 or y + crop_h > new_dims[0] or
+            x + crop_w > new_dims[1]):
+        raise ValueError('crop %s exceeds the new dimensions %s'
+                         % (crop, new_dims))
+    out_shape = (len(images), crop_h, crop_w, images[0].shape[-1])
+    if out is None:
+        out = np.empty(out_shape, dtype=np.float32)
+    elif out.shape != out_shape:
+        raise ValueError('out has shape %s, expected %s'
+                         % (out.shape, out_shape))
+    if n_threads is None:
+        n_threads = cpu_count()
+
+    def resize_one(ix):
+        _resize_into(images[ix], out[ix], interp_order, new_dims, (y, x))
+    if n_threads > 1 and len(images) > 1:
+        _thread_pool(n_threads).map(resize_one, range(len(images)))
+    else:
+        for ix in range(len(images)):
+            resize_one(ix)
+    return out
+
+
+def crop_and_resize(im, boxes, dst_boxes, out, chunk_size=16):
+    """
+    Crop several boxes from one image and linearly warp each into a region
+    of its own output crop, all at once.
+
+    Parameters
+    ----------
+    im : (H x W x K) ndarray.
+    boxes : (N x 4) int array of source boxes as ymin, xmin, ymax, xmax
+        (max exclusive). Every box must be non-empty and inside the image.
+    dst_boxes : (N x 4) int array of target regions in the output crops.
+    out : (N x h x w x K) float32 ndarray; pixels outside the target
+        regions are left untouched (e.g. prefilled with a mean).
+    chunk_size : number of boxes resampled together, bounding the size of
+        the temporaries.
+
+    Returns
+    -------
+    out : the filled output crops.
+
+    Raises
+    ------
+    ValueError : if a source box is empty or reaches outside the image, e.g.
+        a window clipped to the image that lay entirely outside of it.
+    """
+    im = im.astype(np.float32, copy=False)
+    boxes = np.asarray(boxes, dtype=np.intp).reshape(-1, 4)
+    dst_boxes = np.asarray(dst_boxes, dtype=np.intp).reshape(-1, 4)
+    out_h, out_w = out.shape[1:3]
+    im_h, im_w, im_k = im.shape
+    if np.any(boxes[:, 2:] <= boxes[:, :2]):
+        raise ValueError('Empty source box')
+    if np.any(boxes[:, :2] < 0) or np.any(boxes[:, 2:] > [im_h, im_w]):
+        raise ValueError('Source box outside the image')
+    pixels = im.reshape(-1, im_k)
+
+    def taps(src_lo, src_hi, dst_lo, dst_hi, size):
+        # (n x size) source taps for every output row (or column).
+        dst_len = np.maximum(dst_hi - dst_lo, 1)[:, np.newaxis]
+        src_len = (src_hi - src_lo)[:, np.newaxis]
+        rel = np.arange(size)[np.newaxis, :] - dst_lo[:, np.newaxis]
+        valid = (rel >= 0) & (rel < dst_len)
+        coords = (rel + 0.5) * (src_len / dst_len.astype(np.float32)) - 0.5
+        coords = np.clip(coords, 0, src_len - 1) + src_lo[:, np.newaxis]
+        lo = np.floor(coords).astype(np.intp)
+        hi = np.minimum(lo + 1, (src_hi - 1)[:, np.newaxis])
+        frac = (coords - lo).astype(np.float32)[:, :, np.newaxis]
+        return lo, hi, frac, valid
+
+    for start in range(0, len(boxes), chunk_size):
+        b = boxes[start:start + chunk_size]
+        d = dst_boxes[start:start + chunk_size]
+        y0, y1, wy, valid_y = taps(b[:, 0], b[:, 2], d[:, 0], d[:, 2], out_h)
+        x0, x1, wx, valid_x = taps(b[:, 1], b[:, 3], d[:, 1], d[:, 3], out_w)
+        # Gather with flat pixel indices; this is much faster than 2D fancy
+        # indexing.
+        y0, y1 = y0[:, :, np.newaxis] * im_w, y1[:, :, np.newaxis] * im_w
+        x0, x1 = x0[:, np.newaxis, :], x1[:, np.newaxis, :]
+        wy, wx = wy[:, :, np.newaxis], wx[:, np.newaxis, :]
+        shape = (len(b), out_h, out_w, im_k)
+        top = np.take(pixels, (y0 + x0).ravel(), axis=0).reshape(shape)
+        top += (np.take(pixels, (y0 + x1).ravel(), axis=0).reshape(shape) -
+                top) * wx
+        bottom = np.take(pixels, (y1 + x0).ravel(), axis=0).reshape(shape)
+        bottom += (np.take(pixels, (y1 + x1).ravel(), axis=0).reshape(shape) -
+                   bottom) * wx
+        top += (bottom - top) * wy
+        mask = valid_y[:, :, np.newaxis] & valid_x[:, np.newaxis, :]
+        np.copyto(out[start:start + chunk_size], top,
+                  where=mask[:, :, :, np.newaxis])
+    return out
+
+
+def oversample(images, crop_dims, out=None, channels_first=False):
     """
     Crop images into the four corners, center, and their mirrored versions.
 
@@ -345,38 +964,56 @@ def oversample(images, crop_dims):
     ----------
     image : iterable of (H x W x K) ndarrays
     crop_dims : (height, width) tuple for the crops.
+    out : optional ndarray to write the crops into, e.g. the data of the
+        net input blob.
+    channels_first : write crops as (10*N x K x H x W), the layout of a net
+        input blob, instead of (10*N x H x W x K).
 
     Returns
     -------
-    crops : (10*N x H x W x K) ndarray of crops for number of inputs N.
-    """
-    # Dimensions and center.
-    im_shape = np.array(images[0].shape)
-    crop_dims = np.array(crop_dims)
-    im_center = im_shape[:2] / 2.0
-
-    # Make crop coordinates
-    h_indices = (0, im_shape[0] - crop_dims[0])
-    w_indices = (0, im_shape[1] - crop_dims[1])
-    crops_ix = np.empty((5, 4), dtype=int)
-    curr = 0
-    for i in h_indices:
-        for j in w_indices:
-            crops_ix[curr] = (i, j, i + crop_dims[0], j + crop_dims[1])
-            curr += 1
-    crops_ix[4] = np.tile(im_center, (1, 2)) + np.concatenate([
-        -crop_dims / 2.0,
-         crop_dims / 2.0
-    ])
-    crops_ix = np.tile(crops_ix, (2, 1))
-
-    # Extract crops
-    crops = np.empty((10 * len(images), crop_dims[0], crop_dims[1],
-                      im_shape[-1]), dtype=np.float32)
-    ix = 0
-    for im in images:
-        for crop in crops_ix:
-            crops[ix] = im[crop[0]:crop[2], crop[1]:crop[3], :]
-            ix += 1
-        crops[ix-5:ix] = crops[ix-5:ix, :, ::-1, :]  # flip for mirrors
-    return crops
+    crops : (10*N x H x W x K) ndarray of crops for number of inputs N,
+        (10*N x K x H x W) if channels_first.
+    """
+    images = np.asarray(images, dtype=np.float32)
+    n, im_h, im_w, k = images.shape
+    crop_h, crop_w = int(crop_dims[0]), int(crop_dims[1])
+    if channels_first:
+        crops_shape = (10 * n, k, crop_h, crop_w)
+    else:
+        crops_shape = (10 * n, crop_h, crop_w, k)
+    if out is None:
+        out = np.empty(crops_shape, dtype=np.float32)
+    elif out.shape != crops_shape:
+        raise ValueError('out has shape %s, expected %s'
+                         % (out.shape, crops_shape))
+    elif not out.flags['C_CONTIGUOUS']:
+        raise ValueError('out must be C-contiguous')
+
+    # Mirrored crops are taken from a mirrored copy of the images: one
+    # contiguous flip of the inputs is cheaper than flipping ten strided
+    # crops.
+    mirrored = np.ascontiguousarray(images[:, :, ::-1])
+    center_y = int(im_h / 2.0 - crop_h / 2.0)
+    center_x = int(im_w / 2.0 - crop_w / 2.0)
+    crops = out.reshape((n, 10) + crops_shape[1:])
+    for offset, src, flip in ((0, images, False), (5, mirrored, True)):
+        # The four corner crops lie on a regular 2 x 2 grid, so all of them
+        # are a single strided view (N x 2 x 2 x h x w x K) of the images.
+        s_n, s_h, s_w, s_k = src.strides
+        corners = np.lib.stride_tricks.as_strided(
+            src,
+            shape=(n, 2, 2, crop_h, crop_w, k),
+            strides=(s_n, (im_h - crop_h) * s_h, (im_w - crop_w) * s_w,
+                     s_h, s_w, s_k))
+        x = im_w - center_x - crop_w if flip else center_x
+        center = src[:, center_y:center_y + crop_h, x:x + crop_w, :]
+        if channels_first:
+            corners = corners.transpose(0, 1, 2, 5, 3, 4)
+            center = center.transpose(0, 3, 1, 2)
+        for i in range(2):
+            for j in range(2):
+                # Mirroring swaps the left and right corners.
+                src_j = 1 - j if flip else j
+                crops[:, offset + 2 * i + j] = corners[:, i, src_j]
+        crops[:, offset + 4] = center
+    return out
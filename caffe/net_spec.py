@@ -44,15 +44,37 @@ def to_proto(*tops):
     """Generate a NetParameter that contains all layers needed to compute
     all arguments."""
 
-    layers = OrderedDict()
-    autonames = Counter()
-    for top in tops:
-        top.fn._to_proto(layers, {}, autonames)
     net = caffe_pb2.NetParameter()
-    net.layer.extend(layers.values())
+    _emit_layers(net, tops, {}, Counter())
     return net
 
 
+def _emit_layers(net, tops, names, autonames):
+    """Append to `net` the layers needed to compute `tops`, in one
+    topological pass.
+
+    The graph is walked depth-first with an explicit stack, visiting inputs
+    in order, so layers and automatic names come out exactly as a recursive
+    walk would produce them, without being limited by the recursion depth.
+    Each layer is written directly into `net`."""
+
+    top_names = {}
+    for top in tops:
+        # top-less layers are assigned as Functions
+        fn = top.fn if isinstance(top, Top) else top
+        stack = [(fn, 0)]
+        while stack:
+            fn, i = stack.pop()
+            if fn in top_names:
+                continue
+            if i < len(fn.inputs):
+                stack.append((fn, i + 1))
+                stack.append((fn.inputs[i].fn, 0))
+                continue
+            top_names[fn] = fn._emit(net.layer.add(), top_names, names,
+                                     autonames)
+
+
 def assign_proto(proto, name, val):
     """Assign a Python object to a protobuf message, based on the Python
     type (in recursive fashion). Lists become repeated fields/messages, dicts
@@ -93,9 +115,6 @@ class Top(object):
 
         return to_proto(self)
 
-    def _to_proto(self, layers, names, autonames):
-        return self.fn._to_proto(layers, names, autonames)
-
 
 class Function(object):
     """A Function specifies a layer, its parameters, and its inputs (which
@@ -128,16 +147,12 @@ class Function(object):
             names[top] = top.fn.type_name + str(autonames[top.fn.type_name])
         return names[top]
 
-    def _to_proto(self, layers, names, autonames):
-        if self in layers:
-            return
-        bottom_names = []
-        for inp in self.inputs:
-            inp._to_proto(layers, names, autonames)
-            bottom_names.append(layers[inp.fn].top[inp.n])
-        layer = caffe_pb2.LayerParameter()
+    def _emit(self, layer, top_names, names, autonames):
+        """Fill `layer`, whose inputs have already been emitted, and return
+        its top names."""
         layer.type = self.type_name
-        layer.bottom.extend(bottom_names)
+        layer.bottom.extend([top_names[inp.fn][inp.n]
+                             for inp in self.inputs])
 
         if self.in_place:
             layer.top.extend(layer.bottom)
@@ -156,8 +171,7 @@ class Function(object):
                         _param_names[self.type_name] + '_param'), k, v)
                 except (AttributeError, KeyError):
                     assign_proto(layer, k, v)
-
-        layers[self] = layer
+        return list(layer.top)
 
 
 class NetSpec(object):
@@ -177,12 +191,8 @@ class NetSpec(object):
 
     def to_proto(self):
         names = {v: k for k, v in six.iteritems(self.tops)}
-        autonames = Counter()
-        layers = OrderedDict()
-        for name, top in six.iteritems(self.tops):
-            top._to_proto(layers, names, autonames)
         net = caffe_pb2.NetParameter()
-        net.layer.extend(layers.values())
+        _emit_layers(net, self.tops.values(), names, Counter())
         return net
 
 
@@ -104,7 +104,7 @@ def _Net_forward(self, blobs=None, start=None, end=None, **kwargs):
 
     self._forward(start_ind, end_ind)
 
-    if "relu" in end:
+    if end is not None and "relu" in end:
         return {end: self.blobs['conv'+end[-3:]].data}
     # Unpack blobs to extract
     return {out: self.blobs[out].data for out in outputs}
@@ -253,6 +253,32 @@ def _Net_set_input_arrays(self, data, labels):
     return self._set_input_arrays(data, labels)
 
 
+def _Net_copy_from_weights(self, weights):
+    """
+    Copy weights into the net's parameters, e.g. from
+    caffe.io.cached_weights(). Like copying from a caffemodel, layers of
+    `weights` that the net does not have are ignored.
+
+    Parameters
+    ----------
+    weights: {layer name: list of ndarrays} dict.
+    """
+    params = self.params
+    for name, arrays in weights.items():
+        if name not in params:
+            continue
+        blobs = params[name]
+        if len(blobs) != len(arrays):
+            raise Exception('Incompatible number of blobs for layer %s'
+                            % name)
+        for blob, arr in zip(blobs, arrays):
+            if blob.count != arr.size:
+                raise Exception('Cannot copy param of layer %s: shape '
+                                'mismatch %s vs %s'
+                                % (name, blob.data.shape, arr.shape))
+            blob.data[...] = arr.reshape(blob.data.shape)
+
+
 def _Net_batch(self, blobs):
     """
     Batch blob lists according to net's batch size.
@@ -295,6 +321,7 @@ Net.backward = _Net_backward
 Net.forward_all = _Net_forward_all
 Net.forward_backward_all = _Net_forward_backward_all
 Net.set_input_arrays = _Net_set_input_arrays
+Net.copy_from_weights = _Net_copy_from_weights
 Net._batch = _Net_batch
 Net.inputs = _Net_inputs
 Net.outputs = _Net_outputs
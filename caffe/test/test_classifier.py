@@ -0,0 +1,87 @@
+import unittest
+import tempfile
+import os
+import numpy as np
+
+import caffe
+
+
+def classifier_net_file(batch_size):
+    """Make a small deploy net prototxt taking 8x8 color images, returning
+    the name of the (temporary) file."""
+
+    f = tempfile.NamedTemporaryFile(mode='w+', delete=False)
+    f.write("""name: 'classifier_net'
+    input: 'data' input_shape { dim: """ + str(batch_size) + """ dim: 3
+      dim: 8 dim: 8 }
+    layer { type: 'Convolution' name: 'conv' bottom: 'data' top: 'conv'
+      convolution_param { num_output: 4 kernel_size: 3
+        weight_filler { type: 'gaussian' std: 0.1 }
+        bias_filler { type: 'constant' value: 0.1 } } }
+    layer { type: 'InnerProduct' name: 'ip' bottom: 'conv' top: 'ip'
+      inner_product_param { num_output: 5
+        weight_filler { type: 'gaussian' std: 0.1 } } }
+    layer { type: 'Softmax' name: 'prob' bottom: 'ip' top: 'prob' }""")
+    f.close()
+    return f.name
+
+
+def baseline_predict(net, inputs, oversample=True):
+    """Classifier.predict() as it was before batching: resize every image
+    with resize_image(), crop, preprocess every crop and forward_all()."""
+    input_ = np.zeros((len(inputs), net.image_dims[0], net.image_dims[1],
+                       inputs[0].shape[2]), dtype=np.float32)
+    for ix, in_ in enumerate(inputs):
+        input_[ix] = caffe.io.resize_image(in_, net.image_dims)
+    if oversample:
+        input_ = caffe.io.oversample(input_, net.crop_dims)
+    else:
+        center = np.array(net.image_dims) / 2.0
+        crop = (np.tile(center, (1, 2))[0] + np.concatenate([
+            -net.crop_dims / 2.0, net.crop_dims / 2.0])).astype(int)
+        input_ = input_[:, crop[0]:crop[2], crop[1]:crop[3], :]
+    caffe_in = np.zeros(np.array(input_.shape)[[0, 3, 1, 2]],
+                        dtype=np.float32)
+    for ix, in_ in enumerate(input_):
+        caffe_in[ix] = net.transformer.preprocess(net.inputs[0], in_)
+    predictions = net.forward_all(**{net.inputs[0]: caffe_in})[
+        net.outputs[0]]
+    if oversample:
+        predictions = predictions.reshape((len(predictions) // 10, 10, -1))
+        predictions = predictions.mean(1)
+    return predictions
+
+
+class TestClassifier(unittest.TestCase):
+    def setUp(self):
+        net_file = classifier_net_file(10)
+        net = caffe.Net(net_file, caffe.TEST)
+        f = tempfile.NamedTemporaryFile(mode='w+', delete=False)
+        f.close()
+        net.save(f.name)
+        self.classifier = caffe.Classifier(
+            net_file, f.name, image_dims=(11, 13),
+            mean=np.array([0.5, 0.4, 0.3]), raw_scale=255,
+            input_scale=0.5, channel_swap=(2, 1, 0))
+        os.remove(net_file)
+        os.remove(f.name)
+        self.images = [np.random.rand(h, w, 3).astype(np.float32)
+                       for h, w in [(20, 15), (9, 30), (11, 13), (6, 7),
+                                    (40, 40)]]
+
+    def test_matches_baseline(self):
+        for oversample in (True, False):
+            predictions = self.classifier.predict(self.images, oversample)
+            self.assertEqual(predictions.shape, (len(self.images), 5))
+            np.testing.assert_allclose(
+                predictions,
+                baseline_predict(self.classifier, self.images, oversample),
+                rtol=1e-4, atol=1e-6)
+
+    def test_iterable_inputs(self):
+        for oversample in (True, False):
+            np.testing.assert_allclose(
+                self.classifier.predict((im for im in self.images),
+                                        oversample),
+                self.classifier.predict(self.images, oversample),
+                rtol=1e-6)
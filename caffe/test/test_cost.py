@@ -0,0 +1,78 @@
+import unittest
+
+import caffe
+import caffe.cost
+from caffe import layers as L
+from caffe import params as P
+from caffe.proto import caffe_pb2
+
+
+def small_net():
+    n = caffe.NetSpec()
+    n.data = L.DummyData(shape=dict(dim=[2, 3, 32, 32]))
+    n.conv = L.Convolution(n.data, kernel_size=3, pad=1, num_output=8)
+    n.relu = L.ReLU(n.conv, in_place=True)
+    n.pool = L.Pooling(n.relu, kernel_size=3, stride=2, pool=P.Pooling.MAX)
+    n.ip = L.InnerProduct(n.pool, num_output=10)
+    return n.to_proto()
+
+
+class TestNetCost(unittest.TestCase):
+    def test_costs(self):
+        costs = caffe.cost.get_net_costs(small_net())
+        self.assertEqual([cost.name for cost in costs],
+                         ['data', 'conv', 'relu', 'pool', 'ip'])
+        data, conv, relu, pool, ip = costs
+        self.assertEqual(conv.top_shapes, [(2, 8, 32, 32)])
+        self.assertEqual(conv.flops, 2 * 2 * 8 * 32 * 32 * 3 * 3 * 3)
+        self.assertEqual(conv.param_bytes, 4 * (8 * 3 * 3 * 3 + 8))
+        self.assertEqual(conv.activation_bytes, 4 * 2 * 8 * 32 * 32)
+        # in-place layers allocate nothing
+        self.assertEqual(relu.activation_bytes, 0)
+        # pooling rounds up
+        self.assertEqual(pool.top_shapes, [(2, 8, 16, 16)])
+        self.assertEqual(ip.top_shapes, [(2, 10)])
+        self.assertEqual(ip.param_bytes, 4 * (8 * 16 * 16 * 10 + 10))
+        table = caffe.cost.format_cost_table(costs)
+        self.assertEqual(len(table.splitlines()), len(costs) + 5)
+
+    def test_input_hw(self):
+        net = small_net()
+        del net.layer[0]
+        net.input.append('data')
+        net.input_dim.extend([1, 3, 32, 32])
+        costs = caffe.cost.get_net_costs(net, input_hw=(64, 48))
+        self.assertEqual(costs[0].top_shapes, [(1, 8, 64, 48)])
+
+    def test_v1_net(self):
+        net = caffe_pb2.NetParameter()
+        net.input.append('data')
+        net.input_dim.extend([1, 3, 16, 16])
+        layer = net.layers.add()
+        layer.name = 'conv'
+        layer.type = caffe_pb2.V1LayerParameter.CONVOLUTION
+        layer.bottom.append('data')
+        layer.top.append('conv')
+        layer.convolution_param.num_output = 4
+        layer.convolution_param.kernel_size.append(3)
+        layer = net.layers.add()
+        layer.name = 'relu'
+        layer.type = caffe_pb2.V1LayerParameter.RELU
+        layer.bottom.append('conv')
+        layer.top.append('conv')
+        upgraded = caffe.cost.upgrade_v1_net(net)
+        self.assertEqual([l.type for l in upgraded.layer],
+                         ['Convolution', 'ReLU'])
+        self.assertEqual([l.name for l in caffe.cost.get_net_layers(net)],
+                         ['conv', 'relu'])
+        costs = caffe.cost.get_net_costs(net)
+        self.assertEqual(costs[0].top_shapes, [(1, 4, 14, 14)])
+
+    def test_v1_type_name(self):
+        V1 = caffe_pb2.V1LayerParameter
+        self.assertEqual(caffe.cost.get_v1_type_name(V1.INNER_PRODUCT),
+                         'InnerProduct')
+        self.assertEqual(caffe.cost.get_v1_type_name(V1.SOFTMAX_LOSS),
+                         'SoftmaxWithLoss')
+        self.assertEqual(caffe.cost.get_v1_type_name(V1.HDF5_DATA),
+                         'HDF5Data')
@@ -0,0 +1,107 @@
+import unittest
+import tempfile
+import shutil
+import os
+import numpy as np
+import skimage.io
+
+import caffe
+
+
+def detector_net_file(batch_size):
+    """Make a small fully convolutional deploy net prototxt taking 8x8 color
+    windows, returning the name of the (temporary) file."""
+
+    f = tempfile.NamedTemporaryFile(mode='w+', delete=False)
+    f.write("""name: 'detector_net'
+    input: 'data' input_shape { dim: """ + str(batch_size) + """ dim: 3
+      dim: 8 dim: 8 }
+    layer { type: 'Convolution' name: 'conv' bottom: 'data' top: 'conv'
+      convolution_param { num_output: 4 kernel_size: 3
+        weight_filler { type: 'gaussian' std: 0.1 }
+        bias_filler { type: 'constant' value: 0.1 } } }
+    layer { type: 'Convolution' name: 'score' bottom: 'conv' top: 'score'
+      convolution_param { num_output: 5 kernel_size: 6
+        weight_filler { type: 'gaussian' std: 0.1 } } }""")
+    f.close()
+    return f.name
+
+
+def baseline_detect(net, images_windows):
+    """Preprocess every warped window on its own and run the windows
+    through the net one batch at a time."""
+    in_ = net.inputs[0]
+    caffe_in, windows = [], []
+    for image_fname, image_windows in images_windows:
+        image = caffe.io.load_image(image_fname)
+        for crop, window in zip(net.crop_windows(image, image_windows),
+                                image_windows):
+            caffe_in.append(net.transformer.preprocess(in_, crop))
+            windows.append((image_fname, window))
+    batch_size = net.blobs[in_].data.shape[0]
+    predictions = []
+    for start in range(0, len(caffe_in), batch_size):
+        batch = np.zeros(net.blobs[in_].data.shape, dtype=np.float32)
+        chunk = caffe_in[start:start + batch_size]
+        batch[:len(chunk)] = chunk
+        out = net.forward(**{in_: batch})[net.outputs[0]]
+        predictions.extend(out[:len(chunk)].squeeze(axis=(2, 3)))
+    return windows, np.array(predictions)
+
+
+class TestDetector(unittest.TestCase):
+    def setUp(self):
+        net_file = detector_net_file(4)
+        net = caffe.Net(net_file, caffe.TEST)
+        f = tempfile.NamedTemporaryFile(mode='w+', delete=False)
+        f.close()
+        net.save(f.name)
+        self.net_file, self.weights_file = net_file, f.name
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.images_windows = []
+        windows = [[[0, 0, 10, 10], [2, 3, 18, 20], [5, 5, 9, 24]],
+                   [[1, 1, 19, 24]],
+                   [[3, 4, 15, 15], [0, 0, 20, 25], [6, 2, 12, 9],
+                    [1, 1, 5, 5], [2, 2, 8, 8]]]
+        for i, image_windows in enumerate(windows):
+            fname = os.path.join(self.tmp_dir, 'im%d.png' % i)
+            img = (np.random.rand(20 + i, 25, 3) * 255).astype(np.uint8)
+            skimage.io.imsave(fname, img)
+            self.images_windows.append((fname, np.array(image_windows)))
+
+    def tearDown(self):
+        os.remove(self.net_file)
+        os.remove(self.weights_file)
+        shutil.rmtree(self.tmp_dir)
+
+    def detector(self, context_pad):
+        mean = np.random.rand(3, 8, 8)
+        return caffe.Detector(self.net_file, self.weights_file, mean=mean,
+                              raw_scale=255, input_scale=0.5,
+                              channel_swap=(2, 1, 0), context_pad=context_pad)
+
+    def test_matches_baseline(self):
+        for context_pad in (None, 2):
+            detector = self.detector(context_pad)
+            windows, predictions = baseline_detect(detector,
+                                                   self.images_windows)
+            detections = detector.detect_windows(
+                (fname, w) for fname, w in self.images_windows)
+            self.assertEqual(len(detections), len(windows))
+            for detection, (fname, window), prediction in zip(
+                    detections, windows, predictions):
+                self.assertEqual(detection['filename'], fname)
+                np.testing.assert_array_equal(detection['window'], window)
+                np.testing.assert_allclose(detection['prediction'],
+                                           prediction, rtol=1e-4, atol=1e-5)
+
+    def test_image_loader(self):
+        detector = self.detector(2)
+        with caffe.io.ImageLoader(n_workers=2, max_pending=2) as loader:
+            detections = detector.detect_windows(self.images_windows, loader)
+        expected = detector.detect_windows(self.images_windows)
+        self.assertEqual(len(detections), len(expected))
+        for detection, other in zip(detections, expected):
+            np.testing.assert_allclose(detection['prediction'],
+                                       other['prediction'], rtol=1e-6)
@@ -0,0 +1,313 @@
+import unittest
+import tempfile
+import shutil
+import os
+import json
+import struct
+import numpy as np
+import skimage.io
+
+import caffe
+from caffe.proto import caffe_pb2
+
+
+class TestBlobProtoConversion(unittest.TestCase):
+    def test_blobproto_round_trip(self):
+        arr = np.random.randn(2, 3, 4, 5).astype(np.float32)
+        diff = np.random.randn(2, 3, 4, 5).astype(np.float32)
+        blob = caffe.io.array_to_blobproto(arr, diff)
+        self.assertEqual(list(blob.shape.dim), [2, 3, 4, 5])
+        np.testing.assert_array_equal(np.array(blob.data), arr.flat)
+        result = caffe.io.blobproto_to_array(blob)
+        self.assertEqual(result.dtype, np.float64)
+        np.testing.assert_array_equal(result, arr)
+        np.testing.assert_array_equal(
+            caffe.io.blobproto_to_array(blob, return_diff=True), diff)
+
+    def test_unpacked_encoding(self):
+        # Writers without [packed = true] emit one (tag, value) record per
+        # element, possibly interleaved with other fields
+        def unpacked(field_number, values):
+            return b''.join(struct.pack('<Bf', field_number << 3 | 5, v)
+                            for v in values)
+        data = np.random.randn(2, 3).astype(np.float32)
+        diff = np.random.randn(2, 3).astype(np.float32)
+        serialized = (unpacked(5, data.flat[:4]) + unpacked(6, diff.flat) +
+                      unpacked(5, data.flat[4:]))
+        blob = caffe_pb2.BlobProto()
+        blob.shape.dim.extend(data.shape)
+        blob.MergeFromString(serialized)
+        np.testing.assert_array_equal(caffe.io.blobproto_to_array(blob), data)
+        np.testing.assert_array_equal(
+            caffe.io.blobproto_to_array(blob, return_diff=True), diff)
+        np.testing.assert_array_equal(
+            caffe.io._float_field_to_array(serialized, 5), data.flat)
+        np.testing.assert_array_equal(
+            caffe.io._float_field_to_array(serialized, 6), diff.flat)
+
+    def test_legacy_shape(self):
+        blob = caffe_pb2.BlobProto()
+        blob.num, blob.channels, blob.height, blob.width = 1, 2, 3, 1
+        blob.data.extend(range(6))
+        arr = caffe.io.blobproto_to_array(blob)
+        self.assertEqual(arr.shape, (1, 2, 3, 1))
+        np.testing.assert_array_equal(arr.flat, range(6))
+
+    def test_datum_round_trip(self):
+        arr = np.random.randn(3, 4, 5).astype(np.float32)
+        datum = caffe.io.array_to_datum(arr, label=7)
+        self.assertEqual(datum.label, 7)
+        np.testing.assert_array_equal(np.array(datum.float_data), arr.flat)
+        result = caffe.io.datum_to_array(datum)
+        self.assertEqual(result.dtype, np.float64)
+        np.testing.assert_array_equal(result, arr)
+
+    def test_datum_uint8_round_trip(self):
+        arr = np.random.randint(0, 256, size=(3, 4, 5)).astype(np.uint8)
+        datum = caffe.io.array_to_datum(arr)
+        self.assertEqual(datum.data, arr.tobytes())
+        result = caffe.io.datum_to_array(datum)
+        self.assertEqual(result.dtype, np.uint8)
+        np.testing.assert_array_equal(result, arr)
+        result[0, 0, 0] += 1
+
+
+class TestWeightCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.weights = {
+            'conv1': [np.random.randn(4, 3, 3, 3).astype(np.float32),
+                      np.random.randn(4).astype(np.float32)],
+            'ip': [np.random.randn(10, 36).astype(np.float32)],
+        }
+        net_param = caffe_pb2.NetParameter()
+        for name in ['conv1', 'ip']:
+            layer = net_param.layer.add()
+            layer.name = name
+            layer.blobs.extend([caffe.io.array_to_blobproto(arr)
+                                for arr in self.weights[name]])
+        self.caffemodel = os.path.join(self.tmp_dir, 'test.caffemodel')
+        with open(self.caffemodel, 'wb') as f:
+            f.write(net_param.SerializeToString())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        weights = caffe.io.cached_weights(self.caffemodel)
+        self.assertEqual(list(weights.keys()), ['conv1', 'ip'])
+        for name, arrays in self.weights.items():
+            self.assertEqual(len(weights[name]), len(arrays))
+            for cached, arr in zip(weights[name], arrays):
+                self.assertEqual(cached.dtype, np.float32)
+                np.testing.assert_array_equal(cached, arr)
+
+    def test_cache_reused(self):
+        caffe.io.cached_weights(self.caffemodel)
+        index_file = self.caffemodel + '.index'
+        mtime = os.path.getmtime(index_file)
+        caffe.io.cached_weights(self.caffemodel)
+        self.assertEqual(os.path.getmtime(index_file), mtime)
+
+    def cache_files(self):
+        return sorted(f for f in os.listdir(self.tmp_dir)
+                      if f != 'test.caffemodel')
+
+    def test_rebuild(self):
+        caffe.io.cached_weights(self.caffemodel)
+        old_files = self.cache_files()
+        self.assertEqual(len(old_files), 2)
+        mtime = os.path.getmtime(self.caffemodel)
+        os.utime(self.caffemodel, (mtime + 10, mtime + 10))
+        weights = caffe.io.cached_weights(self.caffemodel)
+        np.testing.assert_array_equal(weights['ip'][0], self.weights['ip'][0])
+        new_files = self.cache_files()
+        # the index is replaced and the old weight file removed
+        self.assertEqual(len(new_files), 2)
+        self.assertNotEqual(old_files, new_files)
+
+    def test_size_checked(self):
+        caffe.io.cached_weights(self.caffemodel)
+        with open(self.caffemodel + '.index') as f:
+            weights_file = os.path.join(self.tmp_dir, json.load(f)['weights'])
+        with open(weights_file, 'ab') as f:
+            f.write(b'\0' * 4)
+        self.assertRaises(IOError, caffe.io.load_weight_cache,
+                          self.caffemodel)
+
+    def test_failed_conversion(self):
+        blobproto_to_array = caffe.io.blobproto_to_array
+
+        def fail(blob):
+            raise RuntimeError
+        caffe.io.blobproto_to_array = fail
+        try:
+            self.assertRaises(RuntimeError, caffe.io.cached_weights,
+                              self.caffemodel)
+        finally:
+            caffe.io.blobproto_to_array = blobproto_to_array
+        self.assertEqual(self.cache_files(), [])
+
+
+class TestOversample(unittest.TestCase):
+    def setUp(self):
+        self.images = np.random.rand(3, 9, 11, 3).astype(np.float32)
+        self.crop_dims = (5, 4)
+
+    def reference_crops(self, im):
+        h, w = self.crop_dims
+        cy = int(im.shape[0] / 2.0 - h / 2.0)
+        cx = int(im.shape[1] / 2.0 - w / 2.0)
+        ys = [0, 0, im.shape[0] - h, im.shape[0] - h, cy]
+        xs = [0, im.shape[1] - w, 0, im.shape[1] - w, cx]
+        crops = [im[y:y + h, x:x + w] for y, x in zip(ys, xs)]
+        return crops + [c[:, ::-1] for c in crops]
+
+    def test_crops(self):
+        crops = caffe.io.oversample(list(self.images), self.crop_dims)
+        self.assertEqual(crops.shape, (30, 5, 4, 3))
+        for n, im in enumerate(self.images):
+            for c, ref in enumerate(self.reference_crops(im)):
+                np.testing.assert_array_equal(crops[10 * n + c], ref)
+
+    def test_channels_first_out(self):
+        crops = caffe.io.oversample(self.images, self.crop_dims)
+        out = np.zeros((30, 3, 5, 4), dtype=np.float32)
+        ret = caffe.io.oversample(self.images, self.crop_dims, out=out,
+                                  channels_first=True)
+        self.assertIs(ret, out)
+        np.testing.assert_array_equal(out, crops.transpose(0, 3, 1, 2))
+
+
+class TestTransformerFold(unittest.TestCase):
+    def setUp(self):
+        self.transformer = caffe.io.Transformer({'data': (1, 3, 5, 4)})
+        self.transformer.set_transpose('data', (2, 0, 1))
+        self.transformer.set_channel_swap('data', (2, 1, 0))
+        self.transformer.set_raw_scale('data', 255)
+        self.transformer.set_input_scale('data', 0.5)
+        self.image = np.random.rand(5, 4, 3).astype(np.float32)
+
+    def folded(self):
+        swap, scale, channel_offset, offset = self.transformer.fold('data')
+        caffe_in = self.image[..., swap] * scale - channel_offset
+        caffe_in = caffe_in.transpose(2, 0, 1)
+        if offset is not None:
+            caffe_in -= offset
+        return caffe_in
+
+    def test_channel_mean(self):
+        self.transformer.set_mean('data', np.array([104., 117., 123.]))
+        np.testing.assert_allclose(
+            self.folded(), self.transformer.preprocess('data', self.image),
+            rtol=1e-5, atol=1e-3)
+
+    def test_elementwise_mean(self):
+        self.transformer.set_mean('data', 255 * np.random.rand(3, 5, 4))
+        np.testing.assert_allclose(
+            self.folded(), self.transformer.preprocess('data', self.image),
+            rtol=1e-5, atol=1e-3)
+
+
+class TestResizeImages(unittest.TestCase):
+    def test_identity(self):
+        images = np.random.rand(2, 7, 9, 3).astype(np.float32)
+        resized = caffe.io.resize_images(images, (7, 9))
+        np.testing.assert_allclose(resized, images, atol=1e-6)
+
+    def test_matches_resize_image(self):
+        # 1 and 3 channels go through skimage, other counts through ndimage
+        dims = [((30, 40), (20, 25)), ((10, 10), (4, 6)),
+                ((7, 9), (15, 20)), ((30, 40), (45, 17)), ((5, 1), (9, 3))]
+        for k in (1, 3, 4):
+            for (h, w), new_dims in dims:
+                images = [np.random.rand(h, w, k).astype(np.float32)
+                          for _ in range(2)]
+                for order in (0, 1):
+                    resized = caffe.io.resize_images(images, new_dims,
+                                                     interp_order=order)
+                    self.assertEqual(resized.shape, (2,) + new_dims + (k,))
+                    self.assertEqual(resized.dtype, np.float32)
+                    for im, res in zip(images, resized):
+                        ref = caffe.io.resize_image(im, new_dims, order)
+                        np.testing.assert_allclose(res, ref, atol=1e-5)
+
+    def test_any_channels(self):
+        images = np.random.rand(2, 10, 10, 5).astype(np.float32)
+        for order in (0, 1):
+            resized = caffe.io.resize_images(images, (4, 6),
+                                             interp_order=order)
+            self.assertEqual(resized.shape, (2, 4, 6, 5))
+
+    def test_crop(self):
+        images = np.random.rand(2, 30, 40, 3).astype(np.float32)
+        for order in (0, 1):
+            full = caffe.io.resize_images(images, (20, 25),
+                                          interp_order=order)
+            crop = caffe.io.resize_images(images, (20, 25),
+                                          interp_order=order,
+                                          crop=(3, 4, 10, 12))
+            np.testing.assert_array_equal(crop, full[:, 3:13, 4:16])
+
+
+def linear_resize(im, new_dims):
+    """Separable linear resampling with aligned pixel centers and clamped
+    edges."""
+    for axis, new_size in enumerate(new_dims):
+        size = im.shape[axis]
+        coords = (np.arange(new_size) + 0.5) * size / float(new_size) - 0.5
+        im = np.apply_along_axis(
+            lambda line: np.interp(coords, np.arange(size), line), axis, im)
+    return im
+
+
+class TestCropAndResize(unittest.TestCase):
+    def test_regions(self):
+        im = np.random.rand(20, 30, 3).astype(np.float32)
+        boxes = [[0, 0, 20, 30], [5, 10, 9, 14]]
+        dst_boxes = [[0, 0, 8, 8], [2, 3, 6, 7]]
+        out = np.full((2, 8, 8, 3), -1, dtype=np.float32)
+        caffe.io.crop_and_resize(im, boxes, dst_boxes, out)
+        # Same-size regions are copied exactly.
+        np.testing.assert_allclose(out[1, 2:6, 3:7], im[5:9, 10:14],
+                                   atol=1e-6)
+        # Pixels outside the target regions are untouched.
+        self.assertTrue(np.all(out[1, :2] == -1))
+        self.assertTrue(np.all(out[1, :, :3] == -1))
+        np.testing.assert_allclose(out[0], linear_resize(im, (8, 8)),
+                                   atol=1e-5)
+
+    def test_invalid_boxes(self):
+        im = np.random.rand(20, 30, 3).astype(np.float32)
+        out = np.zeros((1, 8, 8, 3), dtype=np.float32)
+        # e.g. a window below the image, clipped to it
+        for box in [[20, 5, 20, 9], [5, 9, 9, 9], [8, 4, 5, 9],
+                    [-1, 0, 5, 5], [0, 0, 21, 5], [0, 25, 5, 31]]:
+            with self.assertRaises(ValueError):
+                caffe.io.crop_and_resize(im, [box], [[0, 0, 8, 8]], out)
+
+
+class TestImageLoader(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fnames = []
+        for i in range(5):
+            fname = os.path.join(self.tmp_dir, 'im%d.png' % i)
+            img = (np.random.rand(20 + i, 10, 3) * 255).astype(np.uint8)
+            skimage.io.imsave(fname, img)
+            self.fnames.append(fname)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_ordered(self):
+        with caffe.io.ImageLoader(n_workers=2, max_pending=2) as loader:
+            images = loader.load(self.fnames)
+        self.assertEqual(len(images), len(self.fnames))
+        for fname, img in zip(self.fnames, images):
+            np.testing.assert_array_equal(img, caffe.io.load_image(fname))
+
+    def test_load_images(self):
+        images = caffe.io.load_images(self.fnames, n_workers=2)
+        self.assertEqual([img.shape[0] for img in images],
+                         [20, 21, 22, 23, 24])
@@ -79,3 +79,38 @@ class TestNetSpec(unittest.TestCase):
         net_proto = silent_net()
         net = self.load_net(net_proto)
         self.assertEqual(len(net.forward()), 0)
+
+    def test_deep_net(self):
+        """Test proto generation for nets deeper than the recursion limit."""
+
+        n = caffe.NetSpec()
+        n.data = L.DummyData(shape=dict(dim=[1, 1, 4, 4]))
+        top = n.data
+        for _ in range(3000):
+            top = L.Power(top, power=2)
+        n.out = top
+        net_proto = n.to_proto()
+        self.assertEqual(len(net_proto.layer), 3001)
+        for prev, layer in zip(net_proto.layer, net_proto.layer[1:]):
+            self.assertEqual(layer.bottom, prev.top)
+            self.assertEqual(layer.power_param.power, 2)
+        self.assertEqual(net_proto.layer[-1].top[0], 'out')
+        # emitting twice gives the same net
+        self.assertEqual(str(n.to_proto()), str(net_proto))
+
+    def test_changed_params(self):
+        """Test that changing layer params after to_proto() is picked up."""
+
+        n = caffe.NetSpec()
+        n.data = L.DummyData(shape=dict(dim=[1, 1, 4, 4]))
+        n.conv = L.Convolution(n.data, kernel_size=3, num_output=2)
+        self.assertEqual(n.to_proto().layer[1].convolution_param.num_output, 2)
+        n.conv.fn.params['num_output'] = 4
+        n.conv.fn.params['pad'] = 1
+        conv_param = n.to_proto().layer[1].convolution_param
+        self.assertEqual(conv_param.num_output, 4)
+        self.assertEqual(list(conv_param.pad), [1])
+        n.conv.fn.params = dict(kernel_size=1, num_output=8)
+        conv_param = n.to_proto().layer[1].convolution_param
+        self.assertEqual(conv_param.num_output, 8)
+        self.assertEqual(list(conv_param.pad), [])
@@ -0,0 +1,87 @@
+import unittest
+import os
+
+from caffe.proto import caffe_pb2
+from caffe_style import style_net_plan
+
+
+def vgg_like_layers(v1=False):
+    """conv1 relu1 conv2 relu2 conv3 relu3 fc relu_fc as V1 or V2 layers."""
+    net = caffe_pb2.NetParameter()
+    types = ['Convolution', 'ReLU'] * 3 + ['InnerProduct', 'ReLU']
+    v1_types = dict(Convolution='CONVOLUTION', ReLU='RELU',
+                    InnerProduct='INNER_PRODUCT')
+    for i, layer_type in enumerate(types):
+        if v1:
+            layer = net.layers.add()
+            layer.type = caffe_pb2.V1LayerParameter.LayerType.Value(
+                v1_types[layer_type])
+        else:
+            layer = net.layer.add()
+            layer.type = layer_type
+        layer.name = 'layer%d' % i
+    return net
+
+
+class TestStyleNetPlan(unittest.TestCase):
+    def test_layer_type_name(self):
+        for v1 in (False, True):
+            layers = style_net_plan.net_layers(vgg_like_layers(v1))
+            self.assertEqual(
+                [style_net_plan.layer_type_name(l) for l in layers[:3]],
+                ['Convolution', 'ReLU', 'Convolution'])
+            self.assertEqual(style_net_plan.layer_type_name(layers[6]),
+                             'InnerProduct')
+        # same names as caffe.cost for types outside the VGG nets
+        layer = caffe_pb2.V1LayerParameter()
+        layer.type = caffe_pb2.V1LayerParameter.SOFTMAX_LOSS
+        self.assertEqual(style_net_plan.layer_type_name(layer),
+                         'SoftmaxWithLoss')
+
+    def test_used_layers_len(self):
+        layers = style_net_plan.net_layers(vgg_like_layers())
+        self.assertEqual(
+            style_net_plan.used_layers_len(layers, [0, 1, 0], [1, 0, 0]), 4)
+        self.assertEqual(
+            style_net_plan.used_layers_len(layers, [0, 0, 0], [0, 0, 1]), 6)
+        self.assertEqual(
+            style_net_plan.used_layers_len(layers, [0, 0, 0], [0, 0, 0]), 0)
+        # stops at the first InnerProduct
+        self.assertEqual(
+            style_net_plan.used_layers_len(layers, [0, 0, 0, 1],
+                                           [0, 0, 0, 1]), 0)
+
+    def test_truncate_net_param(self):
+        for v1 in (False, True):
+            net = vgg_like_layers(v1)
+            truncated = style_net_plan.truncate_net_param(net, 4)
+            layers = style_net_plan.net_layers(truncated)
+            self.assertEqual([l.name for l in layers],
+                             ['layer0', 'layer1', 'layer2', 'layer3'])
+            self.assertTrue(truncated.force_backward)
+            # the input message is left alone
+            self.assertEqual(len(style_net_plan.net_layers(net)), 8)
+            for l in layers:
+                if style_net_plan.layer_type_name(l) != 'Convolution':
+                    continue
+                if v1:
+                    self.assertEqual(list(l.blobs_lr), [0, 0])
+                else:
+                    self.assertEqual([p.lr_mult for p in l.param], [0, 0])
+
+    def test_truncate_keep_params(self):
+        truncated = style_net_plan.truncate_net_param(vgg_like_layers(), 2,
+                                                      freeze_params=False)
+        self.assertEqual(len(truncated.layer[0].param), 0)
+
+    def test_write_read_round_trip(self):
+        net = style_net_plan.truncate_net_param(vgg_like_layers(), 6)
+        with style_net_plan.net_param_file(net) as fname:
+            self.assertEqual(style_net_plan.read_net_param(fname), net)
+        self.assertFalse(os.path.exists(fname))
+
+    def test_net_param_file_removed_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with style_net_plan.net_param_file(vgg_like_layers()) as fname:
+                raise RuntimeError
+        self.assertFalse(os.path.exists(fname))
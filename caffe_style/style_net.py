@@ -1,6 +1,8 @@
 import numpy as np
 import caffe
 from style_parameter import StyleParameter
+from style_net_plan import (read_net_param, net_layers, used_layers_len,
+                            truncate_net_param, net_param_file)
 from math import ceil
 from debug_logger import Logger
 from copy import deepcopy
@@ -26,9 +28,23 @@ def weight_array(weights):
 
 class StyleNet(caffe.Net):
     def __init__(self, prototxt, params_file, subject_img, style_img, subject_weights, style_weights, subject_ratio,
-                 layers=None, init_img=None, mean=None, channel_swap=None, init_noise=0.0):
-
-        caffe.Net.__init__(self, prototxt, params_file, caffe.TEST)
+                 layers=None, init_img=None, mean=None, channel_swap=None, init_noise=0.0,
+                 weight_cache=None):
+
+        # Only build the net up to the deepest weighted layer; the remaining
+        # layers (and their weights) are never used.
+        net_param = read_net_param(prototxt)
+        layers_len = used_layers_len(
+            net_layers(net_param),
+            weight_array(subject_weights) * subject_ratio,
+            weight_array(style_weights))
+        self.net_param = truncate_net_param(net_param, layers_len)
+        with net_param_file(self.net_param) as truncated_prototxt:
+            caffe.Net.__init__(self, truncated_prototxt, caffe.TEST)
+        # Weights come from a memory-mapped cache of the caffemodel, which
+        # is built on first use and shared by all processes afterwards.
+        self.copy_from_weights(caffe.io.cached_weights(params_file,
+                                                       weight_cache))
         self.logger = Logger("caffe_style", True, 0)
 
         self.input_name = self._blob_names[0]
@@ -60,23 +76,20 @@ class StyleNet(caffe.Net):
 
         if layers is None:
             layers = self.layers
+        # Discard unused layers
+        layers = layers[:layers_len]
+        self._layers = layers
 
         # Map weights (in convolution indices) to layer indices
         subject_weights = weight_array(subject_weights) * subject_ratio
         style_weights = weight_array(style_weights)
         self.subject_weights = np.zeros(len(layers))
         self.style_weights = np.zeros(len(layers))
-        layers_len = 0
         conv_idx = 0
         for l, layer in enumerate(layers):
-            if layer.type == "InnerProduct":
-                break
             if layer.type == "ReLU":
                 self.subject_weights[l] = subject_weights[conv_idx]
                 self.style_weights[l] = style_weights[conv_idx]
-                if subject_weights[conv_idx] > 0 or \
-                                style_weights[conv_idx] > 0:
-                    layers_len = l + 1
                 conv_idx += 1
 
         subject_img = self.transformer.preprocess(
@@ -89,10 +102,6 @@ class StyleNet(caffe.Net):
             size=init_img.shape, scale=np.std(init_img) * 1e-1)
         init_img = init_img * (1 - init_noise) + noise * init_noise
 
-        # Discard unused layers
-        layers = layers[:layers_len]
-        self._layers = layers
-
         # Setup network
         x_shape = init_img.shape
         self.x = StyleParameter(init_img)
@@ -120,11 +129,8 @@ class StyleNet(caffe.Net):
         next_subject = subject_img
         next_style = style_img
 
-        next_subjects = []
         layer_idx = - 1
         for l, layer in enumerate(layers):
-            if layer.type == "InnerProduct":
-                break
             if layer.type != "ReLU":
                 layer_idx += 1
             if layer.type == "Convolution":
@@ -146,7 +152,6 @@ class StyleNet(caffe.Net):
                     self.logger.trace("forward result[%-10s](%s): %s" % (self._layer_names[l],
                                                                          next_subject.shape, str(next_subject[0])[:40]))
                     self.logger.trace("%s %s %s" % (l, curr_layer_name, next_subject.shape))
-                    next_subjects.append(next_subject)
                     self.logger.debug("next_subject[%-10s]: %s" % (curr_layer_name, str(next_subject)[:60]))
                     self.logger.trace("forward start[%-10s](%s): %s" % ('data' if l == 0 else self._layer_names[l - 1],
                                                                         next_style.shape, str(next_style[0])[:40]))
@@ -282,8 +287,6 @@ class StyleNet(caffe.Net):
         next_x = self.fprop(subj_shape, last_blob_name, blob_name, blob_name, next_x)
         layer_idx = -1
         for l, layer in enumerate(self.reduced_layers):
-            if layer.type == "InnerProduct":
-                break
             if layer.type != "ReLU":
                 layer_idx += 1
             if layer.type == "Convolution":
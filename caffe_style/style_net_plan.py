@@ -0,0 +1,93 @@
+"""Truncation of the style transfer net.
+
+StyleNet only needs the layers up to the deepest ReLU that carries a subject
+or style weight, so the net is built from a copy of the prototxt that stops
+there; the layers after it and their weights are never allocated.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+from caffe.proto import caffe_pb2
+from caffe.cost import get_v1_type_name
+from google.protobuf import text_format
+
+
+def layer_type_name(layer):
+    """Return the type of a V1 or V2 layer parameter as its V2 string."""
+    if isinstance(layer, caffe_pb2.V1LayerParameter):
+        return get_v1_type_name(layer.type)
+    return layer.type
+
+
+def net_layers(net_param):
+    """Return the layer list of a NetParameter (V1 `layers` or V2 `layer`)."""
+    if len(net_param.layer):
+        return net_param.layer
+    return net_param.layers
+
+
+def read_net_param(prototxt):
+    net_param = caffe_pb2.NetParameter()
+    with open(prototxt) as f:
+        text_format.Merge(f.read(), net_param)
+    return net_param
+
+
+def used_layers_len(layers, subject_weights, style_weights):
+    """Number of leading layers needed to reach the deepest weighted ReLU.
+
+    `subject_weights` and `style_weights` are indexed by convolution index.
+    """
+    layers_len = 0
+    conv_idx = 0
+    for l, layer in enumerate(layers):
+        layer_type = layer_type_name(layer)
+        if layer_type == "InnerProduct":
+            break
+        if layer_type == "ReLU":
+            if subject_weights[conv_idx] > 0 or style_weights[conv_idx] > 0:
+                layers_len = l + 1
+            conv_idx += 1
+    return layers_len
+
+
+def truncate_net_param(net_param, layers_len, freeze_params=True):
+    """Return a copy of `net_param` holding only its first `layers_len` layers.
+
+    With `freeze_params` every parameter blob gets a zero learning rate so
+    that Caffe skips weight gradients; only the bottom diffs needed to
+    propagate down to the input image are computed.
+    """
+    truncated = caffe_pb2.NetParameter()
+    truncated.CopyFrom(net_param)
+    layers = net_layers(truncated)
+    del layers[layers_len:]
+    if freeze_params:
+        for layer in layers:
+            if layer_type_name(layer) not in ('Convolution', 'InnerProduct'):
+                continue
+            if isinstance(layer, caffe_pb2.V1LayerParameter):
+                del layer.blobs_lr[:]
+                layer.blobs_lr.extend([0, 0])
+            else:
+                del layer.param[:]
+                for _ in range(2):
+                    layer.param.add().lr_mult = 0
+    truncated.force_backward = True
+    return truncated
+
+
+@contextmanager
+def net_param_file(net_param):
+    """Write `net_param` to a temporary prototxt and yield its file name.
+
+    The file is removed on exit, also when writing or using it fails.
+    """
+    fd, fname = tempfile.mkstemp(suffix='.prototxt')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text_format.MessageToString(net_param))
+        yield fname
+    finally:
+        os.remove(fname)
+
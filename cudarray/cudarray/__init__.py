@@ -38,5 +38,9 @@ if _backend == 'cuda':
 if _backend == 'numpy':
     from .numpy_backend import *
 
+from . import bufferpool
+from . import fusion
+from . import transfer
+
 
 __version__ = '0.1.dev'
@@ -1,15 +1,18 @@
 import numpy as np
 import cudarray
 from .wrap import array_ops
+from . import helpers
 
 
-def transpose(a):
-    if a.ndim != 2:
-        raise ValueError('transpose is implemented for 2D arrays only')
-    a_trans = a.view()
-    a_trans.shape = (a.shape[1], a.shape[0])
-    a_trans.transposed = True
-    return a_trans
+def transpose(a, axes=None):
+    if axes is None:
+        axes = tuple(reversed(range(a.ndim)))
+    else:
+        axes = tuple(a_ + a.ndim if a_ < 0 else a_ for a_ in axes)
+        if sorted(axes) != list(range(a.ndim)):
+            raise ValueError("axes don't match array")
+    return a._view(tuple(a.shape[i] for i in axes),
+                   tuple(a.strides[i] for i in axes), 0)
 
 
 def reshape(a, newshape):
@@ -26,9 +29,7 @@ def reshape(a, newshape):
             newshape = tuple(newshape)
         else:
             raise ValueError('cannot reshape %s to %s' % (a.shape, newshape))
-    a_reshaped = a.view()
-    a_reshaped.shape = newshape
-    return a_reshaped
+    return a._view(newshape, helpers.contiguous_strides(newshape), 0)
 
 
 def copyto(dst, src):
@@ -40,24 +41,38 @@ def copyto(dst, src):
     if isinstance(src, np.ndarray):
         if isinstance(dst, np.ndarray):
             np.copyto(dst, src)
-        else:
-            dst = ascontiguousarray(dst)
+        elif dst.iscontiguous():
+            src = np.ascontiguousarray(src)
             array_ops._to_device(src, n, dst._data)
+        else:
+            copyto(dst, cudarray.array(src))
     else:
-        src = ascontiguousarray(src)
         if isinstance(dst, np.ndarray):
+            src = ascontiguousarray(src)
             array_ops._to_host(src._data, n, dst)
-        else:
-            dst = ascontiguousarray(dst)
+        elif src.iscontiguous() and dst.iscontiguous():
             array_ops._copy(src._data, n, dst._data)
+        else:
+            _copy_strided(src, dst)
+
+
+def _copy_strided(src, dst):
+    shape, (src_strides, dst_strides) = helpers.coalesce_axes(
+        src.shape, src.strides, dst.strides
+    )
+    array_ops._copy_strided(src._data, shape, src_strides, dst_strides,
+                            dst._data)
 
 
 def ascontiguousarray(a):
-    if not a.transposed:
+    if a.iscontiguous():
         return a
-    out = cudarray.empty_like(a)
-    n, m = a.shape
-    array_ops._transpose(a._data, m, n, out._data)
+    out = cudarray.bufferpool.empty(a.shape, dtype=a.dtype)
+    if a.transposed:
+        n, m = a.shape
+        array_ops._transpose(a._data, m, n, out._data)
+    else:
+        _copy_strided(a, out)
     return out
 
 
@@ -1,44 +1,78 @@
-import numpy as np
 import cudarray as ca
 from ..wrap import blas
-from ..linalg import matmul_shape
+from ..helpers import batch_matmul_shape
+
+
+def _blas_operand(x, trans):
+    """ The transpose flag with which BLAS can read the matrices of x in
+    place, or None if x has to be copied to a contiguous array first. """
+    if x.iscontiguous():
+        return trans
+    rows, cols = x.shape[-2:]
+    if (x.strides[-2:] == (1, rows)
+            and (x.ndim == 2 or x.strides[0] == rows*cols)):
+        # Transposed view of contiguous matrices
+        return not trans
+    return None
 
 
 class Dot(object):
-    def __init__(self, a, b, out=None):
-        self.batch_size = a.shape[0]
-        self.a = a
-        self.b = b
+    """ Batched matrix product out[i] = op(a[i]) op(b[i]) where op()
+    optionally transposes the matrix. A 2D a or b is shared by all batch
+    elements. The BLAS batch is set up once and perform() can be called
+    repeatedly as the contents of a and b change. """
+    def __init__(self, a, b, out=None, trans_a=False, trans_b=False):
         if a.dtype != b.dtype:
             raise ValueError('dtype mismatch')
-        out_shape = (self.batch_size,) + matmul_shape(a.shape[1:], b.shape[1:])
+        self.batch_size, m, n, k = batch_matmul_shape(a.shape, b.shape,
+                                                      trans_a, trans_b)
+        out_shape = (self.batch_size, m, n)
         if out is None:
-            out = base.empty(out_shape, dtype=a.dtype)
+            out = ca.empty(out_shape, dtype=a.dtype)
         else:
             if out_shape != out.shape:
                 raise ValueError('out.shape does not match result')
             if a.dtype != out.dtype:
                 raise ValueError('dtype mismatch')
+        self.a = a
+        self.b = b
         self.out = out
-        a_stride = np.prod(a.shape[1:])
-        b_stride = np.prod(b.shape[1:])
-        out_stride = np.prod(out.shape[1:])
+
+        # Operands that BLAS cannot read in place are copied on each perform()
+        self._a_buf = self._b_buf = self._out_buf = None
+        trans_a_ = _blas_operand(a, trans_a)
+        if trans_a_ is None:
+            self._a_buf = a = ca.empty(a.shape, dtype=a.dtype)
+            trans_a_ = trans_a
+        trans_b_ = _blas_operand(b, trans_b)
+        if trans_b_ is None:
+            self._b_buf = b = ca.empty(b.shape, dtype=b.dtype)
+            trans_b_ = trans_b
+        if not out.iscontiguous():
+            self._out_buf = out = ca.empty(out.shape, dtype=out.dtype)
+
+        # Shared 2D operands have batch stride 0
+        a_stride = m*k if a.ndim == 3 else 0
+        b_stride = k*n if b.ndim == 3 else 0
         self.blas_batch = blas.BLASBatch_f(
             a._data, b._data, out._data, self.batch_size, a_stride, b_stride,
-            out_stride
+            m*n
         )
-        if a.ndim == b.ndim == 3:
-            m, k = a.shape[1:3]
-            n = b.shape[2]
-
-            def fun():
-                self.blas_batch.gemm(blas.no_trans_op, blas.no_trans_op, m, n,
-                                     k, 1.0, 0.0)
-                return self.out
-            self.perform = fun
-        else:
-            raise ValueError('invalid array dimensionality')
+        self._trans_a = blas.trans_op if trans_a_ else blas.no_trans_op
+        self._trans_b = blas.trans_op if trans_b_ else blas.no_trans_op
+        self._mnk = m, n, k
+
+    def perform(self):
+        if self._a_buf is not None:
+            ca.copyto(self._a_buf, self.a)
+        if self._b_buf is not None:
+            ca.copyto(self._b_buf, self.b)
+        m, n, k = self._mnk
+        self.blas_batch.gemm(self._trans_a, self._trans_b, m, n, k, 1.0, 0.0)
+        if self._out_buf is not None:
+            ca.copyto(self.out, self._out_buf)
+        return self.out
 
 
-def dot(a, b, out=None):
-    return Dot(a, b, out).perform()
+def dot(a, b, out=None, trans_a=False, trans_b=False):
+    return Dot(a, b, out, trans_a, trans_b).perform()
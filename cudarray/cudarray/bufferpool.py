@@ -0,0 +1,156 @@
+"""
+Size-bucketed pool of array buffers for temporaries.
+
+Inside a scope, cudarray operations that are not given an output array take
+it from the pool instead of allocating:
+
+    with ca.bufferpool.scope():
+        y = ca.dot(a, b) + c
+        ...
+
+When the scope exits, every buffer handed out inside it goes back to the
+pool, so arrays created in the scope must not be used afterwards (copy
+results that should outlive it). Outside of any scope, allocation is
+unchanged. Buffer sizes are rounded up to powers of two such that buffers
+are reused across similar shapes.
+
+Scopes belong to the thread that opened them; the free buffers are shared
+by all threads.
+
+With the CUDA back-end, the array operations, reductions, dot products and
+nnet ops draw from the pool. With the NumPy back-end, cudarray functions
+are NumPy's own, so only the nnet ops and fused expressions (fusion) do;
+NumPy allocates every other result itself.
+"""
+import contextlib
+import threading
+import numpy as np
+import cudarray
+from . import helpers
+
+
+_min_bucket = 256
+
+
+def _bucket(nbytes):
+    bucket = _min_bucket
+    while bucket < nbytes:
+        bucket *= 2
+    return bucket
+
+
+def _numpy_alloc(nbytes):
+    return np.empty(nbytes, dtype=np.uint8)
+
+
+def _numpy_dtype(dtype):
+    return np.dtype(np.float64 if dtype is None else dtype)
+
+
+def _numpy_view(buf, shape, dtype):
+    dtype = _numpy_dtype(dtype)
+    nbytes = helpers.prod(shape)*dtype.itemsize
+    return buf[:nbytes].view(dtype).reshape(shape)
+
+
+def _cuda_alloc(nbytes):
+    from .wrap.array_data import ArrayData
+    return ArrayData(nbytes, np.dtype(np.uint8))
+
+
+def _cuda_dtype(dtype):
+    from .cudarray import normalize_dtype
+    return normalize_dtype(dtype)
+
+
+def _cuda_view(buf, shape, dtype):
+    from .wrap.array_data import ArrayData
+    data = ArrayData(helpers.prod(shape), _cuda_dtype(dtype), owner=buf)
+    return cudarray.ndarray(shape, dtype, array_data=data)
+
+
+class BufferPool(object):
+    def __init__(self):
+        # Free buffers by bucket size
+        self._free = {}
+        # Guards the free buffers and the statistics
+        self._lock = threading.Lock()
+        # Per thread, one list of (bucket, buffer) per open scope
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_outstanding = 0
+        self.bytes_pooled = 0
+
+    def _backend(self):
+        if cudarray._backend == 'cuda':
+            return _cuda_alloc, _cuda_dtype, _cuda_view
+        return _numpy_alloc, _numpy_dtype, _numpy_view
+
+    def _scopes(self):
+        scopes = getattr(self._local, 'scopes', None)
+        if scopes is None:
+            scopes = self._local.scopes = []
+        return scopes
+
+    def empty(self, shape, dtype=None):
+        """ Like cudarray.empty(); pooled if a scope is open in the calling
+        thread. """
+        scopes = self._scopes()
+        if not scopes:
+            return cudarray.empty(shape, dtype=dtype)
+        alloc, normalize_dtype, view = self._backend()
+        shape = tuple(helpers.require_iterable(shape))
+        itemsize = normalize_dtype(dtype).itemsize
+        bucket = _bucket(helpers.prod(shape)*itemsize)
+        with self._lock:
+            free = self._free.get(bucket)
+            if free:
+                buf = free.pop()
+                self.hits += 1
+                self.bytes_pooled -= bucket
+            else:
+                buf = None
+                self.misses += 1
+            self.bytes_outstanding += bucket
+        if buf is None:
+            buf = alloc(bucket)
+        scopes[-1].append((bucket, buf))
+        return view(buf, shape, dtype)
+
+    @contextlib.contextmanager
+    def scope(self):
+        """ Return the buffers handed out in the scope when it exits. """
+        scopes = self._scopes()
+        scopes.append([])
+        try:
+            yield self
+        finally:
+            buffers = scopes.pop()
+            with self._lock:
+                for bucket, buf in buffers:
+                    self._free.setdefault(bucket, []).append(buf)
+                    self.bytes_outstanding -= bucket
+                    self.bytes_pooled += bucket
+
+    def clear(self):
+        """ Release the free buffers. """
+        with self._lock:
+            self._free = {}
+            self.bytes_pooled = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bytes_outstanding': self.bytes_outstanding,
+                'bytes_pooled': self.bytes_pooled,
+            }
+
+
+_pool = BufferPool()
+empty = _pool.empty
+scope = _pool.scope
+clear = _pool.clear
+stats = _pool.stats
@@ -11,30 +11,27 @@ class ndarray(object):
                  array_owner=None):
         shape = helpers.require_iterable(shape)
         self.shape = shape
-        self.transposed = False
         self.isbool = False
-        if dtype is None:
-            if np_data is None:
-                dtype = np.dtype(base.float_)
-            else:
-                dtype = np_data.dtype
-        if dtype == np.dtype('float64'):
-            dtype = np.dtype(base.float_)
-        elif dtype == np.dtype('int64'):
-            dtype = np.dtype(base.int_)
-        elif dtype == np.dtype('bool'):
-            dtype = np.dtype(base.bool_)
+        if dtype is None and np_data is not None:
+            dtype = np_data.dtype
+        if dtype is not None and np.dtype(dtype) == np.dtype('bool'):
             self.isbool = True
+        dtype = normalize_dtype(dtype)
         if np_data is not None:
             np_data = np.require(np_data, dtype=dtype, requirements='C')
         if array_data is None:
             self._data = ArrayData(self.size, dtype, np_data)
         else:
             self._data = array_data
+        # Views address their elements relative to the memory of the array
+        # they were created from.
+        self._base = self._data
+        self._offset = 0
 
     def __array__(self):
+        a = base.ascontiguousarray(self)
         np_array = np.empty(self.shape, dtype=self.dtype)
-        self._data.to_numpy(np_array)
+        a._data.to_numpy(np_array)
         if self.isbool:
             np_array = np_array.astype(np.dtype('bool'))
         return np_array
@@ -48,6 +45,18 @@ class ndarray(object):
     def _same_array(self, other):
         return self.data == other.data
 
+    @property
+    def shape(self):
+        return self._shape
+
+    @shape.setter
+    def shape(self, shape):
+        if hasattr(self, '_shape') and not self.iscontiguous():
+            raise AttributeError('incompatible shape for in-place '
+                                 'modification; use reshape()')
+        self._shape = tuple(shape)
+        self.strides = helpers.contiguous_strides(self._shape)
+
     @property
     def data(self):
         return self._data.data
@@ -76,11 +85,47 @@ class ndarray(object):
     def T(self):
         return base.transpose(self)
 
+    @property
+    def transposed(self):
+        """ Whether the array is the transpose of a C-contiguous 2D array. """
+        return (self.ndim == 2 and not self.iscontiguous() and
+                self.strides == (1, self.shape[0]))
+
+    def iscontiguous(self):
+        return all(stride == contiguous_stride
+                   for dim, stride, contiguous_stride
+                   in zip(self.shape, self.strides,
+                          helpers.contiguous_strides(self.shape))
+                   if dim > 1)
+
+    def transpose(self, *axes):
+        if len(axes) == 1 and not isinstance(axes[0], int):
+            axes = axes[0]
+        return base.transpose(self, axes or None)
+
     def view(self):
-        return ndarray(self.shape, self.dtype, None, self._data)
+        return self._view(self.shape, self.strides, 0)
+
+    def _view(self, shape, strides, offset):
+        """ View of the elements at offset with the given shape and element
+        strides, both relative to this array. """
+        offset += self._offset
+        data = ArrayData(helpers.prod(shape), self.dtype, owner=self._base,
+                         offset=offset)
+        view = ndarray(shape, self.dtype, array_data=data)
+        view.strides = tuple(strides)
+        view.isbool = self.isbool
+        view._base = self._base
+        view._offset = offset
+        return view
 
     def fill(self, value):
-        array_ops._fill(self._data, self.size, value)
+        if self.iscontiguous():
+            array_ops._fill(self._data, self.size, value)
+        else:
+            tmp = empty(self.shape, dtype=self.dtype)
+            tmp.fill(value)
+            base.copyto(self, tmp)
 
     def __len__(self):
         return self.shape[0]
@@ -164,71 +209,73 @@ class ndarray(object):
         return elementwise.negative(self, self)
 
     def __getitem__(self, indices):
-        if isinstance(indices, int):
-            # Speedup case with a single index
-            view_shape = self.shape[1:]
-            view_size = helpers.prod(view_shape)
-            offset = indices * view_size
-            data_view = ArrayData(view_size, self.dtype, owner=self._data,
-                                  offset=offset)
-            return ndarray(view_shape, self.dtype, np_data=None,
-                           array_data=data_view)
-
-        # Standardize indices to a list of slices
-        if len(indices) > len(self.shape):
+        if not isinstance(indices, tuple):
+            indices = (indices,)
+        n_ellipsis = len([idx for idx in indices if idx is Ellipsis])
+        if n_ellipsis > 1:
+            raise IndexError("an index can only have a single ellipsis ('...')")
+        n_indexed = len([idx for idx in indices
+                         if idx is not None and idx is not Ellipsis])
+        if n_indexed > self.ndim:
             raise IndexError('too many indices for array')
+        full = (slice(None),)*(self.ndim - n_indexed)
+        if n_ellipsis:
+            i = [idx is Ellipsis for idx in indices].index(True)
+            indices = indices[:i] + full + indices[i+1:]
+        else:
+            indices = indices + full
 
         view_shape = []
-        rest_must_be_contiguous = False
+        view_strides = []
         offset = 0
-        for i, dim in enumerate(self.shape):
-            start = 0
-            stop = dim
-            append_dim = True
-            if i < len(indices):
-                idx = indices[i]
-                if isinstance(idx, int):
-                    append_dim = False
-                    start = idx
-                    stop = idx+1
-                elif isinstance(idx, slice):
-                    if idx.start is not None:
-                        start = idx.start
-                    if idx.stop is not None:
-                        stop = idx.stop
-                    if idx.step is not None:
-                        raise NotImplementedError('only contiguous indices '
-                                                  + 'are supported')
-                elif idx is Ellipsis:
-                    diff = self.ndim - len(indices)
-                    indices = indices[:i] + [slice(None)]*diff + indices[i:]
-                    return self[indices]
-                else:
-                    raise IndexError('only integers, slices and ellipsis are '
-                                     + 'valid indices')
-
-            view_dim = stop-start
-            offset = offset * dim + start
-            if append_dim:
+        axis = 0
+        for idx in indices:
+            if idx is None:
+                view_shape.append(1)
+                view_strides.append(0)
+                continue
+            dim = self.shape[axis]
+            stride = self.strides[axis]
+            if isinstance(idx, (int, np.integer)):
+                if idx < 0:
+                    idx += dim
+                if not 0 <= idx < dim:
+                    raise IndexError('index %i is out of bounds for axis %i '
+                                     'with size %i' % (idx, axis, dim))
+                offset += idx*stride
+            elif isinstance(idx, slice):
+                start, stop, step = idx.indices(dim)
+                view_dim = len(range(start, stop, step))
+                if view_dim > 0:
+                    offset += start*stride
                 view_shape.append(view_dim)
-            if rest_must_be_contiguous and view_dim > 1 and view_dim < dim:
-                raise NotImplementedError('only contiguous indices are '
-                                          + 'supported')
-            if view_dim > 1:
-                rest_must_be_contiguous = True
-
-        view_shape = tuple(view_shape)
-        view_size = helpers.prod(view_shape)
-
-        # Construct view
-        data_view = ArrayData(view_size, self.dtype, owner=self._data,
-                              offset=offset)
-        return ndarray(view_shape, self.dtype, np_data=None,
-                       array_data=data_view)
+                view_strides.append(stride*step)
+            else:
+                raise IndexError('only integers, slices, ellipsis and None '
+                                 'are valid indices')
+            axis += 1
+        return self._view(tuple(view_shape), tuple(view_strides), offset)
 
     def __setitem__(self, indices, c):
         view = self.__getitem__(indices)
-        base.copyto(view, c)
+        if np.isscalar(c):
+            view.fill(c)
+        else:
+            base.copyto(view, c)
+
+
+def normalize_dtype(dtype):
+    """ The device dtype used for arrays of the given dtype. """
+    if dtype is None:
+        return np.dtype(base.float_)
+    dtype = np.dtype(dtype)
+    if dtype == np.dtype('float64'):
+        return np.dtype(base.float_)
+    elif dtype == np.dtype('int64'):
+        return np.dtype(base.int_)
+    elif dtype == np.dtype('bool'):
+        return np.dtype(base.bool_)
+    return dtype
 
 
 def array(object, dtype=None, copy=True):
@@ -2,10 +2,26 @@ import numpy as np
 import cudarray
 from .wrap import elementwise
 from . import helpers
+from . import bufferpool
 from . import base
 
 
+def broadcast_shape(shape1, shape2):
+    ndim = max(len(shape1), len(shape2))
+    shape1_ = (1,)*(ndim - len(shape1)) + tuple(shape1)
+    shape2_ = (1,)*(ndim - len(shape2)) + tuple(shape2)
+    shape = []
+    for a1, a2 in zip(shape1_, shape2_):
+        if a1 != a2 and a1 != 1 and a2 != 1:
+            raise ValueError('operands could not be broadcast together with '
+                             'shapes ' + str(shape1) + ' ' + str(shape2))
+        shape.append(max(a1, a2))
+    return tuple(shape)
+
+
 def broadcast_type(shape1, shape2):
+    """ The specialized kernel for broadcasting shape2 to shape1. Returns None
+    if shape2 is not broadcast or needs the general strided kernel. """
     if shape1 == shape2:
         return None
 
@@ -66,10 +82,20 @@ def broadcast_type(shape1, shape2):
         n = helpers.prod(shape1[b_axes_trailing[0]:])
         return elementwise.btype_outer, k, m, n
 
-    raise error
+    return None
+
+
+_commutative_ops = [elementwise.add_op, elementwise.max_op,
+                    elementwise.min_op, elementwise.mul_op]
+_commutative_cmp_ops = [elementwise.eq_op, elementwise.neq_op]
 
 
 def binary(op, x1, x2, out=None, cmp_op=False):
+    if out is not None and not out.iscontiguous():
+        # The kernels write contiguous output
+        base.copyto(out, binary(op, x1, x2, None, cmp_op))
+        return out
+
     if np.isscalar(x1) or np.isscalar(x2):
         if np.isscalar(x1):
             flip = True
@@ -90,7 +116,7 @@ def binary(op, x1, x2, out=None, cmp_op=False):
 
         # Create/check output array
         if out is None:
-            out = cudarray.empty(array.shape, dtype=out_dtype)
+            out = bufferpool.empty(array.shape, dtype=out_dtype)
         else:
             if out.shape != array.shape:
                 raise ValueError('out.shape does not match result')
@@ -105,43 +131,68 @@ def binary(op, x1, x2, out=None, cmp_op=False):
                                        flip)
         return out
 
-    x1 = base.ascontiguousarray(x1)
-    x2 = base.ascontiguousarray(x2)
+    # Strided operands are read in place unless they may overlap the output
+    if out is not None and x1._base is out._base:
+        x1 = base.ascontiguousarray(x1)
+    if out is not None and x2._base is out._base:
+        x2 = base.ascontiguousarray(x2)
 
     if x1.dtype == x2.dtype == np.dtype('int32') or cmp_op:
         out_dtype = np.dtype('int32')
     else:
         out_dtype = np.dtype('float32')
 
+    out_shape = broadcast_shape(x1.shape, x2.shape)
+    if x1.shape != out_shape:
+        commutative = _commutative_cmp_ops if cmp_op else _commutative_ops
+        if op in commutative:
+            # The specialized broadcast kernels want the larger operand first
+            x1, x2 = x2, x1
+
     # Create/check output array
-    if x1.size < x2.size:
-        x1, x2 = x2, x1
     if out is None:
-        out = cudarray.empty(x1.shape, dtype=out_dtype)
+        out = bufferpool.empty(out_shape, dtype=out_dtype)
     else:
-        if out.shape != x1.shape:
+        if out.shape != out_shape:
             raise ValueError('out.shape does not match result')
         if out.dtype != out_dtype:
             raise ValueError('dtype mismatch')
 
-    btype = broadcast_type(x1.shape, x2.shape)
-    if btype is None:
+    contiguous = x1.iscontiguous() and x2.iscontiguous()
+    if x1.shape == x2.shape and contiguous:
         n = x1.size
         if cmp_op:
             elementwise._binary_cmp(op, x1._data, x2._data, n, out._data)
         else:
             elementwise._binary(op, x1._data, x2._data, n, out._data)
         return out
-    else:
-        btype, k, m, n = btype
+
+    btype = None
+    if x1.shape == out_shape and contiguous:
+        btype = broadcast_type(x1.shape, x2.shape)
+    if btype is None:
+        shape, (x1_strides, x2_strides) = helpers.coalesce_axes(
+            out_shape,
+            helpers.broadcast_strides(x1.shape, out_shape, x1.strides),
+            helpers.broadcast_strides(x2.shape, out_shape, x2.strides)
+        )
         if cmp_op:
-            elementwise._binary_cmp_broadcast(op, btype, x1._data, x2._data,
-                                              k, m, n, out._data)
+            elementwise._binary_cmp_strided(op, x1._data, x2._data, shape,
+                                            x1_strides, x2_strides, out._data)
         else:
-            elementwise._binary_broadcast(op, btype, x1._data, x2._data, k, m,
-                                          n, out._data)
+            elementwise._binary_strided(op, x1._data, x2._data, shape,
+                                        x1_strides, x2_strides, out._data)
         return out
 
+    btype, k, m, n = btype
+    if cmp_op:
+        elementwise._binary_cmp_broadcast(op, btype, x1._data, x2._data,
+                                          k, m, n, out._data)
+    else:
+        elementwise._binary_broadcast(op, btype, x1._data, x2._data, k, m,
+                                      n, out._data)
+    return out
+
 
 def add(x1, x2, out=None):
     return binary(elementwise.add_op, x1, x2, out)
@@ -196,10 +247,13 @@ def not_equal(x1, x2, out=None):
 
 
 def unary(op, x, out=None):
+    if out is not None and not out.iscontiguous():
+        base.copyto(out, unary(op, x))
+        return out
     x = base.ascontiguousarray(x)
     out_shape = x.shape
     if out is None:
-        out = cudarray.empty(out_shape, dtype=x.dtype)
+        out = bufferpool.empty(out_shape, dtype=x.dtype)
     else:
         if not out_shape == out.shape:
             raise ValueError('out.shape does not match result')
@@ -248,10 +302,13 @@ def tanh(x, out=None):
 
 
 def clip(a, a_min, a_max, out=None):
+    if out is not None and not out.iscontiguous():
+        base.copyto(out, clip(a, a_min, a_max))
+        return out
     a = base.ascontiguousarray(a)
     out_shape = a.shape
     if out is None:
-        out = cudarray.empty(out_shape, dtype=a.dtype)
+        out = bufferpool.empty(out_shape, dtype=a.dtype)
     else:
         if not out_shape == out.shape:
             raise ValueError('out.shape does not match result')
@@ -0,0 +1,323 @@
+"""
+Lazy elementwise expressions evaluated in one fused pass.
+
+Wrapping arrays with lazy() records the elementwise operations applied to
+them instead of computing every intermediate:
+
+    from cudarray import fusion
+    m, v, g = fusion.lazy(m), fusion.lazy(v), fusion.lazy(g)
+    fusion.evaluate(beta1*m + (1-beta1)*g, out=m.value)
+    fusion.evaluate(beta2*v + (1-beta2)*g**2, out=v.value)
+
+evaluate() compiles the expression into a short program over a few reused
+temporaries. The NumPy back-end runs the program block by block such that
+the temporaries stay in cache and every operand is streamed from memory
+only once. The CUDA back-end runs the program over whole arrays with
+temporaries from the buffer pool. Expressions are evaluated in floating
+point; out may be one of the operands.
+"""
+import numpy as np
+import cudarray
+from . import helpers
+from . import bufferpool
+
+
+# Elements per block in the NumPy back-end; a few temporaries of this size
+# fit in L2 while keeping the per-block call overhead small
+_block_size = 65536
+
+
+class Expr(object):
+    # Keep NumPy from broadcasting over Expr objects in np_array * expr
+    __array_ufunc__ = None
+
+    def __init__(self, op, args):
+        self.op = op
+        self.args = tuple(args)
+
+    @property
+    def value(self):
+        """ The wrapped array or scalar of a leaf. """
+        if self.op is not None:
+            raise ValueError('not a leaf expression')
+        return self.args[0]
+
+    @property
+    def shape(self):
+        if self.op is None:
+            return tuple(np.shape(self.args[0]))
+        return _broadcast_shape([a.shape for a in self.args])
+
+    def eval(self, out=None):
+        return evaluate(self, out)
+
+    def __add__(self, other):
+        return add(self, other)
+
+    def __radd__(self, other):
+        return add(other, self)
+
+    def __sub__(self, other):
+        return subtract(self, other)
+
+    def __rsub__(self, other):
+        return subtract(other, self)
+
+    def __mul__(self, other):
+        return multiply(self, other)
+
+    def __rmul__(self, other):
+        return multiply(other, self)
+
+    def __div__(self, other):
+        return divide(self, other)
+
+    def __rdiv__(self, other):
+        return divide(other, self)
+
+    def __truediv__(self, other):
+        return divide(self, other)
+
+    def __rtruediv__(self, other):
+        return divide(other, self)
+
+    def __pow__(self, other):
+        return power(self, other)
+
+    def __rpow__(self, other):
+        return power(other, self)
+
+    def __neg__(self):
+        return negative(self)
+
+    def __abs__(self):
+        return absolute(self)
+
+
+def lazy(x):
+    """ Wrap an array or scalar as a leaf expression. """
+    if isinstance(x, Expr):
+        return x
+    return Expr(None, (x,))
+
+
+def _broadcast_shape(shapes):
+    ndim = max(len(s) for s in shapes)
+    shape = []
+    for dims in zip(*[(1,)*(ndim - len(s)) + tuple(s) for s in shapes]):
+        dims = set(dims) - set([1])
+        if len(dims) > 1:
+            raise ValueError('operands could not be broadcast together with '
+                             'shapes ' + ' '.join(str(s) for s in shapes))
+        shape.append(dims.pop() if dims else 1)
+    return tuple(shape)
+
+
+def _op(name, *args):
+    return Expr(name, [lazy(a) for a in args])
+
+
+def add(x1, x2):
+    return _op('add', x1, x2)
+
+
+def subtract(x1, x2):
+    return _op('subtract', x1, x2)
+
+
+def multiply(x1, x2):
+    return _op('multiply', x1, x2)
+
+
+def divide(x1, x2):
+    return _op('divide', x1, x2)
+
+
+def power(x1, x2):
+    return _op('power', x1, x2)
+
+
+def maximum(x1, x2):
+    return _op('maximum', x1, x2)
+
+
+def minimum(x1, x2):
+    return _op('minimum', x1, x2)
+
+
+def absolute(x):
+    return _op('absolute', x)
+
+
+def cos(x):
+    return _op('cos', x)
+
+
+def exp(x):
+    return _op('exp', x)
+
+
+def log(x):
+    return _op('log', x)
+
+
+def negative(x):
+    return _op('negative', x)
+
+
+def sin(x):
+    return _op('sin', x)
+
+
+def sqrt(x):
+    return _op('sqrt', x)
+
+
+def tanh(x):
+    return _op('tanh', x)
+
+
+class _Program(object):
+    """ An expression flattened into instructions (op, arg_slots, out_slot).
+
+    Slots are numbered leaves first, then temporaries, then the output.
+    Temporaries are reused as soon as their value has been consumed.
+    """
+    def __init__(self, expr):
+        self.leaves = []
+        self.temps = []
+        self.instrs = []
+        self._leaf_slots = {}
+        self._free = {}
+        root = self._fold(expr)
+        if root.op is None:
+            self.root = self._leaf(root.value)
+        else:
+            self.root = self._emit(root, is_root=True)
+        n_slots = len(self.leaves) + len(self.temps)
+        # Temporaries were numbered from 0 while emitting
+        self.instrs = [(op, [self._slot(a) for a in args],
+                        n_slots if out is None else self._slot(out))
+                       for op, args, out in self.instrs]
+        self.out_slot = n_slots
+
+    def _fold(self, expr):
+        # Precompute the subexpressions that do not involve arrays
+        if expr.op is None:
+            return expr
+        args = [self._fold(a) for a in expr.args]
+        if all(a.op is None and np.isscalar(a.value) for a in args):
+            value = getattr(np, expr.op)(*[a.value for a in args])
+            return lazy(value.item())
+        return Expr(expr.op, args)
+
+    def _leaf(self, value):
+        key = id(value)
+        if key not in self._leaf_slots:
+            self._leaf_slots[key] = ('leaf', len(self.leaves))
+            self.leaves.append(value)
+        return self._leaf_slots[key]
+
+    def _emit(self, expr, is_root=False):
+        args = []
+        for a in expr.args:
+            if a.op is None:
+                args.append(self._leaf(a.value))
+            else:
+                args.append(self._emit(a))
+        # Release the temporaries consumed by this operation
+        for a in args:
+            if a[0] == 'temp':
+                self._free.setdefault(self.temps[a[1]], []).append(a)
+        if is_root:
+            out = None
+        else:
+            shape = expr.shape
+            free = self._free.get(shape)
+            if free:
+                out = free.pop()
+            else:
+                out = ('temp', len(self.temps))
+                self.temps.append(shape)
+        self.instrs.append((expr.op, args, out))
+        return out
+
+    def _slot(self, ref):
+        kind, idx = ref
+        if kind == 'temp':
+            idx += len(self.leaves)
+        return idx
+
+
+def _result_dtype(leaves):
+    if cudarray._backend == 'cuda':
+        return np.dtype(cudarray.float_)
+    return np.result_type(np.float16, *leaves)
+
+
+def evaluate(expr, out=None):
+    """ Evaluate expr in a single pass into out. """
+    expr = lazy(expr)
+    shape = expr.shape
+    prog = _Program(expr)
+    if out is None:
+        out = bufferpool.empty(shape, dtype=_result_dtype(prog.leaves))
+    elif tuple(out.shape) != shape:
+        raise ValueError('out.shape does not match result')
+    if not prog.instrs:
+        value = prog.leaves[0]
+        if np.isscalar(value):
+            out.fill(value)
+        else:
+            cudarray.copyto(out, value)
+        return out
+    with bufferpool.scope():
+        if cudarray._backend == 'cuda':
+            _run_cuda(prog, out)
+        else:
+            _run_numpy(prog, out)
+    return out
+
+
+def _run_cuda(prog, out):
+    slots = list(prog.leaves)
+    slots += [bufferpool.empty(shape, dtype=out.dtype) for shape in prog.temps]
+    slots.append(out)
+    for op, args, out_slot in prog.instrs:
+        getattr(cudarray, op)(*[slots[i] for i in args], out=slots[out_slot])
+
+
+def _run_numpy(prog, out):
+    shape = out.shape
+    size = helpers.prod(shape)
+    arrays = [i for i, leaf in enumerate(prog.leaves)
+              if not np.isscalar(leaf)]
+    views = list(prog.leaves)
+    if (out.flags.c_contiguous and
+            all(np.shape(views[i]) == shape and
+                np.asarray(views[i]).flags.c_contiguous for i in arrays)):
+        # Flat blocks over contiguous operands
+        for i in arrays:
+            views[i] = np.asarray(views[i]).reshape(-1)
+        out_view = out.reshape(-1)
+        n, step, row_shape = size, _block_size, ()
+    else:
+        # Blocks of rows over broadcast views
+        shape = shape or (1,)
+        for i in arrays:
+            views[i] = np.broadcast_to(views[i], shape)
+        out_view = out.reshape(shape)
+        n = shape[0]
+        row_shape = shape[1:]
+        step = max(1, _block_size // max(1, helpers.prod(row_shape)))
+    dtype = _result_dtype(prog.leaves)
+    temps = [bufferpool.empty((min(step, n),) + row_shape, dtype=dtype)
+             for _ in prog.temps]
+    for start in range(0, n, step):
+        stop = min(start + step, n)
+        slots = [views[i] if np.isscalar(views[i]) else views[i][start:stop]
+                 for i in range(len(views))]
+        slots += [t[:stop - start] for t in temps]
+        slots.append(out_view[start:stop])
+        for op, args, out_slot in prog.instrs:
+            getattr(np, op)(*[slots[i] for i in args], out=slots[out_slot])
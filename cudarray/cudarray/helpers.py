@@ -31,3 +31,69 @@ def require_iterable(x):
         return x
     else:
         return [x]
+
+
+def contiguous_strides(shape):
+    """ Element strides of a C-contiguous array. """
+    strides = []
+    stride = 1
+    for dim in reversed(shape):
+        strides.append(stride)
+        stride *= dim
+    return tuple(reversed(strides))
+
+
+def broadcast_strides(shape, out_shape, strides=None):
+    """ Element strides of an array broadcast to out_shape. The array is
+    C-contiguous unless its strides are given. """
+    if strides is None:
+        strides = contiguous_strides(shape)
+    n_new = len(out_shape) - len(shape)
+    shape = (1,)*n_new + tuple(shape)
+    strides = (0,)*n_new + tuple(strides)
+    return tuple(0 if dim == 1 else stride
+                 for dim, stride in zip(shape, strides))
+
+
+def coalesce_axes(shape, *strides):
+    """ Merge neighbouring axes that can be addressed with a single stride and
+    drop axes of length 1. Returns the new shape and the new strides for each
+    of the given strides. """
+    new_shape = []
+    new_strides = [[] for _ in strides]
+    for i, dim in enumerate(shape):
+        if dim == 1:
+            continue
+        if new_shape and all(s_new[-1] == s[i]*dim
+                             for s_new, s in zip(new_strides, strides)):
+            new_shape[-1] *= dim
+            for s_new, s in zip(new_strides, strides):
+                s_new[-1] = s[i]
+        else:
+            new_shape.append(dim)
+            for s_new, s in zip(new_strides, strides):
+                s_new.append(s[i])
+    if not new_shape:
+        return (1,), [(0,) for _ in strides]
+    return tuple(new_shape), [tuple(s) for s in new_strides]
+
+
+def batch_matmul_shape(a_shape, b_shape, trans_a=False, trans_b=False):
+    """ Batch size and matrix dimensions (m, n, k) of the batched product of
+    a and b, optionally transposed. A 2D operand is shared by every batch
+    element. """
+    if not (len(a_shape) in (2, 3) and len(b_shape) in (2, 3)
+            and 3 in (len(a_shape), len(b_shape))):
+        raise ValueError('invalid array dimensionality')
+    batch_sizes = [s[0] for s in (a_shape, b_shape) if len(s) == 3]
+    if len(set(batch_sizes)) != 1:
+        raise ValueError('batch size mismatch')
+    m, k = a_shape[-2:]
+    if trans_a:
+        m, k = k, m
+    k_b, n = b_shape[-2:]
+    if trans_b:
+        k_b, n = n, k_b
+    if k != k_b:
+        raise ValueError('shape mismatch')
+    return batch_sizes[0], m, n, k
@@ -2,6 +2,8 @@ import numpy as np
 
 from .wrap import blas
 from . import cudarray
+from . import base
+from . import bufferpool
 
 
 def matmul_shape(a_shape, b_shape):
@@ -30,6 +32,8 @@ def inner(a, b):
             raise ValueError('shape mismatch')
     if a.size != b.size:
         raise ValueError('size mismatch')
+    a = base.ascontiguousarray(a)
+    b = base.ascontiguousarray(b)
     return blas.dot_(a._data, b._data, a.size)
 
 
@@ -40,9 +44,19 @@ def dot(a, b, out=None):
     if a.dtype != b.dtype:
         raise ValueError('dtype mismatch')
 
+    if out is not None and not out.iscontiguous():
+        base.copyto(out, dot(a, b))
+        return out
+
+    # BLAS reads contiguous arrays and their transposes in place
+    if not a.transposed:
+        a = base.ascontiguousarray(a)
+    if not b.transposed:
+        b = base.ascontiguousarray(b)
+
     out_shape = matmul_shape(a.shape, b.shape)
     if out is None:
-        out = cudarray.empty(out_shape, dtype=a.dtype)
+        out = bufferpool.empty(out_shape, dtype=a.dtype)
     else:
         if out_shape != out.shape:
             raise ValueError('out.shape does not match result')
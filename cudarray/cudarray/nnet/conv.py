@@ -22,6 +22,8 @@ class ConvBC01(object):
             raise ValueError('invalid implementation: %s' % self.impl)
 
     def fprop(self, imgs, filters, convout=None):
+        imgs = ca.ascontiguousarray(imgs)
+        filters = ca.ascontiguousarray(filters)
         b, c, img_h, img_w = imgs.shape
         f, c_filters, filter_h, filter_w = filters.shape
         if c != c_filters:
@@ -33,7 +35,7 @@ class ConvBC01(object):
         filter_shape = (filter_h, filter_w)
         convout_shape = self.output_shape(imgs.shape, f, (filter_h, filter_w))
         if convout is None:
-            convout = ca.empty(convout_shape, dtype=imgs.dtype)
+            convout = ca.bufferpool.empty(convout_shape, dtype=imgs.dtype)
         else:
             if convout.shape != convout_shape:
                 raise ValueError('convout.shape does not match result')
@@ -54,11 +56,14 @@ class ConvBC01(object):
 
     def bprop(self, imgs, filters, convout_d, to_filters=True, to_imgs=True,
               filters_d=None, imgs_d=None):
+        convout_d = ca.ascontiguousarray(convout_d)
         if imgs is not None:
+            imgs = ca.ascontiguousarray(imgs)
             b, c, img_h, img_w = imgs.shape
         else:
             b, c, img_h, img_w = self.imgs_shape
         if filters is not None:
+            filters = ca.ascontiguousarray(filters)
             f, c, filter_h, filter_w = filters.shape
         if imgs_d is not None:
             b, c, img_h, img_w = imgs_d.shape
@@ -69,7 +74,8 @@ class ConvBC01(object):
 
         if to_filters:
             if filters_d is None:
-                filters_d = ca.empty(filters.shape, dtype=filters.dtype)
+                filters_d = ca.bufferpool.empty(filters.shape,
+                                                dtype=filters.dtype)
             else:
                 if filters_d.shape != filters.shape:
                     raise ValueError('filters_d.shape does not match result')
@@ -83,7 +89,7 @@ class ConvBC01(object):
 
         if to_imgs:
             if imgs_d is None:
-                imgs_d = ca.empty(imgs_shape, dtype=convout_d.dtype)
+                imgs_d = ca.bufferpool.empty(imgs_shape, dtype=convout_d.dtype)
             else:
                 if imgs_d.shape != imgs.shape:
                     raise ValueError('imgs_d.shape does not match result')
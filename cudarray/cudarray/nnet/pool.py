@@ -1,6 +1,7 @@
 import numpy as np
 import cudarray as ca
 from ..wrap import nnet
+from ..wrap.array_data import ArrayData
 
 
 try:
@@ -21,6 +22,7 @@ class PoolB01(object):
         self.method = method
         if self.impl == 'cudarray':
             self.mask = None
+            self._mask_buf = None
         elif self.impl == 'cudnn':
             self.last_poolout = None
             self.pool_cudnn = cudnn.PoolBC01CuDNN_f(win_shape, padding,
@@ -29,9 +31,10 @@ class PoolB01(object):
             raise ValueError('invalid implementation: %s' % self.impl)
 
     def fprop(self, imgs, poolout=None):
+        imgs = ca.ascontiguousarray(imgs)
         poolout_shape = self.output_shape(imgs.shape)
         if poolout is None:
-            poolout = ca.empty(poolout_shape, dtype=imgs.dtype)
+            poolout = ca.bufferpool.empty(poolout_shape, dtype=imgs.dtype)
         else:
             if poolout_shape != poolout.shape:
                 raise ValueError('poolout.shape does not match result')
@@ -42,9 +45,7 @@ class PoolB01(object):
         if self.impl == 'cudarray':
             n_imgs = np.prod(imgs.shape[:-2])
             if self.method == 'max':
-                if self.mask is None or self.mask.shape != poolout_shape:
-                    self.mask = ca.empty(poolout_shape,
-                                         dtype=np.dtype('int32'))
+                self.mask = self._mask(poolout_shape)
                 nnet._max_pool_b01(
                     imgs._data, n_imgs, img_shape, self.win_shape,
                     self.padding, self.strides, poolout._data, self.mask._data
@@ -64,11 +65,12 @@ class PoolB01(object):
         return poolout
 
     def bprop(self, img_shape, poolout_d, imgs_d=None):
+        poolout_d = ca.ascontiguousarray(poolout_d)
         n_imgs_shape = poolout_d.shape[:-2]
         imgs_shape = n_imgs_shape + img_shape
 
         if imgs_d is None:
-            imgs_d = ca.empty(imgs_shape, dtype=poolout_d.dtype)
+            imgs_d = ca.bufferpool.empty(imgs_shape, dtype=poolout_d.dtype)
         else:
             if imgs_d.shape != imgs_d.shape:
                 raise ValueError('poolout.shape does not match result')
@@ -94,6 +96,16 @@ class PoolB01(object):
             )
         return imgs_d
 
+    def _mask(self, shape):
+        # The mask buffer only grows such that changing image sizes do not
+        # reallocate it.
+        size = int(np.prod(shape))
+        if self._mask_buf is None or self._mask_buf.size < size:
+            self._mask_buf = ca.empty(size, dtype=np.dtype('int32'))
+        data = ArrayData(size, self._mask_buf.dtype,
+                         owner=self._mask_buf._data)
+        return ca.ndarray(shape, self._mask_buf.dtype, array_data=data)
+
     def output_shape(self, imgs_shape):
         n_imgs_shape = imgs_shape[:-2]
         img_h, img_w = imgs_shape[-2:]
@@ -104,6 +116,6 @@ class PoolB01(object):
         return n_imgs_shape + out_shape
 
     def __getstate__(self):
-        ignore = ['mask', 'last_poolout', 'last_imgs']
+        ignore = ['mask', '_mask_buf', 'last_poolout', 'last_imgs']
         return dict((k, None) if k in ignore else (k, v)
                     for k, v in self.__dict__.items())
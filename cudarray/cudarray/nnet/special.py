@@ -26,6 +26,7 @@ def one_hot_encode(labels, n_classes, out=None):
     else:
         if out.shape != out_shape:
             raise ValueError('shape mismatch')
+    labels = ca.ascontiguousarray(labels)
     nnet._one_hot_encode(labels._data, n_classes, out_shape[0], out._data)
     return out
 
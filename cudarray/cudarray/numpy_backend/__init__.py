@@ -1,2 +1,3 @@
 from numpy import *
 from .nnet import *
+from . import batch
@@ -0,0 +1,71 @@
+import os
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import numpy as np
+from ..helpers import batch_matmul_shape
+
+
+# BLAS releases the GIL, so batch elements are multiplied concurrently in
+# threads. The thread count follows the OpenMP setting of the nnet kernels.
+_n_threads = int(os.getenv('OMP_NUM_THREADS', multiprocessing.cpu_count()))
+_pool = None
+
+
+def _thread_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPool(_n_threads)
+    return _pool
+
+
+def _dot_into(a, b, out):
+    if out.flags.c_contiguous and out.dtype == np.result_type(a, b):
+        np.dot(a, b, out=out)
+    else:
+        out[...] = np.dot(a, b)
+
+
+class Dot(object):
+    """ Batched matrix product out[i] = op(a[i]) op(b[i]) where op()
+    optionally transposes the matrix. A 2D a or b is shared by all batch
+    elements. perform() can be called repeatedly as the contents of a and b
+    change. """
+    def __init__(self, a, b, out=None, trans_a=False, trans_b=False):
+        if a.dtype != b.dtype:
+            raise ValueError('dtype mismatch')
+        self.batch_size, m, n, k = batch_matmul_shape(a.shape, b.shape,
+                                                      trans_a, trans_b)
+        out_shape = (self.batch_size, m, n)
+        if out is None:
+            out = np.empty(out_shape, dtype=a.dtype)
+        else:
+            if out_shape != out.shape:
+                raise ValueError('out.shape does not match result')
+            if a.dtype != out.dtype:
+                raise ValueError('dtype mismatch')
+        self.a = a
+        self.b = b
+        self.out = out
+        self._a = np.swapaxes(a, -1, -2) if trans_a else a
+        self._b = np.swapaxes(b, -1, -2) if trans_b else b
+
+    def _perform_range(self, start_stop):
+        a, b, out = self._a, self._b, self.out
+        for i in range(*start_stop):
+            _dot_into(a[i] if a.ndim == 3 else a, b[i] if b.ndim == 3 else b,
+                      out[i])
+
+    def perform(self):
+        n_chunks = min(_n_threads, self.batch_size)
+        chunks = [(i*self.batch_size // n_chunks,
+                   (i+1)*self.batch_size // n_chunks)
+                  for i in range(n_chunks)]
+        if n_chunks > 1:
+            _thread_pool().map(self._perform_range, chunks)
+        else:
+            self._perform_range((0, self.batch_size))
+        return self.out
+
+
+def dot(a, b, out=None, trans_a=False, trans_b=False):
+    return Dot(a, b, out, trans_a, trans_b).perform()
@@ -5,3 +5,4 @@ from .pool_bc01 import *
 from .lrnorm_bc01 import *
 from .conv import *
 from .pool import *
+from .lrnorm import *
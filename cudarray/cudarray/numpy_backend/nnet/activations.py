@@ -31,6 +31,6 @@ def relu(x, out=None):
 
 
 def relu_d(x, out=None):
-    result = np.zeros(x.shape)
+    result = np.zeros(x.shape, dtype=x.dtype)
     result[x >= 0] = 1
     return _output(result, out)
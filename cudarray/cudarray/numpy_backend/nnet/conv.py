@@ -1,11 +1,24 @@
-from .conv_bc01 import *
+import numpy as np
 import cudarray as ca
+from .conv_bc01 import (conv_bc01, conv_bc01_bprop, im2col_bc01,
+                        col2im_bc01)
+from . import winograd
+
+
+# The Cython kernels are compiled for these dtypes
+_dtypes = (np.dtype('float32'), np.dtype('float64'))
 
 
 class ConvBC01(object):
-    def __init__(self, padding, strides):
+    def __init__(self, padding, strides, impl='matmul'):
         self.padding = padding
         self.strides = strides
+        if impl not in ['matmul', 'direct', 'winograd']:
+            raise ValueError('invalid implementation: %s' % impl)
+        self.impl = impl
+        # Workspace buffers reused across calls; they only grow
+        self._cols = None
+        self._filters_d = None
 
     def fprop(self, imgs, filters, convout=None):
         b, c, img_h, img_w = imgs.shape
@@ -14,21 +27,33 @@ class ConvBC01(object):
             raise ValueError('channel mismatch')
         if imgs.dtype != filters.dtype:
             raise ValueError('dtype mismatch')
+        if imgs.dtype not in _dtypes:
+            raise ValueError('unsupported dtype: %s' % imgs.dtype)
 
         convout_shape = self.output_shape(imgs.shape, f, (filter_h, filter_w))
         if convout is None:
-            convout = ca.empty(convout_shape, dtype=imgs.dtype)
+            convout = ca.bufferpool.empty(convout_shape, dtype=imgs.dtype)
         else:
             if convout.shape != convout_shape:
                 raise ValueError('convout.shape does not match result')
             if convout.dtype != imgs.dtype:
                 raise ValueError('dtype mismatch')
+            if not convout.flags.c_contiguous:
+                raise ValueError('convout must be C-contiguous')
 
-        conv_bc01(imgs=imgs,
-                  filters=filters,
-                  padding=self.padding,
-                  strides=self.strides,
-                  convout=convout)
+        imgs = np.ascontiguousarray(imgs)
+        filters = np.ascontiguousarray(filters)
+        impl = self._impl(filters.shape[2:])
+        if impl == 'winograd':
+            winograd.conv_bc01_winograd(imgs, filters, convout)
+        elif impl == 'matmul':
+            self._fprop_matmul(imgs, filters, convout)
+        else:
+            conv_bc01(imgs=imgs,
+                      filters=filters,
+                      padding=self.padding,
+                      strides=self.strides,
+                      convout=convout)
 
         self.last_imgs = imgs
 
@@ -49,29 +74,138 @@ class ConvBC01(object):
         if c != c_filters:
             raise ValueError('channel mismatch')
 
-        if imgs.dtype != filters.dtype != convout_d.dtype:
+        if not imgs.dtype == filters.dtype == convout_d.dtype:
             raise ValueError('dtype mismatch')
+        if imgs.dtype not in _dtypes:
+            raise ValueError('unsupported dtype: %s' % imgs.dtype)
 
-        if filters_d is None:
-            filters_d = ca.empty(filters.shape, dtype=filters.dtype)
-
-        if imgs_d is None:
-            imgs_d = ca.empty(imgs.shape, dtype=imgs.dtype)
+        if to_filters:
+            if filters_d is None:
+                filters_d = ca.bufferpool.empty(filters.shape,
+                                                dtype=filters.dtype)
+            elif filters_d.shape != filters.shape:
+                raise ValueError('filters_d.shape does not match result')
+            elif filters_d.dtype != filters.dtype:
+                raise ValueError('dtype mismatch')
+            elif not filters_d.flags.c_contiguous:
+                raise ValueError('filters_d must be C-contiguous')
+        if to_imgs:
+            if imgs_d is None:
+                imgs_d = ca.bufferpool.empty(imgs.shape, dtype=imgs.dtype)
+            elif imgs_d.shape != imgs.shape:
+                raise ValueError('imgs_d.shape does not match result')
+            elif imgs_d.dtype != imgs.dtype:
+                raise ValueError('dtype mismatch')
+            elif not imgs_d.flags.c_contiguous:
+                raise ValueError('imgs_d must be C-contiguous')
 
-        conv_bc01_bprop(imgs=imgs,
-                        convout_d=convout_d,
-                        filters=filters,
-                        padding=self.padding,
-                        strides=self.strides,
-                        imgs_grad=imgs_d,
-                        filters_grad=filters_d)
+        imgs = np.ascontiguousarray(imgs)
+        filters = np.ascontiguousarray(filters)
+        convout_d = np.ascontiguousarray(convout_d)
+        impl = self._impl(filters.shape[2:])
+        if impl == 'winograd':
+            if to_filters:
+                winograd.conv_bc01_winograd_bprop_filters(imgs, convout_d,
+                                                          filters_d)
+            if to_imgs:
+                winograd.conv_bc01_winograd_bprop_imgs(filters, convout_d,
+                                                       imgs_d)
+        elif impl == 'matmul':
+            self._bprop_matmul(imgs, filters, convout_d,
+                               filters_d if to_filters else None,
+                               imgs_d if to_imgs else None)
+        else:
+            conv_bc01_bprop(imgs=imgs,
+                            convout_d=convout_d,
+                            filters=filters,
+                            padding=self.padding,
+                            strides=self.strides,
+                            imgs_grad=imgs_d if to_imgs else None,
+                            filters_grad=filters_d if to_filters else None)
 
         return filters_d, imgs_d
 
     def output_shape(self, imgs_shape, n_filters, filter_shape):
         b, _, img_h, img_w = imgs_shape
         out_shape = ((img_h + 2*self.padding[0] - filter_shape[0])
-                     / self.strides[0] + 1,
+                     // self.strides[0] + 1,
                      (img_w + 2*self.padding[1] - filter_shape[1])
-                     / self.strides[1] + 1)
+                     // self.strides[1] + 1)
         return (b, n_filters) + out_shape
+
+    def _impl(self, filter_shape):
+        # Winograd only covers 3x3 filters with padding 1 and stride 1;
+        # other layers of the same net fall back to matmul.
+        if (self.impl == 'winograd' and
+                not winograd.supported(filter_shape, self.padding,
+                                       self.strides)):
+            return 'matmul'
+        return self.impl
+
+    def _workspace(self, name, shape, dtype):
+        buf = getattr(self, name)
+        size = int(np.prod(shape))
+        if buf is None or buf.size < size or buf.dtype != dtype:
+            buf = np.empty(size, dtype=dtype)
+            setattr(self, name, buf)
+        return buf[:size].reshape(shape)
+
+    def _is_pointwise(self, filter_shape):
+        return (filter_shape == (1, 1) and tuple(self.padding) == (0, 0) and
+                tuple(self.strides) == (1, 1))
+
+    def _fprop_matmul(self, imgs, filters, convout):
+        # One GEMM per image: (f, c*fh*fw) x (c*fh*fw, out_h*out_w)
+        b, c = imgs.shape[:2]
+        f, _, filter_h, filter_w = filters.shape
+        filter_shape = (filter_h, filter_w)
+        filters_mat = filters.reshape(f, -1)
+        pointwise = self._is_pointwise(filter_shape)
+        if not pointwise:
+            cols = self._workspace('_cols', (c*filter_h*filter_w,) +
+                                   convout.shape[2:], imgs.dtype)
+            cols_mat = cols.reshape(cols.shape[0], -1)
+        for i in range(b):
+            if pointwise:
+                cols_mat = imgs[i].reshape(c, -1)
+            else:
+                im2col_bc01(imgs[i], filter_shape, self.padding,
+                            self.strides, cols)
+            np.dot(filters_mat, cols_mat, out=convout[i].reshape(f, -1))
+
+    def _bprop_matmul(self, imgs, filters, convout_d, filters_d, imgs_d):
+        b, c = imgs.shape[:2]
+        f, _, filter_h, filter_w = filters.shape
+        filter_shape = (filter_h, filter_w)
+        filters_mat = filters.reshape(f, -1)
+        pointwise = self._is_pointwise(filter_shape)
+        if not pointwise:
+            cols = self._workspace('_cols', (c*filter_h*filter_w,) +
+                                   convout_d.shape[2:], imgs.dtype)
+            cols_mat = cols.reshape(cols.shape[0], -1)
+        if filters_d is not None:
+            filters_d_mat = filters_d.reshape(f, -1)
+            if b > 1:
+                tmp = self._workspace('_filters_d', filters_d_mat.shape,
+                                      filters_d.dtype)
+        for i in range(b):
+            convout_d_mat = convout_d[i].reshape(f, -1)
+            if filters_d is not None:
+                if pointwise:
+                    cols_mat = imgs[i].reshape(c, -1)
+                else:
+                    im2col_bc01(imgs[i], filter_shape, self.padding,
+                                self.strides, cols)
+                if i == 0:
+                    np.dot(convout_d_mat, cols_mat.T, out=filters_d_mat)
+                else:
+                    np.dot(convout_d_mat, cols_mat.T, out=tmp)
+                    filters_d_mat += tmp
+            if imgs_d is not None:
+                if pointwise:
+                    np.dot(filters_mat.T, convout_d_mat,
+                           out=imgs_d[i].reshape(c, -1))
+                else:
+                    np.dot(filters_mat.T, convout_d_mat, out=cols_mat)
+                    col2im_bc01(cols, filter_shape, self.padding,
+                                self.strides, imgs_d[i])
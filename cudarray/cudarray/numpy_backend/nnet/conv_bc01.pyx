@@ -1,153 +1,344 @@
 from __future__ import division
 import numpy as np
 import cython
-#from cython.parallel import parallel, prange, threadlocal
-cimport numpy as np
+from cython cimport floating
+from cython.parallel import prange
 
 
-DTYPE = np.float
-ctypedef np.float_t DTYPE_t
 ctypedef Py_ssize_t uint
 
 
-cdef inline int int_max(int a, int b) nogil: return a if a >= b else b
-cdef inline int int_min(int a, int b) nogil: return a if a <= b else b
+@cython.cdivision(True)
+cdef inline uint range_lo(int offset, uint stride) noexcept nogil:
+    """ First output index o with o*stride + offset >= 0 """
+    if offset >= 0:
+        return 0
+    return (-offset + stride - 1) // stride
+
+
+@cython.cdivision(True)
+cdef inline uint range_hi(int offset, uint size, uint stride,
+                          uint out_size) noexcept nogil:
+    """ One past the last output index o with o*stride + offset < size """
+    cdef int n = <int>size - offset
+    if n <= 0:
+        return 0
+    n = (n + <int>stride - 1) // <int>stride
+    return n if n < <int>out_size else out_size
 
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def conv_bc01(np.ndarray[DTYPE_t, ndim=4] imgs,
-              np.ndarray[DTYPE_t, ndim=4] filters,
-              tuple padding,
-              tuple strides,
-              np.ndarray[DTYPE_t, ndim=4] convout):
-    """ Multi-image, multi-channel convolution
-    imgs has shape (n_imgs, n_channels_in, img_h, img_w)
-    filters has shape (n_channels_out, n_channels_in, filter_h, filter_w)
+@cython.cdivision(True)
+cdef void conv_plane(floating[:, :, ::1] imgs,
+                     floating[:, :, ::1] filters,
+                     uint pad_h, uint pad_w,
+                     uint stride_h, uint stride_w,
+                     floating[:, ::1] convout) noexcept nogil:
+    """ Convolve one image with the filters of one output channel.
+    The output plane is accumulated one filter tap at a time such that the
+    innermost loop runs along image rows.
     """
-    # TODO: support padding and striding  
+    cdef uint n_channels_in = imgs.shape[0]
+    cdef uint img_h = imgs.shape[1]
+    cdef uint img_w = imgs.shape[2]
+    cdef uint fil_h = filters.shape[1]
+    cdef uint fil_w = filters.shape[2]
+    cdef uint out_h = convout.shape[0]
+    cdef uint out_w = convout.shape[1]
+    cdef uint c_in, fil_y, fil_x, y, x, y_lo, y_hi, x_lo, x_hi
+    cdef int off_y, off_x
+    cdef floating weight
+    cdef floating *img_row
+    cdef floating *out_row
 
-    cdef uint n_imgs = imgs.shape[0]
-    cdef uint img_h = imgs.shape[2]
-    cdef uint img_w = imgs.shape[3]
-    cdef uint n_channels_in = filters.shape[1]
+    for y in range(out_h):
+        for x in range(out_w):
+            convout[y, x] = 0
+    for c_in in range(n_channels_in):
+        for fil_y in range(fil_h):
+            off_y = <int>fil_y - <int>pad_h
+            y_lo = range_lo(off_y, stride_h)
+            y_hi = range_hi(off_y, img_h, stride_h, out_h)
+            for fil_x in range(fil_w):
+                off_x = <int>fil_x - <int>pad_w
+                x_lo = range_lo(off_x, stride_w)
+                x_hi = range_hi(off_x, img_w, stride_w, out_w)
+                weight = filters[c_in, fil_y, fil_x]
+                for y in range(y_lo, y_hi):
+                    img_row = &imgs[c_in, y*stride_h + off_y, 0]
+                    out_row = &convout[y, 0]
+                    for x in range(x_lo, x_hi):
+                        out_row[x] += weight * img_row[x*stride_w + off_x]
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void conv_plane_bprop_imgs(floating[:, :, ::1] convout_d,
+                                floating[:, :, :, ::1] filters,
+                                uint pad_h, uint pad_w,
+                                uint stride_h, uint stride_w,
+                                floating[:, :, ::1] imgs_grad) noexcept nogil:
+    """ Back-propagate the output gradients of one image to its pixels. """
     cdef uint n_channels_out = filters.shape[0]
+    cdef uint n_channels_in = filters.shape[1]
     cdef uint fil_h = filters.shape[2]
     cdef uint fil_w = filters.shape[3]
+    cdef uint img_h = imgs_grad.shape[1]
+    cdef uint img_w = imgs_grad.shape[2]
+    cdef uint out_h = convout_d.shape[1]
+    cdef uint out_w = convout_d.shape[2]
+    cdef uint c_out, c_in, fil_y, fil_x, y, x, y_lo, y_hi, x_lo, x_hi
+    cdef int off_y, off_x
+    cdef floating weight
+    cdef floating *grad_row
+    cdef floating *out_d_row
+
+    for c_in in range(n_channels_in):
+        for y in range(img_h):
+            for x in range(img_w):
+                imgs_grad[c_in, y, x] = 0
+    for c_out in range(n_channels_out):
+        for c_in in range(n_channels_in):
+            for fil_y in range(fil_h):
+                off_y = <int>fil_y - <int>pad_h
+                y_lo = range_lo(off_y, stride_h)
+                y_hi = range_hi(off_y, img_h, stride_h, out_h)
+                for fil_x in range(fil_w):
+                    off_x = <int>fil_x - <int>pad_w
+                    x_lo = range_lo(off_x, stride_w)
+                    x_hi = range_hi(off_x, img_w, stride_w, out_w)
+                    weight = filters[c_out, c_in, fil_y, fil_x]
+                    for y in range(y_lo, y_hi):
+                        grad_row = &imgs_grad[c_in, y*stride_h + off_y, 0]
+                        out_d_row = &convout_d[c_out, y, 0]
+                        for x in range(x_lo, x_hi):
+                            grad_row[x*stride_w + off_x] += \
+                                weight * out_d_row[x]
+
 
-    cdef int fil_mid_h = fil_h // 2
-    cdef int fil_mid_w = fil_w // 2
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void conv_bprop_filters(floating[:, :, :, ::1] imgs,
+                             floating[:, :, :, ::1] convout_d,
+                             uint c_out,
+                             uint pad_h, uint pad_w,
+                             uint stride_h, uint stride_w,
+                             floating[:, :, ::1] filters_grad) noexcept nogil:
+    """ Gradients of the filters of one output channel summed over images.
+    """
+    cdef uint n_imgs = imgs.shape[0]
+    cdef uint n_channels_in = imgs.shape[1]
+    cdef uint img_h = imgs.shape[2]
+    cdef uint img_w = imgs.shape[3]
+    cdef uint fil_h = filters_grad.shape[1]
+    cdef uint fil_w = filters_grad.shape[2]
+    cdef uint out_h = convout_d.shape[2]
+    cdef uint out_w = convout_d.shape[3]
+    cdef uint i, c_in, fil_y, fil_x, y, x, y_lo, y_hi, x_lo, x_hi
+    cdef int off_y, off_x
+    cdef floating value
+    cdef floating *img_row
+    cdef floating *out_d_row
 
-    cdef uint i, c_in, c_out
-    cdef uint img_y, img_x, fil_y, fil_x
-    cdef DTYPE_t value
+    for c_in in range(n_channels_in):
+        for fil_y in range(fil_h):
+            off_y = <int>fil_y - <int>pad_h
+            y_lo = range_lo(off_y, stride_h)
+            y_hi = range_hi(off_y, img_h, stride_h, out_h)
+            for fil_x in range(fil_w):
+                off_x = <int>fil_x - <int>pad_w
+                x_lo = range_lo(off_x, stride_w)
+                x_hi = range_hi(off_x, img_w, stride_w, out_w)
+                value = 0
+                for i in range(n_imgs):
+                    for y in range(y_lo, y_hi):
+                        img_row = &imgs[i, c_in, y*stride_h + off_y, 0]
+                        out_d_row = &convout_d[i, c_out, y, 0]
+                        for x in range(x_lo, x_hi):
+                            value += out_d_row[x] * img_row[x*stride_w + off_x]
+                filters_grad[c_in, fil_y, fil_x] = value
 
-    cdef int y, x, y_off_min, y_off_max, y_off, x_off_min, x_off_max, x_off, mid_off_h, mid_off_w, img_x_center, img_y_center
-    
-    """mid_off only add one to max iff filter is of an uneaven sice 
-    This is done because filters of uneaven size have center shifte one Back-propagate
-    [ 1, 1 , x , 1] wher x is center for a 1X4 filter"""
-    mid_off_h = fil_h % 2
-    mid_off_w = fil_w % 2
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def conv_bc01(floating[:, :, :, ::1] imgs,
+              floating[:, :, :, ::1] filters,
+              tuple padding,
+              tuple strides,
+              floating[:, :, :, ::1] convout):
+    """ Multi-image, multi-channel convolution
+    imgs has shape (n_imgs, n_channels_in, img_h, img_w)
+    filters has shape (n_channels_out, n_channels_in, filter_h, filter_w)
+    convout has shape (n_imgs, n_channels_out, out_h, out_w)
+    All arrays must be C-contiguous and of the same dtype (float32 or
+    float64). The work is spread over OpenMP threads by image and output
+    channel.
+    """
+    cdef uint n_imgs = imgs.shape[0]
+    cdef uint n_channels_out = filters.shape[0]
+    cdef uint pad_h = padding[0]
+    cdef uint pad_w = padding[1]
     cdef uint stride_h = strides[0]
     cdef uint stride_w = strides[1]
+    cdef uint i, c_out, n = n_imgs * n_channels_out
+    cdef Py_ssize_t io
 
-    cdef uint padding_h = padding[0]
-    cdef uint padding_w = padding[1]
-
-    cdef uint out_h = convout.shape[2]
-    cdef uint out_w = convout.shape[3]
+    with nogil:
+        for io in prange(n, schedule='static'):
+            i = io // n_channels_out
+            c_out = io % n_channels_out
+            conv_plane(imgs[i], filters[c_out], pad_h, pad_w, stride_h,
+                       stride_w, convout[i, c_out])
+    return np.asarray(convout)
 
-    for i in range(n_imgs):
-        for c_out in range(n_channels_out):
-            for y in range(out_h):
-                img_y_center = y*stride_h+fil_mid_h
-                y_off_min = int_max(-img_y_center, -padding_h-fil_mid_h)
-                y_off_max = int_min(img_h-img_y_center, fil_mid_h+mid_off_h-padding_h)
-                for x in range(out_w):
-                    img_x_center = x*stride_w+fil_mid_w
-                    x_off_min = int_max(-img_x_center, -padding_w-fil_mid_w)
-                    x_off_max = int_min(img_w-img_x_center, fil_mid_w+mid_off_w-padding_w)
-                    value = 0.0
-                    for y_off in range(y_off_min, y_off_max):
-                        for x_off in range(x_off_min, x_off_max):
-                            img_y = <uint>(img_y_center + y_off)
-                            img_x = <uint>(img_x_center + x_off)
-                            fil_y = <uint>(fil_mid_h + padding_h + y_off)
-                            fil_x = <uint>(fil_mid_w + padding_w + x_off)
-                            for c_in in range(n_channels_in):
-                                value += imgs[i, c_in, img_y, img_x] * filters[c_out, c_in, fil_y, fil_x]
-                    convout[i, c_out, y, x] = value
-
-    return convout
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def conv_bc01_bprop(np.ndarray[DTYPE_t, ndim=4] imgs,
-                    np.ndarray[DTYPE_t, ndim=4] convout_d,
-                    np.ndarray[DTYPE_t, ndim=4] filters,
+@cython.cdivision(True)
+def conv_bc01_bprop(floating[:, :, :, ::1] imgs,
+                    floating[:, :, :, ::1] convout_d,
+                    floating[:, :, :, ::1] filters,
                     tuple padding,
                     tuple strides,
-                    np.ndarray[DTYPE_t, ndim=4] imgs_grad,
-                    np.ndarray[DTYPE_t, ndim=4] filters_grad):
+                    floating[:, :, :, ::1] imgs_grad,
+                    floating[:, :, :, ::1] filters_grad):
     """ Back-propagate gradients of multi-image, multi-channel convolution
     imgs has shape (b, c, img_h, img_w)
     filters has shape (f, c_filters, img_h, img_w)
     convout has shape (b_convout, f_convout, img_h, img_w)
+    imgs_grad or filters_grad may be None to skip that gradient. Image
+    gradients are parallel over images, filter gradients over output
+    channels, so no two threads write to the same element.
     """
-    cdef uint img_channels = imgs.shape[1]
-    cdef uint img_h = imgs.shape[2]
-    cdef uint img_w = imgs.shape[3]
-    cdef uint b_convout = convout_d.shape[0]
-    cdef uint f_convout = convout_d.shape[1]
-    cdef uint convout_d_h = convout_d.shape[2]
-    cdef uint convout_d_w = convout_d.shape[3]
+    cdef uint n_imgs = convout_d.shape[0]
+    cdef uint n_channels_out = convout_d.shape[1]
+    cdef uint pad_h = padding[0]
+    cdef uint pad_w = padding[1]
+    cdef uint stride_h = strides[0]
+    cdef uint stride_w = strides[1]
+    cdef Py_ssize_t i, c_out
 
-    cdef uint fil_h = filters.shape[2]
-    cdef uint fil_w = filters.shape[3]
-    cdef int fil_mid_h = fil_h // 2
-    cdef int fil_mid_w = fil_w // 2
-
-    cdef uint i, c_convout, c_imgs
-    cdef uint img_y, img_x, fil_y, fil_x
-    cdef DTYPE_t convout_d_value
-    cdef int y, x, y_off_min, y_off_max, y_off, x_off_min, x_off_max 
-    cdef int x_off, mid_off_h, mid_off_w, img_x_center, img_y_center
-    
-    """mid_off only add one to max iff filter is of an uneaven sice 
-    This is done because filters of uneaven size have center shifte one Back-propagate
-    [ 1, 1 , x , 1] wher x is center for a 1X4 filter"""
-    mid_off_h = fil_h % 2
-    mid_off_w = fil_w % 2
+    if imgs_grad is not None:
+        with nogil:
+            for i in prange(n_imgs, schedule='static'):
+                conv_plane_bprop_imgs(convout_d[i], filters, pad_h, pad_w,
+                                      stride_h, stride_w, imgs_grad[i])
+    if filters_grad is not None:
+        with nogil:
+            for c_out in prange(n_channels_out, schedule='static'):
+                conv_bprop_filters(imgs, convout_d, c_out, pad_h, pad_w,
+                                   stride_h, stride_w, filters_grad[c_out])
 
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def im2col_bc01(floating[:, :, ::1] img,
+                tuple filter_shape,
+                tuple padding,
+                tuple strides,
+                floating[:, :, ::1] cols):
+    """ Unfold the filter windows of one image into columns
+    img has shape (n_channels, img_h, img_w)
+    cols has shape (n_channels*filter_h*filter_w, out_h, out_w)
+    Row (c, fil_y, fil_x) of cols holds the image pixels seen by that
+    filter tap; pixels in the padding are zero. Rows are filled in
+    parallel.
+    """
+    cdef uint n_channels = img.shape[0]
+    cdef uint img_h = img.shape[1]
+    cdef uint img_w = img.shape[2]
+    cdef uint fil_h = filter_shape[0]
+    cdef uint fil_w = filter_shape[1]
+    cdef uint pad_h = padding[0]
+    cdef uint pad_w = padding[1]
+    cdef uint stride_h = strides[0]
+    cdef uint stride_w = strides[1]
+    cdef uint out_h = cols.shape[1]
+    cdef uint out_w = cols.shape[2]
+    cdef uint c, fil_y, fil_x, y, x, y_lo, y_hi, x_lo, x_hi
+    cdef int off_y, off_x
+    cdef Py_ssize_t row
+    cdef floating *img_row
+    cdef floating *col_row
+
+    with nogil:
+        for row in prange(n_channels*fil_h*fil_w, schedule='static'):
+            c = row // (fil_h*fil_w)
+            fil_y = (row // fil_w) % fil_h
+            fil_x = row % fil_w
+            off_y = <int>fil_y - <int>pad_h
+            off_x = <int>fil_x - <int>pad_w
+            y_lo = range_lo(off_y, stride_h)
+            y_hi = range_hi(off_y, img_h, stride_h, out_h)
+            x_lo = range_lo(off_x, stride_w)
+            x_hi = range_hi(off_x, img_w, stride_w, out_w)
+            for y in range(out_h):
+                col_row = &cols[row, y, 0]
+                if y < y_lo or y >= y_hi:
+                    for x in range(out_w):
+                        col_row[x] = 0
+                    continue
+                img_row = &img[c, y*stride_h + off_y, 0]
+                for x in range(x_lo):
+                    col_row[x] = 0
+                for x in range(x_lo, x_hi):
+                    col_row[x] = img_row[x*stride_w + off_x]
+                for x in range(x_hi, out_w):
+                    col_row[x] = 0
+    return np.asarray(cols)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def col2im_bc01(floating[:, :, ::1] cols,
+                tuple filter_shape,
+                tuple padding,
+                tuple strides,
+                floating[:, :, ::1] img):
+    """ Fold columns back into an image, the adjoint of im2col_bc01()
+    Overlapping filter windows are summed. Channels are processed in
+    parallel.
+    """
+    cdef uint n_channels = img.shape[0]
+    cdef uint img_h = img.shape[1]
+    cdef uint img_w = img.shape[2]
+    cdef uint fil_h = filter_shape[0]
+    cdef uint fil_w = filter_shape[1]
+    cdef uint pad_h = padding[0]
+    cdef uint pad_w = padding[1]
     cdef uint stride_h = strides[0]
     cdef uint stride_w = strides[1]
+    cdef uint out_h = cols.shape[1]
+    cdef uint out_w = cols.shape[2]
+    cdef uint row, fil_y, fil_x, y, x, y_lo, y_hi, x_lo, x_hi
+    cdef int off_y, off_x
+    cdef Py_ssize_t c
+    cdef floating *img_row
+    cdef floating *col_row
 
-    cdef uint padding_h = padding[0]
-    cdef uint padding_w = padding[1]
-
-    imgs_grad[...] = 0
-    filters_grad[...] = 0
-    for i in range(b_convout):
-        for c_convout in range(f_convout):
-            for y in range(convout_d_h):
-                img_y_center = y*stride_h+fil_mid_h
-                y_off_min = int_max(-img_y_center, -padding_h-fil_mid_h)
-                y_off_max = int_min(img_h-img_y_center, fil_mid_h+mid_off_h-padding_h)
-                for x in range(convout_d_w):
-                    convout_d_value = convout_d[i, c_convout, y, x]
-                    img_x_center = x*stride_w+fil_mid_w
-                    x_off_min = int_max(-img_x_center, -padding_w-fil_mid_w)
-                    x_off_max = int_min(img_w-img_x_center, fil_mid_w+mid_off_w-padding_w)
-                    value = 0.0
-                    for y_off in range(y_off_min, y_off_max):
-                        for x_off in range(x_off_min, x_off_max):
-                            img_y = <uint>(img_y_center + y_off)
-                            img_x = <uint>(img_x_center + x_off)
-                            fil_y = <uint>(fil_mid_h + padding_h + y_off)
-                            fil_x = <uint>(fil_mid_w + padding_w + x_off)
-                            for c_imgs in range(img_channels):
-                                imgs_grad[i, c_imgs, img_y, img_x] += filters[c_convout, c_imgs, fil_y, fil_x] * convout_d_value
-                                filters_grad[c_convout, c_imgs, fil_y, fil_x] += imgs[i, c_imgs, img_y, img_x] * convout_d_value
-#    filters_grad[...] /= n_imgs
+    with nogil:
+        for c in prange(n_channels, schedule='static'):
+            for y in range(img_h):
+                for x in range(img_w):
+                    img[c, y, x] = 0
+            for fil_y in range(fil_h):
+                off_y = <int>fil_y - <int>pad_h
+                y_lo = range_lo(off_y, stride_h)
+                y_hi = range_hi(off_y, img_h, stride_h, out_h)
+                for fil_x in range(fil_w):
+                    off_x = <int>fil_x - <int>pad_w
+                    x_lo = range_lo(off_x, stride_w)
+                    x_hi = range_hi(off_x, img_w, stride_w, out_w)
+                    row = (c*fil_h + fil_y)*fil_w + fil_x
+                    for y in range(y_lo, y_hi):
+                        img_row = &img[c, y*stride_h + off_y, 0]
+                        col_row = &cols[row, y, 0]
+                        for x in range(x_lo, x_hi):
+                            img_row[x*stride_w + off_x] += col_row[x]
+    return np.asarray(img)
@@ -0,0 +1,79 @@
+import numpy as np
+import cudarray as ca
+from .lrnorm_bc01 import lrnorm_bc01, lrnorm_bc01_bprop
+
+
+# The Cython kernels are compiled for these dtypes
+_dtypes = (np.dtype('float32'), np.dtype('float64'))
+
+
+class LRNormBC01(object):
+    """ Local response normalization across channels with Caffe's
+    parameters:
+        normout[i, c] = imgs[i, c] / (k + alpha/N * sum(imgs[i, c']**2))**beta
+    summing over the N channels c' in [c - (N-1)//2, c + N//2]. The
+    lrnorm_bc01 kernels take the unscaled alpha of Krizhevsky et al., so
+    alpha/N is passed to them. """
+    def __init__(self, N=5, alpha=1e-4, beta=0.75, k=1.0):
+        self.N = N
+        self.alpha = alpha
+        self.beta = beta
+        self.k = k
+        self.last_imgs = None
+        self.last_normout = None
+        self.scale = None
+        self._scale_buf = None
+
+    def fprop(self, imgs, normout=None):
+        if imgs.dtype not in _dtypes:
+            raise ValueError('unsupported dtype: %s' % imgs.dtype)
+        imgs = np.ascontiguousarray(imgs)
+        if normout is None:
+            normout = ca.bufferpool.empty(imgs.shape, dtype=imgs.dtype)
+        else:
+            if imgs.shape != normout.shape:
+                raise ValueError('normout.shape does not match result')
+            if imgs.dtype != normout.dtype:
+                raise ValueError('dtype mismatch')
+            if not normout.flags.c_contiguous:
+                raise ValueError('normout must be C-contiguous')
+            if np.may_share_memory(imgs, normout):
+                raise ValueError('normout must not alias imgs')
+
+        # The scale buffer only grows such that changing image sizes do not
+        # reallocate it.
+        size = imgs.size
+        if (self._scale_buf is None or self._scale_buf.size < size or
+                self._scale_buf.dtype != imgs.dtype):
+            self._scale_buf = np.empty(size, dtype=imgs.dtype)
+        self.scale = self._scale_buf[:size].reshape(imgs.shape)
+
+        lrnorm_bc01(imgs, self.N, self.alpha / self.N, self.beta, self.k,
+                    normout, self.scale)
+        self.last_imgs = imgs
+        self.last_normout = normout
+        return normout
+
+    def bprop(self, normout_d, imgs_d=None):
+        if normout_d.dtype != self.last_imgs.dtype:
+            raise ValueError('dtype mismatch')
+        if normout_d.shape != self.last_imgs.shape:
+            raise ValueError('normout_d.shape does not match fprop()')
+        if imgs_d is None:
+            imgs_d = ca.bufferpool.empty(normout_d.shape,
+                                         dtype=normout_d.dtype)
+        else:
+            if imgs_d.shape != normout_d.shape:
+                raise ValueError('imgs_d.shape does not match result')
+            if imgs_d.dtype != normout_d.dtype:
+                raise ValueError('dtype mismatch')
+            if not imgs_d.flags.c_contiguous:
+                raise ValueError('imgs_d must be C-contiguous')
+        lrnorm_bc01_bprop(self.last_imgs, self.last_normout,
+                          np.ascontiguousarray(normout_d), self.scale,
+                          self.N, self.alpha / self.N, self.beta, imgs_d)
+        return imgs_d
+
+    def output_shape(self, imgs_shape):
+        return imgs_shape
+
@@ -1,81 +1,193 @@
 from __future__ import division
 import numpy as np
 import cython
-cimport numpy as np
+from cython cimport floating
+from cython.parallel import prange
+from libc.math cimport pow, sqrt
 
 
-DTYPE = np.float
-ctypedef np.float_t DTYPE_t
 ctypedef Py_ssize_t uint
 
 
+cdef inline double pow_neg_beta(double s, double beta) noexcept nogil:
+    """ s**-beta with a fast path for the common beta = 0.75 """
+    if beta == 0.75:
+        return 1.0 / (sqrt(s) * sqrt(sqrt(s)))
+    return pow(s, -beta)
+
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def lrnorm_bc01(np.ndarray[DTYPE_t, ndim=4] imgs,
-              uint N,
-              DTYPE_t alpha,
-              DTYPE_t beta,
-              DTYPE_t k):
-    """
-    imgs has shape (n_imgs, n_channels, img_h, img_w)
+@cython.cdivision(True)
+cdef void lrnorm_row(floating[:, :, :, ::1] imgs,
+                     uint i, uint y, uint N,
+                     double alpha, double beta, double k,
+                     floating[:, :, :, ::1] normout,
+                     floating[:, :, :, ::1] scale) noexcept nogil:
+    """ Normalize one image row across channels.
+    The sums of squares over the channel window are first accumulated into
+    scale as a running sum; then scale and the output are computed per
+    element. Since imgs is only read in the first pass, normout may alias
+    imgs.
     """
-
-    cdef DTYPE_t norm_window 
-    cdef uint n_imgs = imgs.shape[0]
     cdef uint n_channels = imgs.shape[1]
-    cdef uint img_h = imgs.shape[2]
     cdef uint img_w = imgs.shape[3]
+    cdef uint pre_pad = (N - 1) // 2
+    cdef uint post_pad = N - pre_pad - 1
+    cdef uint c, x
+    cdef double s
+    cdef floating *a
+    cdef floating *sq_sum
+    cdef floating *prev_sq_sum
+
+    # Window of channel c is [c - pre_pad, c + post_pad]
+    sq_sum = &scale[i, 0, y, 0]
+    for x in range(img_w):
+        sq_sum[x] = 0
+    for c in range(min(post_pad, n_channels)):
+        a = &imgs[i, c, y, 0]
+        for x in range(img_w):
+            sq_sum[x] += a[x] * a[x]
+    for c in range(n_channels):
+        sq_sum = &scale[i, c, y, 0]
+        if c > 0:
+            prev_sq_sum = &scale[i, c-1, y, 0]
+            for x in range(img_w):
+                sq_sum[x] = prev_sq_sum[x]
+        if c + post_pad < n_channels:
+            a = &imgs[i, c + post_pad, y, 0]
+            for x in range(img_w):
+                sq_sum[x] += a[x] * a[x]
+        if c > pre_pad:
+            a = &imgs[i, c - pre_pad - 1, y, 0]
+            for x in range(img_w):
+                sq_sum[x] -= a[x] * a[x]
 
-    cdef uint half = N // 2
-    cdef uint tailLength = N - half
+    for c in range(n_channels):
+        for x in range(img_w):
+            s = k + alpha * scale[i, c, y, x]
+            scale[i, c, y, x] = s
+            normout[i, c, y, x] = imgs[i, c, y, x] * pow_neg_beta(s, beta)
 
-    cdef uint max_channel
 
-    cdef DTYPE_t a_i
-    cdef DTYPE_t a_half
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void lrnorm_row_bprop(floating[:, :, :, ::1] imgs,
+                           floating[:, :, :, ::1] normout,
+                           floating[:, :, :, ::1] normout_d,
+                           floating[:, :, :, ::1] scale,
+                           uint i, uint y, uint N,
+                           double alpha, double beta,
+                           floating[:, :, :, ::1] imgs_d) noexcept nogil:
+    """ Back-propagate one image row.
+    Channel j receives gradient from every channel whose window contains
+    j, i.e. [j - post_pad, j + pre_pad]. The running sum of
+    normout_d*normout/scale over that window is kept in imgs_d until the
+    final gradient overwrites it.
+    """
+    cdef uint n_channels = imgs.shape[1]
+    cdef uint img_w = imgs.shape[3]
+    cdef uint pre_pad = (N - 1) // 2
+    cdef uint post_pad = N - pre_pad - 1
+    cdef uint c, x
+    cdef double s
+    cdef double coef = 2.0 * alpha * beta
+    cdef floating *acc
+    cdef floating *prev_acc
+
+    acc = &imgs_d[i, 0, y, 0]
+    for x in range(img_w):
+        acc[x] = 0
+    for c in range(min(pre_pad, n_channels)):
+        for x in range(img_w):
+            acc[x] += (normout_d[i, c, y, x] * normout[i, c, y, x]
+                       / scale[i, c, y, x])
+    for c in range(n_channels):
+        acc = &imgs_d[i, c, y, 0]
+        if c > 0:
+            prev_acc = &imgs_d[i, c-1, y, 0]
+            for x in range(img_w):
+                acc[x] = prev_acc[x]
+        if c + pre_pad < n_channels:
+            for x in range(img_w):
+                acc[x] += (normout_d[i, c + pre_pad, y, x]
+                           * normout[i, c + pre_pad, y, x]
+                           / scale[i, c + pre_pad, y, x])
+        if c > post_pad:
+            for x in range(img_w):
+                acc[x] -= (normout_d[i, c - post_pad - 1, y, x]
+                           * normout[i, c - post_pad - 1, y, x]
+                           / scale[i, c - post_pad - 1, y, x])
 
-    tail = tailLength*[0.0]
+    for c in range(n_channels):
+        for x in range(img_w):
+            s = scale[i, c, y, x]
+            imgs_d[i, c, y, x] = (
+                normout_d[i, c, y, x] * pow_neg_beta(s, beta)
+                - coef * imgs[i, c, y, x] * imgs_d[i, c, y, x]
+            )
 
-    cdef uint i, y, x, a, c
 
-    for i in range(n_imgs):
-        for y in range(img_h):
-            for x in range(img_w):
-                norm_window = 0.0
-                tail = tailLength*[0.0]
-
-                for a in range(N + 1):
-                    addToNormWindow(norm_window, imgs[i, a, y, x])                    
-
-                for c in range(n_channels):
-                    a_i = imgs[i, c, y, x]
-                    a_half = tail.pop(0)
-                    tail.append(a_i)
-                    #Normalazation 
-                    imgs[i, c, y, x] = calcNormCal(a_i, norm_window, alpha, beta, k)
-                    #Move the window for next channel
-                    max_channel = half + c + 1
-                    #Move window if possible 
-                    if (max_channel < n_channels and (c >= N) ):
-                        addToNormWindow(norm_window, imgs[i, max_channel, y, x])
-                        #Remove privius channel from sum
-                        norm_window -= (a_half * a_half)
-
-    return imgs
-
-@cython.profile(False)
 @cython.boundscheck(False)
 @cython.wraparound(False)
-cdef inline DTYPE_t calcNormCal(DTYPE_t a_i,
-              DTYPE_t norm_window,
-              DTYPE_t alpha,
-              DTYPE_t beta,
-              DTYPE_t k):
-    return a_i / ((k + alpha * norm_window) ** beta)
-
-@cython.profile(False)
+@cython.cdivision(True)
+def lrnorm_bc01(floating[:, :, :, ::1] imgs,
+                uint N,
+                double alpha,
+                double beta,
+                double k,
+                floating[:, :, :, ::1] normout=None,
+                floating[:, :, :, ::1] scale=None):
+    """ Local response normalization across channels
+    imgs has shape (n_imgs, n_channels, img_h, img_w)
+    normout[i, c] = imgs[i, c] / scale[i, c]**beta where
+    scale[i, c] = k + alpha * sum(imgs[i, c']**2) over the N channels c'
+    centered at c. Note that alpha is not divided by N as in Caffe; the
+    LRNormBC01 op takes Caffe's parameters. If normout is None, imgs is normalized in place. scale
+    is needed by lrnorm_bc01_bprop(); it is allocated if not given.
+    Image rows are processed in parallel.
+    """
+    cdef uint n_imgs = imgs.shape[0]
+    cdef uint img_h = imgs.shape[2]
+    cdef Py_ssize_t row
+
+    if normout is None:
+        normout = imgs
+    if scale is None:
+        scale = np.empty_like(np.asarray(imgs))
+
+    with nogil:
+        for row in prange(n_imgs*img_h, schedule='static'):
+            lrnorm_row(imgs, row // img_h, row % img_h, N, alpha, beta, k,
+                       normout, scale)
+    return np.asarray(normout)
+
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
-cdef inline addToNormWindow(DTYPE_t norm_window,
-              DTYPE_t val):
-    norm_window += (val * val)
+@cython.cdivision(True)
+def lrnorm_bc01_bprop(floating[:, :, :, ::1] imgs,
+                      floating[:, :, :, ::1] normout,
+                      floating[:, :, :, ::1] normout_d,
+                      floating[:, :, :, ::1] scale,
+                      uint N,
+                      double alpha,
+                      double beta,
+                      floating[:, :, :, ::1] imgs_d):
+    """ Back-propagate local response normalization
+    imgs, normout and scale are the input, output and scale of
+    lrnorm_bc01(); imgs therefore must not have been normalized in place.
+    imgs_d must not alias any of the inputs. Image rows are processed in
+    parallel.
+    """
+    cdef uint n_imgs = imgs.shape[0]
+    cdef uint img_h = imgs.shape[2]
+    cdef Py_ssize_t row
+
+    with nogil:
+        for row in prange(n_imgs*img_h, schedule='static'):
+            lrnorm_row_bprop(imgs, normout, normout_d, scale,
+                             row // img_h, row % img_h, N, alpha, beta,
+                             imgs_d)
+    return np.asarray(imgs_d)
@@ -3,6 +3,15 @@ import cudarray as ca
 from .pool_bc01 import pool_bc01, bprop_pool_bc01
 
 
+def _as_planes(a):
+    # The kernels see any (..., h, w) array as a stack of image planes
+    return a.reshape((-1, 1) + a.shape[-2:])
+
+
+# The Cython kernels are compiled for these dtypes
+_dtypes = (np.dtype('float32'), np.dtype('float64'))
+
+
 class PoolB01(object):
     def __init__(self, win_shape, padding, strides, method='max'):
         self.win_shape = win_shape
@@ -16,49 +25,68 @@ class PoolB01(object):
             self.method = 1
 
         self.mask = None
+        self._mask_buf = None
 
     def fprop(self, imgs, poolout=None):
+        if imgs.dtype not in _dtypes:
+            raise ValueError('unsupported dtype: %s' % imgs.dtype)
         poolout_shape = self.output_shape(imgs.shape)
         if poolout is None:
-            poolout = ca.empty(poolout_shape, dtype=imgs.dtype)
+            poolout = ca.bufferpool.empty(poolout_shape, dtype=imgs.dtype)
         else:
             if poolout_shape != poolout.shape:
                 raise ValueError('poolout.shape does not match result')
             if imgs.dtype != poolout.dtype:
                 raise ValueError('dtype mismatch')
+            if not poolout.flags.c_contiguous:
+                raise ValueError('poolout must be C-contiguous')
 
-        if self.mask is None or self.mask.shape[:-1] != poolout_shape:
-            self.mask = ca.empty(poolout_shape + (2,), dtype=np.dtype('int_'))
+        if self.method == 0:
+            # The mask buffer only grows such that changing image sizes do
+            # not reallocate it.
+            size = int(np.prod(poolout_shape))
+            if self._mask_buf is None or self._mask_buf.size < size:
+                self._mask_buf = np.empty(size, dtype=np.dtype('int32'))
+            self.mask = self._mask_buf[:size].reshape(poolout_shape)
+            switches = _as_planes(self.mask)
+        else:
+            switches = None
 
-        pool_bc01(imgs=imgs,
-                  win_shape=self.win_shape,
-                  strides=self.strides,
-                  padding=self.padding,
-                  poolout=poolout,
+        pool_bc01(imgs=_as_planes(np.ascontiguousarray(imgs)),
+                  win_shape=tuple(self.win_shape),
+                  strides=tuple(self.strides),
+                  padding=tuple(self.padding),
+                  poolout=_as_planes(poolout),
                   type=self.method,
-                  switches=self.mask)
+                  switches=switches)
 
         return poolout
 
     def bprop(self, img_shape, poolout_d, imgs_d=None):
+        if poolout_d.dtype not in _dtypes:
+            raise ValueError('unsupported dtype: %s' % poolout_d.dtype)
         n_imgs_shape = poolout_d.shape[:-2]
         imgs_shape = n_imgs_shape + img_shape
 
         if imgs_d is None:
-            imgs_d = ca.empty(imgs_shape, dtype=poolout_d.dtype)
+            imgs_d = ca.bufferpool.empty(imgs_shape, dtype=poolout_d.dtype)
         else:
-            if imgs_d.shape != imgs_d.shape:
-                raise ValueError('poolout.shape does not match result')
+            if imgs_d.shape != imgs_shape:
+                raise ValueError('imgs_d.shape does not match result')
             if imgs_d.dtype != poolout_d.dtype:
                 raise ValueError('dtype mismatch')
+            if not imgs_d.flags.c_contiguous:
+                raise ValueError('imgs_d must be C-contiguous')
 
-        bprop_pool_bc01(poolout_grad=poolout_d,
-                        win_shape=self.win_shape,
-                        strides=self.strides,
-                        padding=self.padding,
+        bprop_pool_bc01(poolout_grad=_as_planes(
+                            np.ascontiguousarray(poolout_d)),
+                        win_shape=tuple(self.win_shape),
+                        strides=tuple(self.strides),
+                        padding=tuple(self.padding),
                         type=self.method,
-                        switches=self.mask,
-                        imgs_grad=imgs_d)
+                        switches=(None if self.mask is None
+                                  else _as_planes(self.mask)),
+                        imgs_grad=_as_planes(imgs_d))
         return imgs_d
 
     def output_shape(self, imgs_shape):
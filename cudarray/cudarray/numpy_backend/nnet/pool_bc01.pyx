@@ -1,131 +1,315 @@
 from __future__ import division
 import numpy as np
 import cython
-cimport numpy as np
+from cython cimport floating
+from cython.parallel import prange
 
 cdef int POOL_MAX = 0
 cdef int POOL_MEAN = 1
 
-DTYPE = np.float
-ctypedef np.float_t DTYPE_t
 ctypedef Py_ssize_t uint
 
-cdef inline DTYPE_t dtype_t_max(DTYPE_t a, DTYPE_t b): return a if a >= b else b
 
-cdef inline int int_max(int a, int b): return a if a >= b else b
-cdef inline int int_min(int a, int b): return a if a <= b else b
+@cython.cdivision(True)
+cdef void max_pool_plane(floating *img, uint img_h, uint img_w,
+                         uint win_h, uint win_w, uint pad_h, uint pad_w,
+                         uint stride_h, uint stride_w,
+                         floating *out, uint out_h, uint out_w,
+                         int *switches) noexcept nogil:
+    """ Max pooling of one image plane. switches holds the flat index into
+    the plane of each maximum. """
+    cdef int y, x, y_min, y_max, x_min, x_max, img_y, img_x, idx, idx_max
+    cdef uint y_out, x_out
+    cdef floating value
+    for y_out in range(out_h):
+        y = <int>(y_out*stride_h) - <int>pad_h
+        y_min = max(y, 0)
+        y_max = min(y + <int>win_h, <int>img_h)
+        for x_out in range(out_w):
+            x = <int>(x_out*stride_w) - <int>pad_w
+            x_min = max(x, 0)
+            x_max = min(x + <int>win_w, <int>img_w)
+            idx_max = y_min*img_w + x_min
+            value = img[idx_max]
+            for img_y in range(y_min, y_max):
+                for img_x in range(x_min, x_max):
+                    idx = img_y*img_w + img_x
+                    if img[idx] > value:
+                        value = img[idx]
+                        idx_max = idx
+            out[y_out*out_w + x_out] = value
+            switches[y_out*out_w + x_out] = idx_max
+
+
+@cython.cdivision(True)
+cdef void avg_pool_plane(floating *img, uint img_h, uint img_w,
+                         uint win_h, uint win_w, uint pad_h, uint pad_w,
+                         uint stride_h, uint stride_w,
+                         floating *out, uint out_h, uint out_w) noexcept nogil:
+    """ Average pooling of one image plane. Padded pixels count as zero. """
+    cdef int y, x, y_min, y_max, x_min, x_max, img_y, img_x
+    cdef uint y_out, x_out
+    cdef floating value
+    cdef floating scale = 1.0 / (win_h*win_w)
+    for y_out in range(out_h):
+        y = <int>(y_out*stride_h) - <int>pad_h
+        y_min = max(y, 0)
+        y_max = min(y + <int>win_h, <int>img_h)
+        for x_out in range(out_w):
+            x = <int>(x_out*stride_w) - <int>pad_w
+            x_min = max(x, 0)
+            x_max = min(x + <int>win_w, <int>img_w)
+            value = 0
+            for img_y in range(y_min, y_max):
+                for img_x in range(x_min, x_max):
+                    value += img[img_y*img_w + img_x]
+            out[y_out*out_w + x_out] = value * scale
+
+
+cdef void max_pool_plane_2x2s2(floating *img, uint img_w,
+                               floating *out, uint out_h, uint out_w,
+                               int *switches) noexcept nogil:
+    """ Max pooling of one image plane with 2x2 windows and stride 2.
+    The comparisons are written as selects to avoid unpredictable branches.
+    """
+    cdef uint y_out, x_out
+    cdef int idx0, idx1
+    cdef floating *row0
+    cdef floating *row1
+    cdef floating a, b, value0, value1
+    for y_out in range(out_h):
+        row0 = img + 2*y_out*img_w
+        row1 = row0 + img_w
+        for x_out in range(out_w):
+            a = row0[2*x_out]
+            b = row0[2*x_out+1]
+            value0 = b if b > a else a
+            idx0 = 1 if b > a else 0
+            a = row1[2*x_out]
+            b = row1[2*x_out+1]
+            value1 = b if b > a else a
+            idx1 = <int>img_w + (1 if b > a else 0)
+            out[y_out*out_w + x_out] = value1 if value1 > value0 else value0
+            switches[y_out*out_w + x_out] = <int>(2*y_out*img_w + 2*x_out) + (
+                idx1 if value1 > value0 else idx0)
+
+
+cdef void avg_pool_plane_2x2s2(floating *img, uint img_w,
+                               floating *out, uint out_h,
+                               uint out_w) noexcept nogil:
+    """ Average pooling of one image plane with 2x2 windows and stride 2. """
+    cdef uint y_out, x_out
+    cdef floating *row0
+    cdef floating *row1
+    for y_out in range(out_h):
+        row0 = img + 2*y_out*img_w
+        row1 = row0 + img_w
+        for x_out in range(out_w):
+            out[y_out*out_w + x_out] = 0.25 * (
+                row0[2*x_out] + row0[2*x_out+1] +
+                row1[2*x_out] + row1[2*x_out+1]
+            )
+
+
+@cython.cdivision(True)
+cdef void avg_pool_plane_bprop(floating *out_grad, uint out_h, uint out_w,
+                               uint win_h, uint win_w, uint pad_h, uint pad_w,
+                               uint stride_h, uint stride_w,
+                               floating *img_grad, uint img_h,
+                               uint img_w) noexcept nogil:
+    cdef int y, x, y_min, y_max, x_min, x_max, img_y, img_x
+    cdef uint y_out, x_out
+    cdef floating value
+    cdef floating scale = 1.0 / (win_h*win_w)
+    for y_out in range(out_h):
+        y = <int>(y_out*stride_h) - <int>pad_h
+        y_min = max(y, 0)
+        y_max = min(y + <int>win_h, <int>img_h)
+        for x_out in range(out_w):
+            x = <int>(x_out*stride_w) - <int>pad_w
+            x_min = max(x, 0)
+            x_max = min(x + <int>win_w, <int>img_w)
+            value = out_grad[y_out*out_w + x_out] * scale
+            for img_y in range(y_min, y_max):
+                for img_x in range(x_min, x_max):
+                    img_grad[img_y*img_w + img_x] += value
+
+
+cdef void pool_plane_bprop_2x2s2(floating *out_grad, uint out_h, uint out_w,
+                                 int *switches, floating *img_grad,
+                                 uint img_w) noexcept nogil:
+    """ Write the gradient of each 2x2 window in one go; with switches the
+    maximum gets the whole gradient, otherwise it is split evenly. """
+    cdef uint y_out, x_out, idx
+    cdef floating *row0
+    cdef floating *row1
+    cdef floating value
+    for y_out in range(out_h):
+        row0 = img_grad + 2*y_out*img_w
+        row1 = row0 + img_w
+        for x_out in range(out_w):
+            value = out_grad[y_out*out_w + x_out]
+            if switches == NULL:
+                value = 0.25 * value
+                row0[2*x_out] = value
+                row0[2*x_out+1] = value
+                row1[2*x_out] = value
+                row1[2*x_out+1] = value
+            else:
+                row0[2*x_out] = 0
+                row0[2*x_out+1] = 0
+                row1[2*x_out] = 0
+                row1[2*x_out+1] = 0
+                idx = switches[y_out*out_w + x_out]
+                img_grad[idx] = value
+
+
+cdef inline bint is_2x2s2(tuple win_shape, tuple strides, tuple padding):
+    return (win_shape == (2, 2) and strides == (2, 2) and
+            padding == (0, 0))
 
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def pool_bc01(np.ndarray[DTYPE_t, ndim=4] imgs,
+@cython.cdivision(True)
+def pool_bc01(floating[:, :, :, ::1] imgs,
               tuple win_shape,
               tuple strides,
               tuple padding,
-              np.ndarray[DTYPE_t, ndim=4] poolout,
+              floating[:, :, :, ::1] poolout,
               uint type,
-              np.ndarray[np.int_t, ndim=5] switches):
+              int[:, :, :, ::1] switches=None):
     """ Multi-image, multi-channel pooling
     imgs has shape (n_imgs, n_channels, img_h, img_w)
-    win_shape has shape (win_h, win_w) 
+    win_shape has shape (win_h, win_w)
     strides has shape (stride_y, stride_x)
-    poolout has shape (n_imgs, n_channels, img_h//stride_y, img_w//stride_x)
-    switches has shape (n_imgs, n_channels, img_h//stride_y, img_w//stride_x, 2)
+    poolout has shape (n_imgs, n_channels, out_h, out_w)
+    switches has the shape of poolout and receives the flat index of each
+    maximum within its image plane. It is only used for max pooling.
+    Image planes are pooled in parallel; 2x2 windows with stride 2 and no
+    padding take a dedicated path.
     """
-    cdef uint pool_h = win_shape[0] 
-    cdef uint pool_w = win_shape[1]
-    cdef uint pool_size = pool_h * pool_w
-    cdef uint stride_x = strides[1] 
-    cdef uint stride_y = strides[0] 
-    cdef uint padding_x = padding[1] 
-    cdef uint padding_y = padding[0] 
+    cdef uint win_h = win_shape[0]
+    cdef uint win_w = win_shape[1]
+    cdef uint stride_h = strides[0]
+    cdef uint stride_w = strides[1]
+    cdef uint pad_h = padding[0]
+    cdef uint pad_w = padding[1]
     cdef uint n_imgs = imgs.shape[0]
     cdef uint n_channels = imgs.shape[1]
     cdef uint img_h = imgs.shape[2]
     cdef uint img_w = imgs.shape[3]
     cdef uint out_h = poolout.shape[2]
     cdef uint out_w = poolout.shape[3]
+    cdef bint fast = is_2x2s2(win_shape, strides, padding)
+    cdef uint i, c
+    cdef Py_ssize_t ic
+
+    if n_imgs == 0 or n_channels == 0 or out_h == 0 or out_w == 0:
+        return np.asarray(poolout)
+    if type == POOL_MAX:
+        if switches is None:
+            raise ValueError('max pooling requires switches')
+        with nogil:
+            for ic in prange(n_imgs*n_channels, schedule='static'):
+                i = ic // n_channels
+                c = ic % n_channels
+                if fast:
+                    max_pool_plane_2x2s2(
+                        &imgs[i, c, 0, 0], img_w, &poolout[i, c, 0, 0],
+                        out_h, out_w, &switches[i, c, 0, 0]
+                    )
+                else:
+                    max_pool_plane(
+                        &imgs[i, c, 0, 0], img_h, img_w, win_h, win_w,
+                        pad_h, pad_w, stride_h, stride_w,
+                        &poolout[i, c, 0, 0], out_h, out_w,
+                        &switches[i, c, 0, 0]
+                    )
+    else:
+        with nogil:
+            for ic in prange(n_imgs*n_channels, schedule='static'):
+                i = ic // n_channels
+                c = ic % n_channels
+                if fast:
+                    avg_pool_plane_2x2s2(
+                        &imgs[i, c, 0, 0], img_w, &poolout[i, c, 0, 0],
+                        out_h, out_w
+                    )
+                else:
+                    avg_pool_plane(
+                        &imgs[i, c, 0, 0], img_h, img_w, win_h, win_w,
+                        pad_h, pad_w, stride_h, stride_w,
+                        &poolout[i, c, 0, 0], out_h, out_w
+                    )
+    return np.asarray(poolout)
 
-    
-    cdef uint i, c, y, x, y_out, x_out
-    cdef int y_min, y_max, x_min, x_max
-    cdef uint img_y, img_x
-    cdef uint img_y_max = 0
-    cdef uint img_x_max = 0
-    cdef DTYPE_t value, new_value
-    for i in range(n_imgs):
-        for c in range(n_channels):
-            for y_out in range(out_h):
-                y = y_out*stride_y-padding_y
-                y_min = int_max(y, 0)
-                y_max = int_min(y+pool_h, img_h)
-                for x_out in range(out_w):
-                    x = x_out*stride_x-padding_x
-                    x_min = int_max(x, 0)
-                    x_max = int_min(x+pool_w, img_w)
-                    if (type == POOL_MAX):
-                        value = -9e99
-                    else: 
-                        value = 0
-
-                    for img_y in range(y_min, y_max):
-                        for img_x in range(x_min, x_max):
-                            if (type == POOL_MAX):
-                                new_value = imgs[i, c, img_y, img_x]
-                                if new_value > value:
-                                    value = new_value
-                                    img_y_max = img_y
-                                    img_x_max = img_x
-                            else:
-                                value += imgs[i, c, img_y, img_x]
-                    if (type == POOL_MAX):
-                        poolout[i, c, y_out, x_out] = value
-                        switches[i, c, y_out, x_out, 0] = img_y_max
-                        switches[i, c, y_out, x_out, 1] = img_x_max
-                    else:
-                        poolout[i, c, y_out, x_out] = value / pool_size
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def bprop_pool_bc01(np.ndarray[DTYPE_t, ndim=4] poolout_grad,
+@cython.cdivision(True)
+def bprop_pool_bc01(floating[:, :, :, ::1] poolout_grad,
                     tuple win_shape,
                     tuple strides,
                     tuple padding,
                     uint type,
-                    np.ndarray[np.int_t, ndim=5] switches,
-                    np.ndarray[DTYPE_t, ndim=4] imgs_grad):
-
+                    int[:, :, :, ::1] switches,
+                    floating[:, :, :, ::1] imgs_grad):
+    """ Back-propagate multi-image, multi-channel pooling
+    switches is the output of pool_bc01() for max pooling and may be None
+    for average pooling. Image planes are processed in parallel.
+    """
+    cdef uint win_h = win_shape[0]
+    cdef uint win_w = win_shape[1]
+    cdef uint stride_h = strides[0]
+    cdef uint stride_w = strides[1]
+    cdef uint pad_h = padding[0]
+    cdef uint pad_w = padding[1]
     cdef uint n_imgs = poolout_grad.shape[0]
     cdef uint n_channels = poolout_grad.shape[1]
-    cdef uint poolout_h = poolout_grad.shape[2]
-    cdef uint poolout_w = poolout_grad.shape[3]
-
-    cdef uint pool_h = win_shape[0] 
-    cdef uint pool_w = win_shape[1]
-    cdef uint pool_size = pool_h * pool_w
-    cdef uint stride_x = strides[1] 
-    cdef uint stride_y = strides[0]
-    cdef uint padding_x = padding[1] 
-    cdef uint padding_y = padding[0] 
-
-    cdef uint i, c, y, x, img_y, img_y_min, img_x_min, img_y_max, img_x_max
-
-    imgs_grad[...] = 0
-
-    for i in range(n_imgs):
-        for c in range(n_channels):
-            for y in range(poolout_h):
-                for x in range(poolout_w):
-                    if (type == POOL_MEAN):
-                        img_y_min = y * stride_y - padding_y
-                        img_x_min = x * stride_x - padding_x
-                        img_y_max = img_y_min + pool_h 
-                        img_x_max = img_x_min + pool_w
-                        # XXX should be += instead of =
-                        imgs_grad[i, c, img_y_min : img_y_max, img_x_min : img_x_max] += (poolout_grad[i, c, y, x] / pool_size)
-                    elif (type == POOL_MAX):
-                        img_y = switches[i, c, y, x, 0]
-                        img_x = switches[i, c, y, x, 1]
-                        # XXX should be += instead of =
-                        imgs_grad[i, c, img_y, img_x] += poolout_grad[i, c, y, x]
-    return imgs_grad
+    cdef uint out_h = poolout_grad.shape[2]
+    cdef uint out_w = poolout_grad.shape[3]
+    cdef uint img_h = imgs_grad.shape[2]
+    cdef uint img_w = imgs_grad.shape[3]
+    cdef bint fast = is_2x2s2(win_shape, strides, padding)
+    cdef bint max_pool = type == POOL_MAX
+    cdef uint i, c, y, x, plane_size = img_h*img_w
+    cdef Py_ssize_t ic
+    cdef floating *img_grad
+    cdef floating *out_grad
+    cdef int *plane_switches
+
+    if max_pool and switches is None:
+        raise ValueError('max pooling requires switches')
+    if n_imgs == 0 or n_channels == 0 or img_h == 0 or img_w == 0:
+        return np.asarray(imgs_grad)
+    with nogil:
+        for ic in prange(n_imgs*n_channels, schedule='static'):
+            i = ic // n_channels
+            c = ic % n_channels
+            img_grad = &imgs_grad[i, c, 0, 0]
+            out_grad = &poolout_grad[i, c, 0, 0]
+            plane_switches = NULL
+            if max_pool:
+                plane_switches = &switches[i, c, 0, 0]
+            if fast:
+                pool_plane_bprop_2x2s2(out_grad, out_h, out_w,
+                                       plane_switches, img_grad, img_w)
+                # Rows and columns left over by odd image sizes
+                for y in range(2*out_h, img_h):
+                    for x in range(img_w):
+                        img_grad[y*img_w + x] = 0
+                if 2*out_w < img_w:
+                    for y in range(2*out_h):
+                        img_grad[y*img_w + img_w - 1] = 0
+                continue
+            for y in range(plane_size):
+                img_grad[y] = 0
+            if max_pool:
+                for y in range(out_h*out_w):
+                    img_grad[plane_switches[y]] += out_grad[y]
+            else:
+                avg_pool_plane_bprop(out_grad, out_h, out_w, win_h, win_w,
+                                     pad_h, pad_w, stride_h, stride_w,
+                                     img_grad, img_h, img_w)
+    return np.asarray(imgs_grad)
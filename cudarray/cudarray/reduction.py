@@ -4,11 +4,13 @@ from .wrap import reduction
 from . import cudarray
 from . import helpers
 from . import base
+from . import bufferpool
 
 
 REDUCE_ALL = 0
 REDUCE_LEADING = 1
 REDUCE_TRAILING = 2
+REDUCE_STRIDED = 3
 
 
 def reduce_shape(shape, axis, keepdims):
@@ -32,11 +34,16 @@ def reduce_type(axis, ndim):
         return REDUCE_LEADING
     elif axis == all_axis[-len(axis):]:
         return REDUCE_TRAILING
-    raise ValueError('reduction of middle axes not implemented')
+    return REDUCE_STRIDED
 
 
 def reduce(op, a, axis=None, dtype=None, out=None, keepdims=False,
            to_int_op=False):
+    if out is not None and not out.iscontiguous():
+        # The kernels write contiguous output
+        base.copyto(out, reduce(op, a, axis, dtype, None, keepdims,
+                                to_int_op))
+        return out
     axis = helpers.normalize_axis(axis, a.ndim)
     out_shape = reduce_shape(a.shape, axis, keepdims)
 
@@ -46,7 +53,7 @@ def reduce(op, a, axis=None, dtype=None, out=None, keepdims=False,
         out_dtype = a.dtype
 
     if out is None:
-        out = cudarray.empty(out_shape, out_dtype)
+        out = bufferpool.empty(out_shape, out_dtype)
     else:
         if not out.shape == out_shape:
             raise ValueError('out.shape does not match result')
@@ -54,6 +61,9 @@ def reduce(op, a, axis=None, dtype=None, out=None, keepdims=False,
             raise ValueError('dtype mismatch')
 
     rtype = reduce_type(axis, a.ndim)
+    if not a.iscontiguous():
+        # Read strided arrays in place
+        rtype = REDUCE_STRIDED
     if rtype == REDUCE_ALL:
         if to_int_op:
             reduction._reduce_to_int(op, a._data, a.size, out._data)
@@ -61,18 +71,35 @@ def reduce(op, a, axis=None, dtype=None, out=None, keepdims=False,
             reduction._reduce(op, a._data, a.size, out._data)
         return out
 
-    a = base.ascontiguousarray(a)
-
-    if rtype == REDUCE_LEADING:
+    if rtype == REDUCE_STRIDED:
+        strides = a.strides
+        keep = [i for i in range(a.ndim) if i not in axis]
+        keep_shape, (keep_strides,) = helpers.coalesce_axes(
+            [a.shape[i] for i in keep], [strides[i] for i in keep]
+        )
+        reduce_shape, (reduce_strides,) = helpers.coalesce_axes(
+            [a.shape[i] for i in axis], [strides[i] for i in axis]
+        )
+        if to_int_op:
+            reduction._reduce_strided_to_int(
+                op, a._data, keep_shape, keep_strides, reduce_shape,
+                reduce_strides, out._data
+            )
+        else:
+            reduction._reduce_strided(
+                op, a._data, keep_shape, keep_strides, reduce_shape,
+                reduce_strides, out._data
+            )
+    elif rtype == REDUCE_LEADING:
         n = helpers.prod(out_shape)
-        m = a.size / n
+        m = a.size // n
         if to_int_op:
             reduction._reduce_mat_to_int(op, a._data, m, n, True, out._data)
         else:
             reduction._reduce_mat(op, a._data, m, n, True, out._data)
     else:
         m = helpers.prod(out_shape)
-        n = a.size / m
+        n = a.size // m
         if to_int_op:
             reduction._reduce_mat_to_int(op, a._data, m, n, False, out._data)
         else:
@@ -0,0 +1,179 @@
+"""
+Asynchronous host/device transfers.
+
+Copies between page-locked (pinned) host memory and the device can run on a
+separate stream while kernels execute on the default stream:
+
+    stream = ca.transfer.Stream()
+    uploaded = ca.transfer.Event()
+    host = ca.transfer.pinned_empty(batch.shape)
+    host[...] = batch
+    x = ca.transfer.to_device_async(host, stream=stream)
+    uploaded.record(stream)
+    ...                # work on the previous batch
+    uploaded.wait()    # kernels issued from here on wait for the upload
+    y = ca.dot(x, w)
+
+A host array must not be modified (or read, for downloads) before its copy
+has completed. The arrays of a copy are referenced until then, so dropping
+them early does not free memory that is still being copied. DoubleBuffer
+wraps this pattern for iterating over batches.
+With the NumPy back-end, the same interface copies synchronously.
+"""
+import collections
+import numpy as np
+import cudarray
+from . import helpers
+
+
+if cudarray._backend == 'cuda':
+    from .wrap.cudart import Stream, Event, pinned_buffer
+    from .cudarray import normalize_dtype
+
+    # (event, arrays) of copies in flight; the arrays are released once
+    # the event has completed.
+    _in_flight = []
+
+    def _keep_alive(stream, *arrays):
+        _in_flight[:] = [(e, a) for e, a in _in_flight if not e.query()]
+        done = Event()
+        done.record(stream)
+        _in_flight.append((done, arrays))
+
+    def n_in_flight():
+        """ Number of asynchronous copies whose arrays are still held. """
+        _in_flight[:] = [(e, a) for e, a in _in_flight if not e.query()]
+        return len(_in_flight)
+
+    def pinned_empty(shape, dtype=None):
+        """ Host array in page-locked memory. """
+        shape = tuple(helpers.require_iterable(shape))
+        dtype = normalize_dtype(dtype)
+        nbytes = helpers.prod(shape)*dtype.itemsize
+        return pinned_buffer(nbytes)[:nbytes].view(dtype).reshape(shape)
+
+    def to_device_async(a, out=None, stream=None):
+        """ Copy the host array a to the device on stream. """
+        if out is None:
+            out = cudarray.empty(a.shape, dtype=a.dtype)
+        else:
+            if out.shape != a.shape:
+                raise ValueError('out.shape does not match result')
+            if not out.iscontiguous():
+                raise ValueError('out must be contiguous')
+        if a.dtype != out.dtype or not a.flags.c_contiguous:
+            raise ValueError('a must be a C-contiguous array of dtype %s'
+                             % out.dtype)
+        out._data.from_numpy_async(a, stream)
+        _keep_alive(stream, a, out)
+        return out
+
+    def to_host_async(a, out=None, stream=None):
+        """ Copy the device array a to page-locked host memory on stream. """
+        if not a.iscontiguous():
+            raise ValueError('a must be contiguous')
+        if out is None:
+            out = pinned_empty(a.shape, dtype=a.dtype)
+        else:
+            if out.shape != a.shape:
+                raise ValueError('out.shape does not match result')
+            if out.dtype != a.dtype or not out.flags.c_contiguous:
+                raise ValueError('out must be a C-contiguous array of dtype '
+                                 '%s' % a.dtype)
+        a._data.to_numpy_async(out, stream)
+        _keep_alive(stream, a, out)
+        return out
+
+else:
+    class Stream(object):
+        def synchronize(self):
+            pass
+
+        def query(self):
+            return True
+
+    class Event(object):
+        def record(self, stream=None):
+            pass
+
+        def wait(self, stream=None):
+            pass
+
+        def synchronize(self):
+            pass
+
+        def query(self):
+            return True
+
+    def n_in_flight():
+        return 0
+
+    def pinned_empty(shape, dtype=None):
+        return np.empty(shape, dtype=dtype)
+
+    def to_device_async(a, out=None, stream=None):
+        if out is None:
+            return np.array(a)
+        np.copyto(out, a)
+        return out
+
+    def to_host_async(a, out=None, stream=None):
+        if out is None:
+            return np.array(a)
+        np.copyto(out, a)
+        return out
+
+
+class _Slot(object):
+    def __init__(self):
+        self.host = None
+        self.dev = None
+        self.uploaded = Event()
+        self.consumed = Event()
+
+
+class DoubleBuffer(object):
+    """ Iterate over device copies of the host arrays in batches. The next
+    batches are staged in page-locked memory and uploaded on a separate
+    stream while the current batch is being processed. A yielded array is
+    only valid until the next iteration step (copy it if it should outlive
+    that). """
+    def __init__(self, batches, n_buffers=2):
+        if n_buffers < 2:
+            raise ValueError('n_buffers must be at least 2')
+        self.batches = batches
+        self.stream = Stream()
+        self._slots = [_Slot() for _ in range(n_buffers)]
+
+    def _upload(self, slot, batch):
+        batch = np.asarray(batch)
+        # The staging buffer is free once the previous upload from it is done
+        slot.uploaded.synchronize()
+        if slot.host is None or slot.host.shape != batch.shape:
+            slot.host = pinned_empty(batch.shape, dtype=batch.dtype)
+            slot.dev = cudarray.empty(batch.shape, dtype=slot.host.dtype)
+        np.copyto(slot.host, batch)
+        # The device buffer is free once the work on its last batch is done
+        slot.consumed.wait(self.stream)
+        to_device_async(slot.host, slot.dev, self.stream)
+        slot.uploaded.record(self.stream)
+
+    def __iter__(self):
+        batches = iter(self.batches)
+        queued = collections.deque()
+        n_uploaded = 0
+        while True:
+            while len(queued) < len(self._slots):
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                slot = self._slots[n_uploaded % len(self._slots)]
+                self._upload(slot, batch)
+                queued.append(slot)
+                n_uploaded += 1
+            if not queued:
+                return
+            slot = queued.popleft()
+            slot.uploaded.wait()
+            yield slot.dev
+            slot.consumed.record()
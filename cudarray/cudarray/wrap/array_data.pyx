@@ -18,13 +18,29 @@ cdef class ArrayData:
             self.dev_ptr = (<char *> owner.dev_ptr) + offset*dtype.itemsize
         if np_data is not None:
             cudaCheck(cudaMemcpyAsync(self.dev_ptr, np.PyArray_DATA(np_data),
-                                      self.nbytes, cudaMemcpyHostToDevice))
+                                      self.nbytes, cudaMemcpyHostToDevice,
+                                      stream_ptr(None)))
 
     def to_numpy(self, np_array):
         cudaCheck(cudaMemcpy(np.PyArray_DATA(np_array), self.dev_ptr,
                              self.nbytes, cudaMemcpyDeviceToHost))
         return np_array
 
+    def to_numpy_async(self, np_array, Stream stream=None):
+        """ Copy to np_array asynchronously. np_array should be page-locked
+        and must not be read before the copy has completed. """
+        cudaCheck(cudaMemcpyAsync(np.PyArray_DATA(np_array), self.dev_ptr,
+                                  self.nbytes, cudaMemcpyDeviceToHost,
+                                  stream_ptr(stream)))
+        return np_array
+
+    def from_numpy_async(self, np_array, Stream stream=None):
+        """ Copy from np_array asynchronously. np_array should be page-locked
+        and must not be modified before the copy has completed. """
+        cudaCheck(cudaMemcpyAsync(self.dev_ptr, np.PyArray_DATA(np_array),
+                                  self.nbytes, cudaMemcpyHostToDevice,
+                                  stream_ptr(stream)))
+
     def __dealloc__(self):
         if self.owner is None:
             cudaFree(self.dev_ptr)
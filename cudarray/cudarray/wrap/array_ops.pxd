@@ -8,6 +8,10 @@ cdef extern from 'cudarray/array_ops.hpp' namespace 'cudarray':
 
     void copy[T](const T *a, unsigned int n, T *b)
 
+    void copy_strided[T](const T *a, unsigned int ndim,
+        const unsigned int *shape, const int *a_strides, const int *b_strides,
+        T *b)
+
     void to_device[T](const T *a, unsigned int n, T *b)
 
     void to_host[T](const T *a, unsigned int n, T *b)
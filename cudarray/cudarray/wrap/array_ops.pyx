@@ -1,3 +1,4 @@
+import numpy as np
 cimport numpy as np
 cimport array_ops
 from .array_data cimport (ArrayData, bool_ptr, float_ptr, int_ptr, is_int,
@@ -45,6 +46,21 @@ def _copy(ArrayData a, unsigned int n, ArrayData out):
         raise ValueError('type (%s) not implemented' % str(a.dtype))
 
 
+def _copy_strided(ArrayData a, shape, a_strides, b_strides, ArrayData out):
+    cdef unsigned int[::1] shape_ = np.array(shape, dtype=np.uint32)
+    cdef int[::1] a_strides_ = np.array(a_strides, dtype=np.int32)
+    cdef int[::1] b_strides_ = np.array(b_strides, dtype=np.int32)
+    cdef unsigned int ndim = len(shape)
+    if is_int(a):
+        array_ops.copy_strided(int_ptr(a), ndim, &shape_[0], &a_strides_[0],
+                               &b_strides_[0], int_ptr(out))
+    elif is_float(a):
+        array_ops.copy_strided(float_ptr(a), ndim, &shape_[0], &a_strides_[0],
+                               &b_strides_[0], float_ptr(out))
+    else:
+        raise ValueError('type (%s) not implemented' % str(a.dtype))
+
+
 def _to_device(np.ndarray a, unsigned int n, ArrayData out):
     if is_int(a):
         array_ops.to_device(<int *>np.PyArray_DATA(a), n, int_ptr(out))
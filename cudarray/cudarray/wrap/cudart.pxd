@@ -8,6 +8,7 @@ cdef extern from "driver_types.h":
 
     enum cudaError:
         cudaSuccess
+        cudaErrorNotReady
 
     ctypedef cudaError cudaError_t
 
@@ -15,6 +16,15 @@ cdef extern from "driver_types.h":
         pass
     ctypedef CUstream_st *cudaStream_t
 
+    ctypedef struct CUevent_st:
+        pass
+    ctypedef CUevent_st *cudaEvent_t
+
+    enum:
+        cudaStreamNonBlocking
+        cudaEventDisableTiming
+        cudaHostAllocDefault
+
 
 cdef extern from "cuda_runtime_api.h":
     cudaError_t cudaMemcpy(void *dst, const void *src, size_t count,
@@ -27,10 +37,39 @@ cdef extern from "cuda_runtime_api.h":
     cudaError_t cudaGetLastError()
 
     cudaError_t cudaMemcpyAsync(void *dst, const void *src, size_t count,
-                                cudaMemcpyKind kind)
+                                cudaMemcpyKind kind, cudaStream_t stream)
     cudaError_t cudaSetDevice(int device) 	
 
+    cudaError_t cudaHostAlloc(void **pHost, size_t size, unsigned int flags)
+    cudaError_t cudaFreeHost(void *ptr)
+
+    cudaError_t cudaStreamCreateWithFlags(cudaStream_t *pStream,
+                                          unsigned int flags)
+    cudaError_t cudaStreamDestroy(cudaStream_t stream)
+    cudaError_t cudaStreamSynchronize(cudaStream_t stream)
+    cudaError_t cudaStreamQuery(cudaStream_t stream)
+    cudaError_t cudaStreamWaitEvent(cudaStream_t stream, cudaEvent_t event,
+                                    unsigned int flags)
+
+    cudaError_t cudaEventCreateWithFlags(cudaEvent_t *event,
+                                         unsigned int flags)
+    cudaError_t cudaEventDestroy(cudaEvent_t event)
+    cudaError_t cudaEventRecord(cudaEvent_t event, cudaStream_t stream)
+    cudaError_t cudaEventSynchronize(cudaEvent_t event)
+    cudaError_t cudaEventQuery(cudaEvent_t event)
+
 
 cpdef initialize(int device_id)
 cdef cudaCheck(cudaError_t status)
 cpdef cudaSyncCheck()
+
+
+cdef class Stream:
+    cdef cudaStream_t stream
+
+
+cdef class Event:
+    cdef cudaEvent_t event
+
+
+cdef cudaStream_t stream_ptr(Stream stream)
@@ -1,5 +1,8 @@
+cimport numpy as np
 from cudart cimport *
 
+np.import_array()
+
 
 cpdef initialize(int device_id):
     cudaCheck(cudaSetDevice(device_id))
@@ -15,3 +18,78 @@ cdef cudaCheck(cudaError_t status):
 cpdef cudaSyncCheck():
     cudaCheck(cudaDeviceSynchronize())
     cudaCheck(cudaGetLastError())    
+
+
+cdef class Stream:
+    """ Stream for asynchronous work. It does not synchronize with the
+    default stream, on which all cudarray kernels run. """
+    def __cinit__(self):
+        cudaCheck(cudaStreamCreateWithFlags(&self.stream,
+                                            cudaStreamNonBlocking))
+
+    def __dealloc__(self):
+        cudaStreamDestroy(self.stream)
+
+    def synchronize(self):
+        cudaCheck(cudaStreamSynchronize(self.stream))
+
+    def query(self):
+        """ Whether all work on the stream has completed. """
+        cdef cudaError_t status = cudaStreamQuery(self.stream)
+        if status == cudaErrorNotReady:
+            return False
+        cudaCheck(status)
+        return True
+
+
+cdef class Event:
+    """ Synchronization marker in a stream. Stream arguments default to the
+    default stream. """
+    def __cinit__(self):
+        cudaCheck(cudaEventCreateWithFlags(&self.event,
+                                           cudaEventDisableTiming))
+
+    def __dealloc__(self):
+        cudaEventDestroy(self.event)
+
+    def record(self, Stream stream=None):
+        cudaCheck(cudaEventRecord(self.event, stream_ptr(stream)))
+
+    def wait(self, Stream stream=None):
+        """ Make work submitted to stream hereafter wait for the event. """
+        cudaCheck(cudaStreamWaitEvent(stream_ptr(stream), self.event, 0))
+
+    def synchronize(self):
+        cudaCheck(cudaEventSynchronize(self.event))
+
+    def query(self):
+        """ Whether the work recorded before the event has completed. """
+        cdef cudaError_t status = cudaEventQuery(self.event)
+        if status == cudaErrorNotReady:
+            return False
+        cudaCheck(status)
+        return True
+
+
+cdef cudaStream_t stream_ptr(Stream stream):
+    if stream is None:
+        return <cudaStream_t> 0
+    return stream.stream
+
+
+cdef class _PinnedMemory:
+    cdef void *ptr
+
+    def __dealloc__(self):
+        if self.ptr != NULL:
+            cudaFreeHost(self.ptr)
+
+
+cpdef pinned_buffer(size_t nbytes):
+    """ NumPy uint8 array of nbytes in page-locked host memory. """
+    cdef _PinnedMemory mem = _PinnedMemory()
+    cudaCheck(cudaHostAlloc(&mem.ptr, max(nbytes, 1), cudaHostAllocDefault))
+    cdef np.npy_intp size = nbytes
+    array = np.PyArray_SimpleNewFromData(1, &size, np.NPY_UINT8, mem.ptr)
+    np.set_array_base(array, mem)
+    return array
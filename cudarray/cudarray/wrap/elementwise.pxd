@@ -28,6 +28,9 @@ cdef extern from 'cudarray/elementwise.hpp' namespace 'cudarray':
     void binary_broadcast[Ta, Tb, Tc](BinaryOp op, BroadcastType btype,
         const Ta *a, const Tb *b, unsigned int k, unsigned int m,
         unsigned int n, Tc *c)
+    void binary_strided[Ta, Tb, Tc](BinaryOp op, const Ta *a, const Tb *b,
+        unsigned int ndim, const unsigned int *shape, const int *a_strides,
+        const int *b_strides, Tc *c)
 
 
     enum BinaryCmpOp:
@@ -47,6 +50,9 @@ cdef extern from 'cudarray/elementwise.hpp' namespace 'cudarray':
     void binary_cmp_broadcast[Ta, Tb](BinaryCmpOp op, BroadcastType btype,
         const Ta *a, const Tb *b, unsigned int k, unsigned int m,
         unsigned int n, bool_t *c)
+    void binary_cmp_strided[Ta, Tb](BinaryCmpOp op, const Ta *a, const Tb *b,
+        unsigned int ndim, const unsigned int *shape, const int *a_strides,
+        const int *b_strides, bool_t *c)
 
 
     enum UnaryOp:
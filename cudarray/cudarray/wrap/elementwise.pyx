@@ -1,4 +1,5 @@
 from cpython cimport bool
+import numpy as np
 cimport numpy as np
 cimport elementwise
 from .array_data cimport (ArrayData, bool_ptr, float_ptr, int_ptr, is_int,
@@ -102,6 +103,29 @@ def _binary_broadcast(BinaryOp op, BroadcastType btype, ArrayData a,
                          % (str(a.dtype), str(b.dtype)))
 
 
+def _binary_strided(BinaryOp op, ArrayData a, ArrayData b, shape, a_strides,
+                    b_strides, ArrayData c):
+    cdef unsigned int[::1] shape_ = np.array(shape, dtype=np.uint32)
+    cdef int[::1] a_strides_ = np.array(a_strides, dtype=np.int32)
+    cdef int[::1] b_strides_ = np.array(b_strides, dtype=np.int32)
+    cdef unsigned int ndim = len(shape)
+    if is_float(a) and is_float(b):
+        elementwise.binary_strided(op, float_ptr(a), float_ptr(b), ndim,
+            &shape_[0], &a_strides_[0], &b_strides_[0], float_ptr(c))
+    elif is_float(a) and is_int(b):
+        elementwise.binary_strided(op, float_ptr(a), int_ptr(b), ndim,
+            &shape_[0], &a_strides_[0], &b_strides_[0], float_ptr(c))
+    elif is_int(a) and is_float(b):
+        elementwise.binary_strided(op, int_ptr(a), float_ptr(b), ndim,
+            &shape_[0], &a_strides_[0], &b_strides_[0], float_ptr(c))
+    elif is_int(a) and is_int(b):
+        elementwise.binary_strided(op, int_ptr(a), int_ptr(b), ndim,
+            &shape_[0], &a_strides_[0], &b_strides_[0], int_ptr(c))
+    else:
+        raise ValueError('types (%s, %s) not implemented'
+                         % (str(a.dtype), str(b.dtype)))
+
+
 def _binary_cmp(BinaryCmpOp op, ArrayData a, ArrayData b, unsigned int n,
            ArrayData c):
     if is_float(a) and is_float(b):
@@ -165,6 +189,32 @@ def _binary_cmp_broadcast(BinaryCmpOp op, BroadcastType btype, ArrayData a,
                          % (str(a.dtype), str(b.dtype)))
 
 
+def _binary_cmp_strided(BinaryCmpOp op, ArrayData a, ArrayData b, shape,
+                        a_strides, b_strides, ArrayData c):
+    cdef unsigned int[::1] shape_ = np.array(shape, dtype=np.uint32)
+    cdef int[::1] a_strides_ = np.array(a_strides, dtype=np.int32)
+    cdef int[::1] b_strides_ = np.array(b_strides, dtype=np.int32)
+    cdef unsigned int ndim = len(shape)
+    if is_float(a) and is_float(b):
+        elementwise.binary_cmp_strided[float, float](op, float_ptr(a),
+            float_ptr(b), ndim, &shape_[0], &a_strides_[0], &b_strides_[0],
+            bool_ptr(c))
+    elif is_float(a) and is_int(b):
+        elementwise.binary_cmp_strided[float, int](op, float_ptr(a),
+            int_ptr(b), ndim, &shape_[0], &a_strides_[0], &b_strides_[0],
+            bool_ptr(c))
+    elif is_int(a) and is_float(b):
+        elementwise.binary_cmp_strided[int, float](op, int_ptr(a),
+            float_ptr(b), ndim, &shape_[0], &a_strides_[0], &b_strides_[0],
+            bool_ptr(c))
+    elif is_int(a) and is_int(b):
+        elementwise.binary_cmp_strided[int, int](op, int_ptr(a), int_ptr(b),
+            ndim, &shape_[0], &a_strides_[0], &b_strides_[0], bool_ptr(c))
+    else:
+        raise ValueError('types (%s, %s) not implemented'
+                         % (str(a.dtype), str(b.dtype)))
+
+
 def _unary(UnaryOp op, ArrayData a, unsigned int n, ArrayData b):
     if is_float(a):
         elementwise.unary(op, float_ptr(a), n, float_ptr(b))
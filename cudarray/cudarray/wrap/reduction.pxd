@@ -18,3 +18,12 @@ cdef extern from 'cudarray/reduction.hpp' namespace 'cudarray':
     void reduce_to_int[T](ReduceToIntOp op, const T *a, unsigned int n, int *b)
     void reduce_mat_to_int[T](ReduceToIntOp op, const T *a, unsigned int m,
                               unsigned int n, bool reduce_leading, int *b)
+
+    void reduce_strided[T](ReduceOp op, const T *a, unsigned int keep_ndim,
+        const unsigned int *keep_shape, const int *keep_strides,
+        unsigned int reduce_ndim, const unsigned int *reduce_shape,
+        const int *reduce_strides, T *b)
+    void reduce_strided_to_int[T](ReduceToIntOp op, const T *a,
+        unsigned int keep_ndim, const unsigned int *keep_shape,
+        const int *keep_strides, unsigned int reduce_ndim,
+        const unsigned int *reduce_shape, const int *reduce_strides, int *b)
@@ -1,3 +1,4 @@
+import numpy as np
 cimport numpy as np
 cimport reduction
 from .array_data cimport ArrayData, float_ptr, int_ptr, is_int, is_float
@@ -54,3 +55,40 @@ def _reduce_mat_to_int(ReduceToIntOp op, ArrayData a, unsigned int m,
                                     int_ptr(out))
     else:
         raise ValueError('type %s not implemented' % str(a.dtype))
+
+
+def _reduce_strided(ReduceOp op, ArrayData a, keep_shape, keep_strides,
+                    reduce_shape, reduce_strides, ArrayData out):
+    cdef unsigned int[::1] k_shape = np.array(keep_shape, dtype=np.uint32)
+    cdef int[::1] k_strides = np.array(keep_strides, dtype=np.int32)
+    cdef unsigned int[::1] r_shape = np.array(reduce_shape, dtype=np.uint32)
+    cdef int[::1] r_strides = np.array(reduce_strides, dtype=np.int32)
+    if is_float(a):
+        reduction.reduce_strided(op, float_ptr(a), len(keep_shape),
+            &k_shape[0], &k_strides[0], len(reduce_shape), &r_shape[0],
+            &r_strides[0], float_ptr(out))
+    elif is_int(a):
+        reduction.reduce_strided(op, int_ptr(a), len(keep_shape),
+            &k_shape[0], &k_strides[0], len(reduce_shape), &r_shape[0],
+            &r_strides[0], int_ptr(out))
+    else:
+        raise ValueError('type %s not implemented' % str(a.dtype))
+
+
+def _reduce_strided_to_int(ReduceToIntOp op, ArrayData a, keep_shape,
+                           keep_strides, reduce_shape, reduce_strides,
+                           ArrayData out):
+    cdef unsigned int[::1] k_shape = np.array(keep_shape, dtype=np.uint32)
+    cdef int[::1] k_strides = np.array(keep_strides, dtype=np.int32)
+    cdef unsigned int[::1] r_shape = np.array(reduce_shape, dtype=np.uint32)
+    cdef int[::1] r_strides = np.array(reduce_strides, dtype=np.int32)
+    if is_float(a):
+        reduction.reduce_strided_to_int(op, float_ptr(a), len(keep_shape),
+            &k_shape[0], &k_strides[0], len(reduce_shape), &r_shape[0],
+            &r_strides[0], int_ptr(out))
+    elif is_int(a):
+        reduction.reduce_strided_to_int(op, int_ptr(a), len(keep_shape),
+            &k_shape[0], &k_strides[0], len(reduce_shape), &r_shape[0],
+            &r_strides[0], int_ptr(out))
+    else:
+        raise ValueError('type %s not implemented' % str(a.dtype))
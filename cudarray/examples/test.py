@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import os
+import threading
 import numpy as np
 
 os.environ['CUDARRAY_BACKEND'] = 'cuda'
@@ -110,6 +111,38 @@ def test_batch_dot():
     bdot.perform()
     print(np.allclose(c_np, np.array(c_ca)))
 
+    # Transposes, shared operands and strided views
+    a_np = np.random.normal(size=(batch_size, 6, 4))
+    b_np = np.random.normal(size=(batch_size, 7, 6))
+    w_np = np.random.normal(size=(6, 3))
+    a_ca = ca.array(a_np)
+    b_ca = ca.array(b_np)
+    w_ca = ca.array(w_np)
+    c_np = np.array([np.dot(a_np[i].T, b_np[i].T) for i in range(batch_size)])
+    c_ca = ca.batch.dot(a_ca, b_ca, trans_a=True, trans_b=True)
+    print(np.allclose(c_np, np.array(c_ca)))
+    c_np = np.array([np.dot(b_np[i], w_np) for i in range(batch_size)])
+    c_ca = ca.batch.dot(b_ca, w_ca)
+    print(np.allclose(c_np, np.array(c_ca)))
+    c_np = np.array([np.dot(w_np.T, a_np[i]) for i in range(batch_size)])
+    c_ca = ca.batch.dot(w_ca, a_ca, trans_a=True)
+    print(np.allclose(c_np, np.array(c_ca)))
+    a_sub_ca = ca.transpose(a_ca, (0, 2, 1))[::2]
+    c_np = np.array([np.dot(a_np[i].T, a_np[i])
+                     for i in range(0, batch_size, 2)])
+    c_ca = ca.batch.dot(a_sub_ca, a_sub_ca, trans_b=True)
+    print(np.allclose(c_np, np.array(c_ca)))
+
+    # Batched Gram matrices of feature maps
+    feats_np = np.random.normal(size=(3, 16, 50))
+    feats_ca = ca.array(feats_np)
+    grams_np = np.array([np.dot(f, f.T) for f in feats_np])
+    bdot = ca.batch.Dot(feats_ca, feats_ca, trans_b=True)
+    print(np.allclose(grams_np, np.array(bdot.perform())))
+    feats_np *= 2
+    ca.multiply(feats_ca, 2, feats_ca)
+    print(np.allclose(grams_np*4, np.array(bdot.perform())))
+
 
 def test_multiply():
     a_np = np.ones((5, 5))
@@ -216,6 +249,20 @@ def test_multiply():
     c_ca = ca.multiply(a_ca, b_ca)
     print(np.allclose(c_np, np.array(c_ca)))
 
+    # Broadcast patterns that need the strided kernel
+    for a_shape, b_shape in [((2, 3, 4, 5), (3, 1, 5)), ((3, 1), (1, 4)),
+                             ((2, 1, 4, 1), (1, 3, 1, 6))]:
+        a = np.random.normal(size=a_shape)
+        b = np.random.normal(size=b_shape)
+        a_ca = ca.array(a)
+        b_ca = ca.array(b)
+        c_np = np.multiply(a, b)
+        c_ca = ca.multiply(a_ca, b_ca)
+        print(np.allclose(c_np, np.array(c_ca)))
+        c_np = np.subtract(b, a)
+        c_ca = ca.subtract(b_ca, a_ca)
+        print(np.allclose(c_np, np.array(c_ca)))
+
 
 def test_binary():
     a_np = np.random.normal(size=(5, 5))
@@ -244,6 +291,49 @@ def test_binary():
     print(np.allclose(c_np, np.array(c_ca)))
 
 
+def test_binary_broadcast():
+    # Leading, trailing, inner and outer broadcasts of the second operand,
+    # and broadcasts of both operands. Non-commutative ops must not swap
+    # their operands.
+    shape = (4, 5, 6, 7)
+    b_shapes = [(1, 1, 6, 7), (6, 7), (4, 5, 1, 1), (4, 1, 1, 7),
+                (1, 5, 1, 1), (5, 1, 7), (1,)]
+    ops = [(np.subtract, ca.subtract), (np.divide, ca.divide),
+           (np.power, ca.power), (np.add, ca.add),
+           (np.multiply, ca.multiply)]
+    cmp_ops = [(np.greater, ca.greater), (np.less_equal, ca.less_equal)]
+    a_np = np.random.uniform(0.5, 2.0, size=shape)
+    a_ca = ca.array(a_np)
+    for b_shape in b_shapes:
+        b_np = np.random.uniform(0.5, 2.0, size=b_shape)
+        b_ca = ca.array(b_np)
+        for np_op, ca_op in ops + cmp_ops:
+            print(np.allclose(np_op(a_np, b_np),
+                              np.array(ca_op(a_ca, b_ca))))
+            print(np.allclose(np_op(b_np, a_np),
+                              np.array(ca_op(b_ca, a_ca))))
+
+    a_np = np.random.uniform(0.5, 2.0, size=(4, 1, 6, 1))
+    b_np = np.random.uniform(0.5, 2.0, size=(1, 5, 1, 7))
+    a_ca = ca.array(a_np)
+    b_ca = ca.array(b_np)
+    for np_op, ca_op in ops + cmp_ops:
+        print(np.allclose(np_op(a_np, b_np), np.array(ca_op(a_ca, b_ca))))
+        print(np.allclose(np_op(b_np, a_np), np.array(ca_op(b_ca, a_ca))))
+
+    # In-place with the broadcast operand on either side
+    a_np = np.random.uniform(0.5, 2.0, size=(4, 5, 6))
+    b_np = np.random.uniform(0.5, 2.0, size=(4, 1, 6))
+    a_ca = ca.array(a_np)
+    b_ca = ca.array(b_np)
+    np.subtract(a_np, b_np, a_np)
+    ca.subtract(a_ca, b_ca, a_ca)
+    print(np.allclose(a_np, np.array(a_ca)))
+    np.divide(b_np, a_np, a_np)
+    ca.divide(b_ca, a_ca, a_ca)
+    print(np.allclose(a_np, np.array(a_ca)))
+
+
 def test_binary_cmp():
     a_np = np.random.normal(size=(5, 5))
     b_np = np.random.normal(size=(5, 5))
@@ -368,6 +458,26 @@ def test_reduce():
     c_ca = ca.argmin(a_ca, axis=2)
     print(np.allclose(c_np, np.array(c_ca)))
 
+    # Middle axes
+    c_np = np.sum(a_np, axis=1)
+    c_ca = ca.sum(a_ca, axis=1)
+    print(np.allclose(c_np, np.array(c_ca)))
+
+    c_np = np.amax(a_np, axis=(0, 2))
+    c_ca = ca.amax(a_ca, axis=(0, 2))
+    print(np.allclose(c_np, np.array(c_ca)))
+
+    c_np = np.argmax(a_np, axis=1)
+    c_ca = ca.argmax(a_ca, axis=1)
+    print(np.allclose(c_np, np.array(c_ca)))
+
+    # Per-channel statistics of a BC01 blob
+    a_np = np.random.normal(size=(4, 3, 9, 8))
+    a_ca = ca.array(a_np)
+    c_np = np.mean(a_np, axis=(0, 2, 3), keepdims=True)
+    c_ca = ca.mean(a_ca, axis=(0, 2, 3), keepdims=True)
+    print(np.allclose(c_np, np.array(c_ca)))
+
 
 def test_indexing():
     a_np = np.ones((3, 3, 3)) * np.arange(3)
@@ -396,6 +506,129 @@ def test_indexing():
     a_ca[1, 2] = b_ca
     print(np.allclose(a_np, np.array(a_ca)))
 
+    # Strided views
+    a_np = np.random.normal(size=(4, 6, 8, 5))
+    a_ca = ca.array(a_np)
+    print(np.allclose(a_np[:, 2:5], np.array(a_ca[:, 2:5])))
+    print(np.allclose(a_np[::2, :, 1::3], np.array(a_ca[::2, :, 1::3])))
+    print(np.allclose(a_np[::-1, -1], np.array(a_ca[::-1, -1])))
+    print(np.allclose(a_np[..., 3], np.array(a_ca[..., 3])))
+    print(np.allclose(a_np[:, None, 1], np.array(a_ca[:, None, 1])))
+    print(np.allclose(a_np[1:, ::2][::-2, 1],
+                      np.array(a_ca[1:, ::2][::-2, 1])))
+
+    # Operations on strided views
+    print(np.allclose(a_np[:, 1:4] * a_np[:, ::2],
+                      np.array(a_ca[:, 1:4] * a_ca[:, ::2])))
+    print(np.allclose(np.exp(a_np[..., ::2]),
+                      np.array(ca.exp(a_ca[..., ::2]))))
+    print(np.allclose(np.sum(a_np[:, ::3], axis=(0, 2)),
+                      np.array(ca.sum(a_ca[:, ::3], axis=(0, 2)))))
+
+    # Writes through strided views
+    a_np[:, ::2] += 1
+    a_ca[:, ::2] += 1
+    print(np.allclose(a_np, np.array(a_ca)))
+    a_np[..., 1::2] = 3
+    a_ca[..., 1::2] = 3
+    print(np.allclose(a_np, np.array(a_ca)))
+    b_np = np.random.normal(size=(4, 6, 8))
+    a_np[..., 0] = b_np
+    a_ca[..., 0] = ca.array(b_np)
+    print(np.allclose(a_np, np.array(a_ca)))
+
+
+def test_views():
+    a_np = np.random.normal(size=(4, 6, 8, 5))
+    a_ca = ca.array(a_np)
+
+    def element_offset(view_np):
+        return ((view_np.__array_interface__['data'][0] -
+                 a_np.__array_interface__['data'][0]) // a_np.itemsize)
+
+    indices = [1, -2, (slice(None), slice(2, 5)), slice(None, None, -1),
+               (Ellipsis, slice(1, None, 3)), (None, 2, Ellipsis, None),
+               (-1, slice(None, None, -2), None, 3),
+               (slice(3, 0, -2), Ellipsis, slice(4, 1, -1)), Ellipsis]
+    for idx in indices:
+        view_np = a_np[idx]
+        view_ca = a_ca[idx]
+        print(view_ca.shape == view_np.shape and
+              view_ca.strides == tuple(s // a_np.itemsize
+                                       for s in view_np.strides) and
+              view_ca._base is a_ca._base and
+              view_ca._offset == element_offset(view_np) and
+              np.allclose(view_np, np.array(view_ca)))
+
+    # Views of views address the memory of the original array
+    view_np = a_np[1:, ::-2][::-1, 1, None]
+    view_ca = a_ca[1:, ::-2][::-1, 1, None]
+    print(view_ca._base is a_ca._base and
+          view_ca._offset == element_offset(view_np) and
+          np.allclose(view_np, np.array(view_ca)))
+
+    # Writes through negative-step views
+    a_np[::-1, :, ::-3] = 2
+    a_ca[::-1, :, ::-3] = 2
+    b_np = np.random.normal(size=(6, 5))
+    a_np[-1, :, 7] = b_np[::-1]
+    a_ca[-1, :, 7] = ca.array(b_np)[::-1]
+    print(np.allclose(a_np, np.array(a_ca)))
+
+    for idx in [4, (0, -7), (0, 0, 0, 0, 0), (Ellipsis, 0, Ellipsis),
+                (0, 1.5)]:
+        try:
+            a_ca[idx]
+            print(False)
+        except IndexError:
+            print(True)
+
+
+def test_reduce_views():
+    a_np = np.random.normal(size=(5, 7, 6))
+    a_ca = ca.array(a_np)
+    views = [(slice(None, None, -1),), (slice(1, None, 2), Ellipsis),
+             (Ellipsis, slice(None, None, -3)), (slice(None), 3)]
+    for idx in views:
+        view_np = a_np[idx]
+        view_ca = a_ca[idx]
+        for axis in [None, 0, -1, (0, view_np.ndim - 1)]:
+            print(np.allclose(np.sum(view_np, axis=axis),
+                              np.array(ca.sum(view_ca, axis=axis))) and
+                  np.allclose(np.mean(view_np, axis=axis),
+                              np.array(ca.mean(view_ca, axis=axis))) and
+                  np.allclose(np.amax(view_np, axis=axis),
+                              np.array(ca.amax(view_ca, axis=axis))))
+        for axis in [0, -1]:
+            print(np.array_equal(np.argmax(view_np, axis=axis),
+                                 np.array(ca.argmax(view_ca, axis=axis))) and
+                  np.array_equal(np.argmin(view_np, axis=axis),
+                                 np.array(ca.argmin(view_ca, axis=axis))))
+    a_np = a_np.transpose(2, 0, 1)
+    a_ca = ca.transpose(a_ca, (2, 0, 1))
+    print(np.allclose(np.sum(a_np, axis=(1, 2)),
+                      np.array(ca.sum(a_ca, axis=(1, 2)))))
+
+
+def test_argmax_ties():
+    # Like NumPy, the first of several equal extrema is returned
+    a_np = np.zeros((6, 40, 9))
+    a_np[:, [3, 17, 39], :] = 1
+    a_np[:, :, [2, 5]] = -1
+    a_ca = ca.array(a_np)
+    for axis in [1, 2]:
+        print(np.array_equal(np.argmax(a_np, axis=axis),
+                             np.array(ca.argmax(a_ca, axis=axis))))
+        print(np.array_equal(np.argmin(a_np, axis=axis),
+                             np.array(ca.argmin(a_ca, axis=axis))))
+    # Ties across many threads of the tree reduction
+    a_np = np.ones((3, 3000))
+    a_ca = ca.array(a_np)
+    print(np.array_equal(np.argmax(a_np, axis=1),
+                         np.array(ca.argmax(a_ca, axis=1))))
+    print(np.array_equal(np.argmin(a_np[:, ::-1], axis=1),
+                         np.array(ca.argmin(a_ca[:, ::-1], axis=1))))
+
 
 def test_transpose():
     shapes = [(4, 4), (5, 4), (8, 8), (32, 32), (55, 44), (64, 55), (55, 64),
@@ -407,6 +640,14 @@ def test_transpose():
         a_ca = ca.ascontiguousarray(a_ca.T)
         print(np.allclose(a_np, np.array(a_ca)))
 
+    a_np = np.random.normal(size=(3, 4, 5, 6))
+    a_ca = ca.array(a_np)
+    for axes in [(0, 2, 1, 3), (3, 2, 1, 0), (1, 0, 3, 2), (0, 1, 3, 2)]:
+        print(np.allclose(np.transpose(a_np, axes),
+                          np.array(ca.transpose(a_ca, axes))))
+    print(np.allclose(a_np.transpose(0, 3, 1, 2),
+                      np.array(a_ca.transpose(0, 3, 1, 2))))
+
 
 def test_copyto():
     a_np = np.random.random(size=(7, 11))
@@ -422,16 +663,65 @@ def test_copyto():
     print(np.allclose(np.array(a_ca), np.array(b_ca)))
 
 
+def test_bufferpool():
+    a_np = np.random.normal(size=(16, 32))
+    a_ca = ca.array(a_np)
+    stats = ca.bufferpool.stats()
+    for _ in range(3):
+        with ca.bufferpool.scope():
+            b_ca = ca.bufferpool.empty(a_np.shape)
+            c_ca = ca.bufferpool.empty((8, 8), dtype=np.int32)
+            ca.multiply(a_ca, 2, b_ca)
+            print(np.allclose(a_np * 2, np.array(b_ca)))
+            print(c_ca.dtype == np.int32)
+    new_stats = ca.bufferpool.stats()
+    # Only the first iteration allocates
+    print(new_stats['misses'] - stats['misses'] == 2)
+    print(new_stats['hits'] - stats['hits'] == 4)
+    print(new_stats['bytes_outstanding'] == 0)
+
+
+def test_bufferpool_threads():
+    # Concurrent scopes must never be handed the same buffer
+    a_np = np.random.normal(size=(16, 32))
+    a_ca = ca.array(a_np)
+    results = []
+
+    def work(factor):
+        ok = True
+        for _ in range(50):
+            with ca.bufferpool.scope():
+                b_ca = ca.bufferpool.empty(a_np.shape)
+                ca.multiply(a_ca, factor, b_ca)
+                ok = ok and np.allclose(np.array(b_ca), a_np * factor)
+        results.append(ok)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(len(results) == 4 and all(results))
+    print(ca.bufferpool.stats()['bytes_outstanding'] == 0)
+
+
 def run():
     test_indexing()
     test_dot()
+    test_batch_dot()
     test_multiply()
     test_binary()
+    test_binary_broadcast()
     test_binary_cmp()
     test_sum()
     test_random()
     test_reduce()
+    test_views()
+    test_reduce_views()
+    test_argmax_ties()
     test_transpose()
+    test_bufferpool()
+    test_bufferpool_threads()
 
 
 if __name__ == '__main__':
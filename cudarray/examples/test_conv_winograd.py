@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+import os
+import numpy as np
+
+os.environ['CUDARRAY_BACKEND'] = 'numpy'
+import cudarray as ca
+
+
+def conv(impl, imgs, filters, convout_d, padding=(1, 1), strides=(1, 1)):
+    layer = ca.nnet.ConvBC01(padding, strides, impl=impl)
+    convout = layer.fprop(imgs, filters)
+    filters_d, imgs_d = layer.bprop(imgs, filters, convout_d)
+    return convout, filters_d, imgs_d
+
+
+def conv_reference(imgs, filters, convout_d, padding, strides):
+    # Naive correlation summing over the filter taps
+    pad_h, pad_w = padding
+    stride_h, stride_w = strides
+    _, _, out_h, out_w = convout_d.shape
+    imgs_pad = np.pad(imgs, ((0, 0), (0, 0), (pad_h, pad_h), (pad_w, pad_w)))
+    convout = np.zeros(convout_d.shape)
+    filters_d = np.zeros(filters.shape)
+    imgs_pad_d = np.zeros(imgs_pad.shape)
+    for y in range(filters.shape[2]):
+        for x in range(filters.shape[3]):
+            win = (Ellipsis, slice(y, y + stride_h*(out_h - 1) + 1, stride_h),
+                   slice(x, x + stride_w*(out_w - 1) + 1, stride_w))
+            convout += np.einsum('bchw,fc->bfhw', imgs_pad[win],
+                                 filters[:, :, y, x])
+            filters_d[:, :, y, x] = np.einsum('bfhw,bchw->fc', convout_d,
+                                              imgs_pad[win])
+            imgs_pad_d[win] += np.einsum('bfhw,fc->bchw', convout_d,
+                                         filters[:, :, y, x])
+    imgs_d = imgs_pad_d[:, :, pad_h:pad_h + imgs.shape[2],
+                        pad_w:pad_w + imgs.shape[3]]
+    return convout, filters_d, imgs_d
+
+
+def test_winograd():
+    # Odd image sizes exercise the partial tiles at the borders
+    shapes = [(2, 3, 8, 8), (3, 5, 7, 9), (1, 2, 1, 1), (4, 16, 14, 15)]
+    for dtype, rtol in [(np.float32, 1e-5), (np.float64, 1e-12)]:
+        for shape in shapes:
+            imgs = np.random.normal(size=shape).astype(dtype)
+            filters = np.random.normal(size=(6, shape[1], 3, 3)).astype(dtype)
+            convout_d = np.random.normal(size=(shape[0], 6) + shape[2:])
+            convout_d = convout_d.astype(dtype)
+            direct = conv('direct', imgs, filters, convout_d)
+            winograd = conv('winograd', imgs, filters, convout_d)
+            for a, b in zip(direct, winograd):
+                err = np.max(np.abs(a - b)) / np.max(np.abs(a))
+                print(b.dtype == dtype and err < rtol)
+
+
+def test_reference():
+    # (filter_shape, padding, strides); only the first runs as Winograd, the
+    # others fall back to matmul with impl='winograd'
+    configs = [((3, 3), (1, 1), (1, 1)),
+               ((3, 3), (1, 1), (2, 2)),
+               ((3, 3), (2, 0), (1, 1)),
+               ((3, 5), (0, 2), (2, 1)),
+               ((1, 1), (0, 0), (1, 1)),
+               ((1, 1), (1, 0), (2, 2)),
+               ((2, 2), (0, 1), (3, 2))]
+    for dtype, rtol in [(np.float32, 1e-5), (np.float64, 1e-12)]:
+        for filter_shape, padding, strides in configs:
+            imgs = np.random.normal(size=(2, 3, 9, 8)).astype(dtype)
+            filters = np.random.normal(size=(4, 3) + filter_shape)
+            filters = filters.astype(dtype)
+            layer = ca.nnet.ConvBC01(padding, strides)
+            convout_shape = layer.output_shape(imgs.shape, 4, filter_shape)
+            convout_d = np.random.normal(size=convout_shape).astype(dtype)
+            ref = conv_reference(imgs, filters, convout_d, padding, strides)
+            for impl in ['direct', 'matmul', 'winograd']:
+                res = conv(impl, imgs, filters, convout_d, padding, strides)
+                for a, b in zip(ref, res):
+                    err = np.max(np.abs(a - b)) / np.max(np.abs(a))
+                    print(b.dtype == dtype and err < rtol)
+
+
+def test_winograd_fallback():
+    # Other filter shapes use the matmul engine
+    imgs = np.random.normal(size=(2, 3, 9, 9))
+    filters = np.random.normal(size=(4, 3, 5, 5))
+    layer = ca.nnet.ConvBC01((1, 1), (1, 1), impl='winograd')
+    convout = layer.fprop(imgs, filters)
+    convout_d = np.random.normal(size=convout.shape)
+    direct = conv('direct', imgs, filters, convout_d)
+    print(np.allclose(direct[0], convout))
+
+
+def run():
+    test_winograd()
+    test_reference()
+    test_winograd_fallback()
+
+
+if __name__ == '__main__':
+    run()
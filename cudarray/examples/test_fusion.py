@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import os
+import numpy as np
+
+os.environ['CUDARRAY_BACKEND'] = 'numpy'
+import cudarray as ca
+from cudarray import fusion
+
+
+def test_expressions():
+    a = np.random.normal(size=(300, 70)).astype(np.float32)
+    b = np.random.uniform(1, 2, size=(300, 70)).astype(np.float32)
+    c = np.random.normal(size=(70,)).astype(np.float32)
+    x, y, z = fusion.lazy(a), fusion.lazy(b), fusion.lazy(c)
+    cases = [
+        (x + y*2 - 1, a + b*2 - 1),
+        (-x / y + x**2, -a / b + a**2),
+        (fusion.sqrt(y) * fusion.exp(x) - fusion.log(y), np.sqrt(b) *
+         np.exp(a) - np.log(b)),
+        (fusion.maximum(x, 0) + fusion.minimum(z, x), np.maximum(a, 0) +
+         np.minimum(c, a)),
+        (abs(x) * z, np.abs(a) * c),
+        (2 ** fusion.tanh(x), 2 ** np.tanh(a)),
+        (fusion.sqrt(fusion.lazy(4.0)) * x, 2 * a),
+    ]
+    for expr, ref in cases:
+        out = expr.eval()
+        print(out.dtype == np.float32 and np.allclose(out, ref, atol=1e-5))
+
+
+def test_broadcast():
+    # Non-contiguous and broadcast operands take the blocked row path
+    a = np.random.normal(size=(5, 40, 60))
+    b = np.random.normal(size=(40, 1))
+    c = np.random.normal(size=(60, 5)).T
+    out = fusion.evaluate(fusion.lazy(a) * b + c[:, None, :])
+    print(np.allclose(out, a * b + c[:, None, :]))
+    out = fusion.evaluate(fusion.lazy(np.float64(3)) * 2)
+    print(out.shape == () and out == 6)
+
+
+def test_adam():
+    beta1, beta2, eps, learn_rate = 0.9, 0.999, 1e-8, 0.01
+    shape = (3, 64, 50)
+    param = np.random.normal(size=shape).astype(np.float32)
+    m = np.zeros(shape, dtype=np.float32)
+    v = np.zeros(shape, dtype=np.float32)
+    param_ref, m_ref, v_ref = param.copy(), m.copy(), v.copy()
+    for _ in range(3):
+        grad = np.random.normal(size=shape).astype(np.float32)
+        m_ref = beta1*m_ref + (1-beta1)*grad
+        v_ref = beta2*v_ref + (1-beta2)*grad**2
+        param_ref -= learn_rate * m_ref / (np.sqrt(v_ref) + eps)
+        p_, m_, v_, g_ = [fusion.lazy(a) for a in (param, m, v, grad)]
+        fusion.evaluate(beta1*m_ + (1-beta1)*g_, out=m)
+        fusion.evaluate(beta2*v_ + (1-beta2)*g_**2, out=v)
+        fusion.evaluate(p_ - learn_rate * m_ / (fusion.sqrt(v_) + eps),
+                        out=param)
+    print(param.dtype == np.float32 and np.allclose(param, param_ref))
+
+
+def run():
+    test_expressions()
+    test_broadcast()
+    test_adam()
+
+
+if __name__ == '__main__':
+    run()
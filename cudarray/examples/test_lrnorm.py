@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+import os
+import numpy as np
+
+os.environ['CUDARRAY_BACKEND'] = 'numpy'
+import cudarray as ca
+from cudarray.numpy_backend.nnet import lrnorm_bc01, lrnorm_bc01_bprop
+
+
+def lrnorm_reference(imgs, N, alpha, beta, k):
+    n_channels = imgs.shape[1]
+    pre_pad = (N - 1) // 2
+    post_pad = N - pre_pad - 1
+    sq = imgs.astype(np.float64)**2
+    scale = np.empty_like(sq)
+    for c in range(n_channels):
+        window = sq[:, max(c - pre_pad, 0):c + post_pad + 1]
+        scale[:, c] = k + alpha * np.sum(window, axis=1)
+    normout = imgs * scale**-beta
+    return normout, scale
+
+
+def lrnorm_bprop_reference(imgs, normout_d, N, alpha, beta, k):
+    n_channels = imgs.shape[1]
+    pre_pad = (N - 1) // 2
+    post_pad = N - pre_pad - 1
+    normout, scale = lrnorm_reference(imgs, N, alpha, beta, k)
+    t = normout_d * normout / scale
+    imgs_d = normout_d * scale**-beta
+    for j in range(n_channels):
+        # Channel j is in the windows of channels [j - post_pad, j + pre_pad]
+        window = t[:, max(j - post_pad, 0):j + pre_pad + 1]
+        imgs_d[:, j] -= 2 * alpha * beta * imgs[:, j] * np.sum(window, axis=1)
+    return imgs_d
+
+
+def rel_err(a, b):
+    return np.max(np.abs(a - b)) / np.max(np.abs(b))
+
+
+def test_lrnorm():
+    # Fewer channels than N exercise the clipped windows at both ends
+    params = [(5, 1e-4, 0.75, 2.0), (4, 0.1, 0.75, 1.0), (3, 0.5, 0.6, 1.0),
+              (1, 0.2, 0.5, 1.5), (6, 0.3, 0.75, 1.0)]
+    shapes = [(2, 8, 5, 7), (3, 3, 4, 1)]
+    for dtype, rtol in [(np.float32, 1e-5), (np.float64, 1e-12)]:
+        for N, alpha, beta, k in params:
+            for shape in shapes:
+                imgs = np.random.normal(size=shape).astype(dtype)
+                normout_d = np.random.normal(size=shape).astype(dtype)
+                normout_ref, scale_ref = lrnorm_reference(imgs, N, alpha,
+                                                          beta, k)
+                imgs_d_ref = lrnorm_bprop_reference(imgs, normout_d, N,
+                                                    alpha, beta, k)
+
+                normout = np.empty_like(imgs)
+                scale = np.empty_like(imgs)
+                lrnorm_bc01(imgs, N, alpha, beta, k, normout, scale)
+                imgs_d = np.empty_like(imgs)
+                lrnorm_bc01_bprop(imgs, normout, normout_d, scale, N, alpha,
+                                  beta, imgs_d)
+                print(rel_err(normout, normout_ref) < rtol and
+                      rel_err(scale, scale_ref) < rtol and
+                      rel_err(imgs_d, imgs_d_ref) < 10*rtol)
+
+
+def test_lrnorm_inplace():
+    N, alpha, beta, k = 5, 0.1, 0.75, 1.0
+    for dtype in [np.float32, np.float64]:
+        imgs = np.random.normal(size=(2, 7, 3, 4)).astype(dtype)
+        normout_ref, scale_ref = lrnorm_reference(imgs, N, alpha, beta, k)
+        scale = np.empty_like(imgs)
+        normout = lrnorm_bc01(imgs, N, alpha, beta, k, scale=scale)
+        print(np.may_share_memory(normout, imgs) and
+              np.allclose(imgs, normout_ref) and
+              np.allclose(scale, scale_ref))
+        # scale is allocated when not given
+        imgs = np.random.normal(size=(2, 7, 3, 4)).astype(dtype)
+        normout_ref, _ = lrnorm_reference(imgs, N, alpha, beta, k)
+        print(np.allclose(lrnorm_bc01(imgs, N, alpha, beta, k), normout_ref))
+
+
+def test_lrnorm_bprop_numerical():
+    # Check the gradient of sum(normout*normout_d) by central differences
+    N, alpha, beta, k = 3, 0.5, 0.75, 1.0
+    imgs = np.random.normal(size=(1, 4, 2, 3))
+    normout_d = np.random.normal(size=imgs.shape)
+    normout = np.empty_like(imgs)
+    scale = np.empty_like(imgs)
+    lrnorm_bc01(imgs, N, alpha, beta, k, normout, scale)
+    imgs_d = np.empty_like(imgs)
+    lrnorm_bc01_bprop(imgs, normout, normout_d, scale, N, alpha, beta, imgs_d)
+
+    eps = 1e-6
+    imgs_d_num = np.empty_like(imgs)
+    for idx in np.ndindex(*imgs.shape):
+        x = imgs.copy()
+        x[idx] += eps
+        f_plus = np.sum(lrnorm_bc01(x, N, alpha, beta, k) * normout_d)
+        x = imgs.copy()
+        x[idx] -= eps
+        f_minus = np.sum(lrnorm_bc01(x, N, alpha, beta, k) * normout_d)
+        imgs_d_num[idx] = (f_plus - f_minus) / (2*eps)
+    print(np.allclose(imgs_d, imgs_d_num, rtol=1e-5, atol=1e-7))
+
+
+def test_lrnorm_op():
+    # The op follows Caffe and scales alpha by 1/N
+    N, alpha, beta, k = 5, 1e-2, 0.75, 2.0
+    for dtype, rtol in [(np.float32, 1e-5), (np.float64, 1e-12)]:
+        layer = ca.nnet.LRNormBC01(N, alpha, beta, k)
+        for shape in [(2, 8, 5, 7), (3, 3, 4, 1)]:
+            imgs = np.random.normal(size=shape).astype(dtype)
+            normout_d = np.random.normal(size=shape).astype(dtype)
+            normout_ref, _ = lrnorm_reference(imgs, N, alpha / N, beta, k)
+            imgs_d_ref = lrnorm_bprop_reference(imgs, normout_d, N,
+                                                alpha / N, beta, k)
+            normout = layer.fprop(imgs)
+            imgs_d = layer.bprop(normout_d)
+            print(normout.dtype == dtype and imgs_d.dtype == dtype and
+                  layer.output_shape(shape) == shape and
+                  rel_err(normout, normout_ref) < rtol and
+                  rel_err(imgs_d, imgs_d_ref) < 10*rtol)
+
+
+def run():
+    test_lrnorm()
+    test_lrnorm_inplace()
+    test_lrnorm_bprop_numerical()
+    test_lrnorm_op()
+
+
+if __name__ == '__main__':
+    run()
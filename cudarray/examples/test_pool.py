@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import os
+import numpy as np
+
+os.environ['CUDARRAY_BACKEND'] = 'numpy'
+import cudarray as ca
+
+
+def windows(img_shape, win_shape, padding, strides):
+    img_h, img_w = img_shape
+    out_h = (img_h + 2*padding[0] - win_shape[0]) // strides[0] + 1
+    out_w = (img_w + 2*padding[1] - win_shape[1]) // strides[1] + 1
+    for y_out in range(out_h):
+        y = y_out*strides[0] - padding[0]
+        for x_out in range(out_w):
+            x = x_out*strides[1] - padding[1]
+            yield ((y_out, x_out), slice(max(y, 0), y + win_shape[0]),
+                   slice(max(x, 0), x + win_shape[1]))
+
+
+def pool_reference(imgs, poolout_d, win_shape, padding, strides, method):
+    poolout_shape = ca.nnet.PoolB01(win_shape, padding, strides,
+                                    method).output_shape(imgs.shape)
+    poolout = np.empty(poolout_shape, dtype=imgs.dtype)
+    imgs_d = np.zeros_like(imgs)
+    win_size = win_shape[0]*win_shape[1]
+    for out_idx, ys, xs in windows(imgs.shape[-2:], win_shape, padding,
+                                   strides):
+        out_idx = (Ellipsis,) + out_idx
+        win = imgs[..., ys, xs]
+        win_d = imgs_d[..., ys, xs]
+        if method == 'max':
+            flat = win.reshape(win.shape[:-2] + (-1,))
+            poolout[out_idx] = np.max(flat, axis=-1)
+            mask = flat == poolout[out_idx][..., np.newaxis]
+            win_d += (mask*poolout_d[out_idx][..., np.newaxis]).reshape(
+                win.shape)
+        else:
+            # Padded pixels count as zero
+            poolout[out_idx] = np.sum(win, axis=(-2, -1)) / win_size
+            win_d += poolout_d[out_idx][..., np.newaxis, np.newaxis]/win_size
+    return poolout, imgs_d
+
+
+def pool(imgs, poolout_d, win_shape, padding, strides, method):
+    layer = ca.nnet.PoolB01(win_shape, padding, strides, method)
+    poolout = np.array(layer.fprop(imgs))
+    imgs_d = np.array(layer.bprop(imgs.shape[-2:], poolout_d))
+    return poolout, imgs_d
+
+
+def test_pool():
+    # (win_shape, padding, strides); the first takes the 2x2/s2 fast path
+    configs = [((2, 2), (0, 0), (2, 2)),
+               ((3, 3), (0, 0), (2, 2)),
+               ((3, 3), (1, 1), (1, 1)),
+               ((2, 3), (1, 0), (1, 2)),
+               ((2, 2), (1, 1), (2, 2))]
+    img_shapes = [(8, 6), (7, 9), (5, 5), (1, 4)]
+    for dtype, atol in [(np.float32, 1e-6), (np.float64, 1e-12)]:
+        for method in ['max', 'avg']:
+            for win_shape, padding, strides in configs:
+                for img_shape in img_shapes:
+                    if (img_shape[0] + 2*padding[0] < win_shape[0] or
+                            img_shape[1] + 2*padding[1] < win_shape[1]):
+                        continue
+                    imgs = np.random.normal(size=(2, 3) + img_shape)
+                    imgs = imgs.astype(dtype)
+                    layer = ca.nnet.PoolB01(win_shape, padding, strides,
+                                            method)
+                    poolout_d = np.random.normal(
+                        size=layer.output_shape(imgs.shape)).astype(dtype)
+                    poolout, imgs_d = pool(imgs, poolout_d, win_shape,
+                                           padding, strides, method)
+                    poolout_ref, imgs_d_ref = pool_reference(
+                        imgs, poolout_d, win_shape, padding, strides, method)
+                    print(poolout.dtype == dtype and imgs_d.dtype == dtype and
+                          np.allclose(poolout, poolout_ref, atol=atol) and
+                          np.allclose(imgs_d, imgs_d_ref, atol=atol))
+
+
+def test_switches():
+    # Switches are flat int32 indices into each image plane
+    imgs = np.random.normal(size=(2, 3, 7, 5))
+    for win_shape, strides in [((2, 2), (2, 2)), ((3, 3), (2, 2))]:
+        layer = ca.nnet.PoolB01(win_shape, (0, 0), strides, 'max')
+        poolout = np.array(layer.fprop(imgs))
+        mask = np.array(layer.mask)
+        planes = imgs.reshape(imgs.shape[:2] + (-1,))
+        picked = np.take_along_axis(planes, mask.reshape(mask.shape[:2] +
+                                                         (-1,)), axis=-1)
+        print(mask.dtype == np.int32 and mask.shape == poolout.shape and
+              np.array_equal(picked.reshape(poolout.shape), poolout))
+
+
+def run():
+    test_pool()
+    test_switches()
+
+
+if __name__ == '__main__':
+    run()
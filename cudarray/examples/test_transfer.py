@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+import gc
+import weakref
+import numpy as np
+import cudarray as ca
+from cudarray import transfer
+
+
+def test_async_copy():
+    a_np = np.random.normal(size=(50, 30)).astype(np.float32)
+    stream = transfer.Stream()
+    done = transfer.Event()
+
+    host = transfer.pinned_empty(a_np.shape, dtype=np.float32)
+    host[...] = a_np
+    a_ca = transfer.to_device_async(host, stream=stream)
+    done.record(stream)
+    done.wait()
+    b_ca = a_ca * 2
+
+    out = transfer.pinned_empty(a_np.shape, dtype=np.float32)
+    finished = transfer.Event()
+    finished.record()
+    finished.wait(stream)
+    transfer.to_host_async(b_ca, out, stream=stream)
+    stream.synchronize()
+    print(stream.query() and np.allclose(out, a_np*2))
+
+
+def test_keep_alive():
+    # Dropping the host array of a pending upload must not free it
+    a_np = np.random.normal(size=(200, 300)).astype(np.float32)
+    stream = transfer.Stream()
+    host = transfer.pinned_empty(a_np.shape, dtype=np.float32)
+    host[...] = a_np
+    a_ca = transfer.to_device_async(host, stream=stream)
+    host_ref = weakref.ref(host)
+    del host
+    gc.collect()
+    # Overwrite recycled host memory, if any, before the copy is waited on
+    junk = [transfer.pinned_empty(a_np.shape, dtype=np.float32)
+            for _ in range(4)]
+    for j in junk:
+        j.fill(-1)
+    stream.synchronize()
+    print(np.allclose(np.array(a_ca), a_np))
+    print(ca._backend != 'cuda' or host_ref() is not None)
+    # Completed copies are released
+    print(transfer.n_in_flight() == 0 and host_ref() is None)
+
+
+def test_double_buffer():
+    batches = [np.random.normal(size=(16, 20)) for _ in range(5)]
+    batches.append(np.random.normal(size=(7, 20)))
+    w_np = np.random.normal(size=(20, 4))
+    w_ca = ca.array(w_np)
+    for n_buffers in [2, 3]:
+        results = []
+        for x in transfer.DoubleBuffer(batches, n_buffers):
+            results.append(np.array(ca.dot(x, w_ca)))
+        print(len(results) == len(batches) and
+              all(np.allclose(y, np.dot(x, w_np), atol=1e-4)
+                  for x, y in zip(batches, results)))
+
+
+def run():
+    test_async_copy()
+    test_keep_alive()
+    test_double_buffer()
+
+
+if __name__ == '__main__':
+    run()
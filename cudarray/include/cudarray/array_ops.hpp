@@ -1,6 +1,8 @@
 #ifndef ARRAY_OPS_HPP_
 #define ARRAY_OPS_HPP_
 
+#include <cudarray/strided.hpp>
+
 namespace cudarray {
 
 template<typename T>
@@ -15,6 +17,13 @@ void fill(T *a, unsigned int n, T alpha);
 template<typename T>
 void copy(const T *a, unsigned int n, T *b);
 
+/*
+  Copy between strided arrays of the given shape. Strides are in elements.
+*/
+template<typename T>
+void copy_strided(const T *a, unsigned int ndim, const unsigned int *shape,
+                  const int *a_strides, const int *b_strides, T *b);
+
 template<typename T>
 void to_device(const T *a, unsigned int n, T *b);
 
@@ -2,6 +2,7 @@
 #define ELEMENTWISE_HPP_
 
 #include <cudarray/common.hpp>
+#include <cudarray/strided.hpp>
 
 
 namespace cudarray {
@@ -29,6 +30,15 @@ template<typename Ta, typename Tb, typename Tc>
 void binary_broadcast(BinaryOp op, BroadcastType btype, const Ta *a,
     const Tb *b, unsigned int k, unsigned int m, unsigned int n, Tc *c);
 
+/*
+  c = op(a, b) for a and b broadcast to the shape of the contiguous c. The
+  strides of a and b are in elements with 0 on broadcast axes.
+*/
+template<typename Ta, typename Tb, typename Tc>
+void binary_strided(BinaryOp op, const Ta *a, const Tb *b, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    Tc *c);
+
 
 enum BinaryCmpOp {
   EQ_OP, GT_OP, GT_EQ_OP, LT_OP, LT_EQ_OP, NEQ_OP,
@@ -50,6 +60,11 @@ template<typename Ta, typename Tb>
 void binary_cmp_broadcast(BinaryCmpOp op, BroadcastType btype, const Ta *a,
     const Tb *b, unsigned int k, unsigned int m, unsigned int n, bool_t *c);
 
+template<typename Ta, typename Tb>
+void binary_cmp_strided(BinaryCmpOp op, const Ta *a, const Tb *b,
+    unsigned int ndim, const unsigned int *shape, const int *a_strides,
+    const int *b_strides, bool_t *c);
+
 
 enum UnaryOp {
   ABS_OP, COS_OP, EXP_OP, LOG_OP, NEG_OP, SIN_OP, SQRT_OP, TANH_OP,
@@ -1,6 +1,8 @@
 #ifndef REDUCTION_HPP_
 #define REDUCTION_HPP_
 
+#include <cudarray/strided.hpp>
+
 namespace cudarray {
 
 enum ReduceOp {
@@ -25,6 +27,23 @@ template<typename T>
 void reduce_mat_to_int(ReduceToIntOp op, const T *a, unsigned int m,
                        unsigned int n, bool reduce_leading, int *b);
 
+/*
+  Reduce the axes given by reduce_shape/reduce_strides for every element of
+  the contiguous output b, whose axes in a are given by keep_shape/
+  keep_strides. Strides are in elements of a.
+*/
+template<typename T>
+void reduce_strided(ReduceOp op, const T *a, unsigned int keep_ndim,
+    const unsigned int *keep_shape, const int *keep_strides,
+    unsigned int reduce_ndim, const unsigned int *reduce_shape,
+    const int *reduce_strides, T *b);
+
+template<typename T>
+void reduce_strided_to_int(ReduceToIntOp op, const T *a,
+    unsigned int keep_ndim, const unsigned int *keep_shape,
+    const int *keep_strides, unsigned int reduce_ndim,
+    const unsigned int *reduce_shape, const int *reduce_strides, int *b);
+
 }
 
 #endif // REDUCTION_HPP_
@@ -0,0 +1,51 @@
+#ifndef STRIDED_HPP_
+#define STRIDED_HPP_
+
+#include <stdexcept>
+
+
+namespace cudarray {
+
+const int kMaxStridedDims = 8;
+
+/*
+  Shape and element strides of a strided array. Broadcast axes have stride 0.
+  Passed by value to kernels.
+*/
+struct StridedShape {
+  int ndim;
+  unsigned int shape[kMaxStridedDims];
+  int strides[kMaxStridedDims];
+};
+
+inline StridedShape strided_shape(unsigned int ndim, const unsigned int *shape,
+                                  const int *strides) {
+  if (ndim > kMaxStridedDims) {
+    throw std::runtime_error("too many dimensions for strided array");
+  }
+  StridedShape s;
+  s.ndim = ndim;
+  for (unsigned int i = 0; i < ndim; ++i) {
+    s.shape[i] = shape[i];
+    s.strides[i] = strides[i];
+  }
+  return s;
+}
+
+#ifdef __CUDACC__
+/*
+  Offset of element idx in C order.
+*/
+__device__ inline int strided_offset(unsigned int idx, const StridedShape &s) {
+  int offset = 0;
+  for (int i = s.ndim - 1; i >= 0; --i) {
+    offset += (idx % s.shape[i]) * s.strides[i];
+    idx /= s.shape[i];
+  }
+  return offset;
+}
+#endif
+
+}
+
+#endif // STRIDED_HPP_
@@ -76,7 +76,23 @@ def numpy_extensions():
         'cudarray/numpy_backend/nnet/pool_bc01.pyx',
         'cudarray/numpy_backend/nnet/lrnorm_bc01.pyx',
     ]
-    return cythonize(cython_srcs, include_path=[numpy.get_include()])
+    extra_compile_args = ['-O3']
+    extra_link_args = []
+    if os.getenv('OPENMP_DISABLED') != '1':
+        # The kernels parallelize over images and channels with OpenMP
+        extra_compile_args.append('-fopenmp')
+        extra_link_args.append('-fopenmp')
+
+    def make_extension(src):
+        return Extension(
+            name=os.path.splitext(src)[0].replace('/', '.'),
+            sources=[src],
+            include_dirs=[numpy.get_include()],
+            extra_compile_args=extra_compile_args,
+            extra_link_args=extra_link_args,
+        )
+    exts = list(map(make_extension, cython_srcs))
+    return cythonize(exts, include_path=[numpy.get_include()])
 
 
 class Clean(Command):
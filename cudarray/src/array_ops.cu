@@ -111,6 +111,37 @@ template void copy<int>(const int *a, unsigned int n, int *b);
 template void copy<float>(const float *a, unsigned int n, float *b);
 
 
+template<typename T>
+__global__ void kernel_copy_strided(const T *a, StridedShape a_shape,
+                                    unsigned int n, StridedShape b_shape,
+                                    T *b) {
+  CUDA_GRID_STRIDE_LOOP(idx, n) {
+    b[strided_offset(idx, b_shape)] = a[strided_offset(idx, a_shape)];
+  }
+}
+
+template<typename T>
+void copy_strided(const T *a, unsigned int ndim, const unsigned int *shape,
+                  const int *a_strides, const int *b_strides, T *b) {
+  unsigned int n = 1;
+  for (unsigned int i = 0; i < ndim; ++i) {
+    n *= shape[i];
+  }
+  kernel_copy_strided<T><<<cuda_blocks(n), kNumBlockThreads>>>(
+      a, strided_shape(ndim, shape, a_strides), n,
+      strided_shape(ndim, shape, b_strides), b
+  );
+  CUDA_KERNEL_CHECK;
+}
+
+template void copy_strided<int>(const int *a, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    int *b);
+template void copy_strided<float>(const float *a, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    float *b);
+
+
 template<typename T>
 void to_device(const T *a, unsigned int n, T *b) {
   CUDA_CHECK(cudaMemcpy(b, a, n*sizeof(T), cudaMemcpyHostToDevice));
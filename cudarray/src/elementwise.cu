@@ -348,6 +348,7 @@ void binary_broadcast(BroadcastType btype, const Ta *a, const Tb *b,
   switch (btype) {
     case BROADCAST_INNER:
       binary_broadcast<Ta, Tb, Tc, Op, true>(a, b, k, m, n, c);
+      break;
     case BROADCAST_LEADING:
       binary_broadcast<Ta, Tb, Tc, Op, true>(a, b, m, n, c);
       break;
@@ -410,6 +411,86 @@ template void binary_broadcast<int, int, int>(
 
 
 
+template<typename Ta, typename Tb, typename Tc, typename Op>
+__global__ void kernel_binary_strided(const Ta *a, StridedShape a_shape,
+    const Tb *b, StridedShape b_shape, unsigned int n, Tc *c) {
+  Op op;
+  CUDA_GRID_STRIDE_LOOP(idx, n) {
+    c[idx] = op(a[strided_offset(idx, a_shape)],
+                b[strided_offset(idx, b_shape)]);
+  }
+}
+
+template<typename Ta, typename Tb, typename Tc, typename Op>
+void binary_strided(const Ta *a, const Tb *b, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    Tc *c) {
+  unsigned int n = 1;
+  for (unsigned int i = 0; i < ndim; ++i) {
+    n *= shape[i];
+  }
+  kernel_binary_strided<Ta, Tb, Tc, Op>
+      <<<cuda_blocks(n), kNumBlockThreads>>>
+      (a, strided_shape(ndim, shape, a_strides), b,
+       strided_shape(ndim, shape, b_strides), n, c);
+  CUDA_KERNEL_CHECK;
+}
+
+template<typename Ta, typename Tb, typename Tc>
+void binary_strided(BinaryOp op, const Ta *a, const Tb *b, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    Tc *c) {
+  switch (op) {
+    case ADD_OP:
+      binary_strided<Ta, Tb, Tc, AddOp<Ta, Tb, Tc> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+    case DIV_OP:
+      binary_strided<Ta, Tb, Tc, DivOp<Ta, Tb, Tc> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+    case MAX_B_OP:
+      binary_strided<Ta, Tb, Tc, MaxOp<Ta, Tb, Tc> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+    case MIN_B_OP:
+      binary_strided<Ta, Tb, Tc, MinOp<Ta, Tb, Tc> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+    case MUL_OP:
+      binary_strided<Ta, Tb, Tc, MulOp<Ta, Tb, Tc> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+    case POW_OP:
+      binary_strided<Ta, Tb, Tc, PowOp<Ta, Tb, Tc> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+    case SUB_OP:
+      binary_strided<Ta, Tb, Tc, SubOp<Ta, Tb, Tc> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+  }
+}
+
+template void binary_strided<float, float, float>(
+    BinaryOp op, const float *a, const float *b, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    float *c);
+template void binary_strided<float, int, float>(
+    BinaryOp op, const float *a, const int *b, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    float *c);
+template void binary_strided<int, float, float>(
+    BinaryOp op, const int *a, const float *b, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    float *c);
+template void binary_strided<int, int, int>(
+    BinaryOp op, const int *a, const int *b, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    int *c);
+
+
+
 BINARY_OP(EqOp, a == b)
 BINARY_OP(GtOp, a > b)
 BINARY_OP(GtEqOp, a >= b)
@@ -579,6 +660,57 @@ template void binary_cmp_broadcast<int, int>(
 
 
 
+template<typename Ta, typename Tb>
+void binary_cmp_strided(BinaryCmpOp op, const Ta *a, const Tb *b,
+    unsigned int ndim, const unsigned int *shape, const int *a_strides,
+    const int *b_strides, bool_t *c) {
+  switch (op) {
+    case EQ_OP:
+      binary_strided<Ta, Tb, bool_t, EqOp<Ta, Tb, bool_t> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+    case GT_OP:
+      binary_strided<Ta, Tb, bool_t, GtOp<Ta, Tb, bool_t> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+    case GT_EQ_OP:
+      binary_strided<Ta, Tb, bool_t, GtEqOp<Ta, Tb, bool_t> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+    case LT_OP:
+      binary_strided<Ta, Tb, bool_t, LtOp<Ta, Tb, bool_t> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+    case LT_EQ_OP:
+      binary_strided<Ta, Tb, bool_t, LtEqOp<Ta, Tb, bool_t> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+    case NEQ_OP:
+      binary_strided<Ta, Tb, bool_t, NeqOp<Ta, Tb, bool_t> >
+          (a, b, ndim, shape, a_strides, b_strides, c);
+      break;
+  }
+}
+
+template void binary_cmp_strided<float, float>(
+    BinaryCmpOp op, const float *a, const float *b, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    bool_t *c);
+template void binary_cmp_strided<float, int>(
+    BinaryCmpOp op, const float *a, const int *b, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    bool_t *c);
+template void binary_cmp_strided<int, float>(
+    BinaryCmpOp op, const int *a, const float *b, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    bool_t *c);
+template void binary_cmp_strided<int, int>(
+    BinaryCmpOp op, const int *a, const int *b, unsigned int ndim,
+    const unsigned int *shape, const int *a_strides, const int *b_strides,
+    bool_t *c);
+
+
+
 
 #define UNARY_OP(name, operation) \
 template <typename Ta, typename Tb> \
@@ -456,4 +456,143 @@ template void reduce_mat_to_int<float>(ReduceToIntOp op, const float *a,
 template void reduce_mat_to_int<int>(ReduceToIntOp op, const int *a,
     unsigned int m, unsigned int n, bool reduce_leading, int *b);
 
+
+
+/*
+  One thread block per output element. Each thread reduces a strided subset
+  of the reduction axes, and the partial results are combined in shared
+  memory. Partial results are merged such that the one with the lower index
+  is kept on ties, as NumPy does for argmax/argmin.
+*/
+template <typename Ta, typename Tb, typename Op>
+__global__ void kernel_reduce_strided(const Ta *a, StridedShape keep,
+    unsigned int n_keep, StridedShape reduce, unsigned int n_reduce, Tb *b) {
+  SharedMemory<Ta> smem;
+  Ta *s_vals = smem.pointer();
+  int *s_idxs = (int *) (s_vals + blockDim.x);
+  unsigned int tid = threadIdx.x;
+  for (unsigned int out_idx = blockIdx.x; out_idx < n_keep;
+       out_idx += gridDim.x) {
+    const Ta *a_ = a + strided_offset(out_idx, keep);
+    Ta val = Op::identity();
+    int val_idx = 0;
+    for (unsigned int i = tid; i < n_reduce; i += blockDim.x) {
+      Op::reduce(a_[strided_offset(i, reduce)], i, val, val_idx);
+    }
+    s_vals[tid] = val;
+    s_idxs[tid] = val_idx;
+    __syncthreads();
+    for (unsigned int s = blockDim.x / 2; s > 0; s >>= 1) {
+      if (tid < s) {
+        Ta other = s_vals[tid + s];
+        int other_idx = s_idxs[tid + s];
+        if (other_idx < val_idx) {
+          Ta tmp = val;
+          int tmp_idx = val_idx;
+          val = other;
+          val_idx = other_idx;
+          other = tmp;
+          other_idx = tmp_idx;
+        }
+        Op::reduce(other, other_idx, val, val_idx);
+        s_vals[tid] = val;
+        s_idxs[tid] = val_idx;
+      }
+      __syncthreads();
+    }
+    if (tid == 0) {
+      Op::scale(val, n_reduce);
+      Op::select(b[out_idx], val, val_idx);
+    }
+    __syncthreads();
+  }
+}
+
+const unsigned int max_strided_blocks = 4096;
+
+template <typename Ta, typename Tb, typename Op>
+void reduce_strided(const Ta *a, unsigned int keep_ndim,
+    const unsigned int *keep_shape, const int *keep_strides,
+    unsigned int reduce_ndim, const unsigned int *reduce_shape,
+    const int *reduce_strides, Tb *b) {
+  unsigned int n_keep = 1;
+  for (unsigned int i = 0; i < keep_ndim; ++i) {
+    n_keep *= keep_shape[i];
+  }
+  unsigned int n_reduce = 1;
+  for (unsigned int i = 0; i < reduce_ndim; ++i) {
+    n_reduce *= reduce_shape[i];
+  }
+  // Power of two number of threads for the tree reduction
+  unsigned int n_threads = min(reduce_cta_size, ceil_pow2(n_reduce));
+  unsigned int n_blocks = min(max_strided_blocks, n_keep);
+  int smem_size = n_threads * (sizeof(Ta) + sizeof(int));
+  kernel_reduce_strided<Ta, Tb, Op><<<n_blocks, n_threads, smem_size>>>(
+      a, strided_shape(keep_ndim, keep_shape, keep_strides), n_keep,
+      strided_shape(reduce_ndim, reduce_shape, reduce_strides), n_reduce, b
+  );
+  CUDA_KERNEL_CHECK;
+}
+
+template<typename T>
+void reduce_strided(ReduceOp op, const T *a, unsigned int keep_ndim,
+    const unsigned int *keep_shape, const int *keep_strides,
+    unsigned int reduce_ndim, const unsigned int *reduce_shape,
+    const int *reduce_strides, T *b) {
+  switch (op) {
+    case MAX_OP:
+      reduce_strided<T, T, max_op<T> >(a, keep_ndim, keep_shape,
+          keep_strides, reduce_ndim, reduce_shape, reduce_strides, b);
+      break;
+    case MEAN_OP:
+      reduce_strided<T, T, mean_op<T> >(a, keep_ndim, keep_shape,
+          keep_strides, reduce_ndim, reduce_shape, reduce_strides, b);
+      break;
+    case MIN_OP:
+      reduce_strided<T, T, min_op<T> >(a, keep_ndim, keep_shape,
+          keep_strides, reduce_ndim, reduce_shape, reduce_strides, b);
+      break;
+    case SUM_OP:
+      reduce_strided<T, T, sum_op<T> >(a, keep_ndim, keep_shape,
+          keep_strides, reduce_ndim, reduce_shape, reduce_strides, b);
+      break;
+  }
+}
+
+template void reduce_strided<float>(ReduceOp op, const float *a,
+    unsigned int keep_ndim, const unsigned int *keep_shape,
+    const int *keep_strides, unsigned int reduce_ndim,
+    const unsigned int *reduce_shape, const int *reduce_strides, float *b);
+template void reduce_strided<int>(ReduceOp op, const int *a,
+    unsigned int keep_ndim, const unsigned int *keep_shape,
+    const int *keep_strides, unsigned int reduce_ndim,
+    const unsigned int *reduce_shape, const int *reduce_strides, int *b);
+
+
+template<typename T>
+void reduce_strided_to_int(ReduceToIntOp op, const T *a,
+    unsigned int keep_ndim, const unsigned int *keep_shape,
+    const int *keep_strides, unsigned int reduce_ndim,
+    const unsigned int *reduce_shape, const int *reduce_strides, int *b) {
+  switch (op) {
+    case ARGMAX_OP:
+      reduce_strided<T, int, argmax_op<T> >(a, keep_ndim, keep_shape,
+          keep_strides, reduce_ndim, reduce_shape, reduce_strides, b);
+      break;
+    case ARGMIN_OP:
+      reduce_strided<T, int, argmin_op<T> >(a, keep_ndim, keep_shape,
+          keep_strides, reduce_ndim, reduce_shape, reduce_strides, b);
+      break;
+  }
+}
+
+template void reduce_strided_to_int<float>(ReduceToIntOp op, const float *a,
+    unsigned int keep_ndim, const unsigned int *keep_shape,
+    const int *keep_strides, unsigned int reduce_ndim,
+    const unsigned int *reduce_shape, const int *reduce_strides, int *b);
+template void reduce_strided_to_int<int>(ReduceToIntOp op, const int *a,
+    unsigned int keep_ndim, const unsigned int *keep_shape,
+    const int *keep_strides, unsigned int reduce_ndim,
+    const unsigned int *reduce_shape, const int *reduce_strides, int *b);
+
 }
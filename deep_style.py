@@ -2,6 +2,9 @@
 
 # todo: replace /caffe to /distibute
 # todo: script to make distibute
+import time
+_start_time = time.time()
+
 import numpy as np
 import os
 import sys
@@ -11,12 +14,30 @@ sys.path.insert(1, os.path.join(script_path, 'caffe'))
 sys.path.insert(1, os.path.join(script_path, 'cudarray'))
 
 import argparse
-import scipy.misc
-import caffe
-import caffe.draw
-import PIL.Image
-import caffe_style.style_net as style_net
-from caffe_style.style_adam_solver import StyleAdamSolver
+import importlib
+
+# caffe, caffe_style and PIL are imported with timed_import() where they are
+# first used, so --help and argument errors do not pay for them.
+_import_times = []
+_modules = {}
+
+
+def timed_import(name):
+    """Import a module on first use and record how long it took."""
+    if name not in _modules:
+        start = time.time()
+        _modules[name] = importlib.import_module(name)
+        _import_times.append((name, time.time() - start))
+    return _modules[name]
+
+
+def print_startup_profile(label):
+    print('Startup profile (%s):' % label)
+    for name, duration in _import_times:
+        print('  import %-30s %7.3f s' % (name, duration))
+    print('  %-37s %7.3f s' % ('imports total',
+                               sum(d for _, d in _import_times)))
+    print('  %-37s %7.3f s' % ('since start', time.time() - _start_time))
 
 
 def weight_tuple(s):
@@ -44,9 +65,13 @@ def weight_array(weights):
     return array
 
 
+def load_img(file_name):
+    return timed_import('caffe').io.load_image(file_name)
+
+
 def save_img(a, file_name):
     a = np.uint8(np.clip(a, 0, 255))
-    PIL.Image.fromarray(a).save(file_name)
+    timed_import('PIL.Image').fromarray(a).save(file_name)
 
 
 def preprocess(net, img):
@@ -102,25 +127,30 @@ def run():
                         type=str, help='VGG-19 .prototxt file.')
     parser.add_argument('--caffemodel', default='VGG_ILSVRC_19_layers.caffemodel',
                         type=str, help='VGG-19 .caffemodel file.')
+    parser.add_argument('--weight-cache', default=None, type=str,
+                        help='Path prefix of the memory-mapped weight cache. '
+                             'Defaults to the .caffemodel path.')
     parser.add_argument('--solver-params', default='solver_adam.prototxt',
                         type=str, help='Adam solver .prototxt file.')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Report import and startup timings.')
     args = parser.parse_args()
-
     main_run(args)
 
 
 def resize_big_image(image_path):
+    Image = timed_import('PIL.Image')
     maxwidth = 300
-    img = PIL.Image.open(image_path)
+    img = Image.open(image_path)
     if img.size[0] > maxwidth:
         wpercent = (maxwidth/float(img.size[0]))
         hsize = int((float(img.size[1])*float(wpercent)))
-        img = img.resize((maxwidth,hsize), PIL.Image.ANTIALIAS)
+        img = img.resize((maxwidth,hsize), Image.ANTIALIAS)
         img.save(image_path)
     elif img.size[1] > maxwidth:
         hpercent = (maxwidth/float(img.size[1]))
         wsize = int((float(img.size[0])*float(hpercent)))
-        img = img.resize((wsize, maxwidth), PIL.Image.ANTIALIAS)
+        img = img.resize((wsize, maxwidth), Image.ANTIALIAS)
         img.save(image_path)
 
 
@@ -136,13 +166,16 @@ def main_run(args):
 
     pixel_mean = [103.939, 116.779, 123.68]
     if args.gpu == "true":
+        caffe = timed_import('caffe')
         caffe.set_mode_gpu()
         caffe.set_device(0)
-    style_img = caffe.io.load_image(args.style)
-    subject_img = caffe.io.load_image(args.subject)
+    style_img = load_img(args.style)
+    subject_img = load_img(args.subject)
+    style_net = timed_import('caffe_style.style_net')
     net_caffe = style_net.StyleNet(prototxt, params_file, subject_img, style_img,
                                    args.subject_weights, args.style_weights, args.subject_ratio,
-                                   mean=np.float32(pixel_mean))
+                                   mean=np.float32(pixel_mean),
+                                   weight_cache=args.weight_cache)
     net = net_caffe
     src = net.blobs['data']
 
@@ -151,8 +184,12 @@ def main_run(args):
     src.data[...] = net.transformer.preprocess('data', subject_img)
 
     params = net._params
+    StyleAdamSolver = timed_import(
+        'caffe_style.style_adam_solver').StyleAdamSolver
     style_adam = StyleAdamSolver(learn_rate=args.learn_rate)
     optimization_states = [style_adam.init_state(p) for p in params]
+    if args.profile_startup:
+        print_startup_profile('net ready')
     for i in range(args.iterations):
         cost = np.mean(net.update())
         vis = deprocess(net, src.data[0])
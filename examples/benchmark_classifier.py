@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import time
+import numpy as np
+
+import caffe
+
+
+def images_per_second(classifier, images, oversample):
+    classifier.predict(images[:1], oversample=oversample)
+    n_iter = 3
+    start_time = time.time()
+    for _ in range(n_iter):
+        classifier.predict(images, oversample=oversample)
+    duration = time.time() - start_time
+    return n_iter * len(images) / duration
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description='Classifier throughput with center crops and with '
+                    '10-crop oversampling.')
+    parser.add_argument('model_def', help='Model definition (deploy) file.')
+    parser.add_argument('pretrained_model', help='Trained model weights.')
+    parser.add_argument('--images-dim', default='256,256',
+                        help='Canonical height,width to resize to.')
+    parser.add_argument('--n-images', type=int, default=64,
+                        help='Number of random input images.')
+    parser.add_argument('--image-shape', default='375,500',
+                        help='Height,width of the random input images.')
+    parser.add_argument('--gpu', action='store_true',
+                        help='Switch for gpu computation.')
+    args = parser.parse_args()
+
+    if args.gpu:
+        caffe.set_mode_gpu()
+    else:
+        caffe.set_mode_cpu()
+    image_dims = [int(s) for s in args.images_dim.split(',')]
+    image_shape = [int(s) for s in args.image_shape.split(',')]
+    classifier = caffe.Classifier(args.model_def, args.pretrained_model,
+                                  image_dims=image_dims, raw_scale=255.0,
+                                  channel_swap=(2, 1, 0))
+
+    np.random.seed(1)
+    images = [np.random.rand(*(image_shape + [3])).astype(np.float32)
+              for _ in range(args.n_images)]
+    print('n_images: %i, image_shape: (%i, %i), image_dims: (%i, %i)'
+          % ((args.n_images,) + tuple(image_shape) + tuple(image_dims)))
+    center = images_per_second(classifier, images, oversample=False)
+    oversampled = images_per_second(classifier, images, oversample=True)
+    print('  center crop: %.1f images/s' % center)
+    print('     10 crops: %.1f images/s' % oversampled)
+    print('        ratio: %.2f' % (center / oversampled))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import time
+import numpy as np
+
+import caffe
+
+
+def avg_running_time(fun):
+    n_iter = 5
+    start_time = time.time()
+    for _ in range(n_iter):
+        fun()
+    duration = time.time() - start_time
+    return duration / float(n_iter)
+
+
+def benchmark_resize(n_imgs, img_shape, new_dims):
+    print('\nresize n_imgs: %i, img_shape: (%i, %i, %i), new_dims: (%i, %i)'
+          % ((n_imgs,) + img_shape + new_dims))
+    imgs = np.random.rand(n_imgs, *img_shape).astype(np.float32)
+
+    def resize_loop():
+        out = np.empty((n_imgs,) + new_dims + img_shape[-1:],
+                       dtype=np.float32)
+        for ix, im in enumerate(imgs):
+            out[ix] = caffe.io.resize_image(im, new_dims)
+        return out
+
+    def resize_batch():
+        return caffe.io.resize_images(imgs, new_dims)
+
+    diff = np.abs(resize_loop() - resize_batch()).max()
+    print('        max diff: %.4f' % diff)
+    duration_loop = avg_running_time(resize_loop)
+    duration_batch = avg_running_time(resize_batch)
+    print('   avg. duration: resize_image: %.4f  resize_images: %.4f'
+          % (duration_loop, duration_batch))
+    print('         speedup: %.2f' % (duration_loop/duration_batch))
+
+
+def run():
+    np.random.seed(1)
+    # Configurations are given in the form (n_imgs, img_shape, new_dims)
+    configurations = [
+        (10, (500, 375, 3), (256, 256)),
+        (64, (300, 400, 3), (256, 256)),
+        (256, (64, 64, 3), (32, 32)),
+        (16, (256, 256, 1), (512, 512)),
+    ]
+    for conf in configurations:
+        benchmark_resize(*conf)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+from google.protobuf import text_format
+
+from caffe.proto import caffe_pb2
+import caffe.cost
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description='Estimate the FLOPs and memory of a net for a given '
+                    'input size.')
+    parser.add_argument('prototxt', help='Net definition file.')
+    parser.add_argument('--input-dim', default=None,
+                        help='Height,width of the net inputs; defaults to '
+                             'the input dimensions of the prototxt.')
+    parser.add_argument('--end', default=None,
+                        help='Last layer to include, e.g. the deepest layer '
+                             'used by StyleNet.')
+    parser.add_argument('--device-gflops', type=float, default=None,
+                        help='Sustained GFLOP/s of the device, to estimate '
+                             'the duration of a forward + backward pass.')
+    parser.add_argument('--draw', default=None,
+                        help='Draw the annotated net to this file.')
+    parser.add_argument('--rankdir', default='TB',
+                        help='Direction of the drawn graph layout.')
+    args = parser.parse_args()
+
+    net = caffe_pb2.NetParameter()
+    with open(args.prototxt) as f:
+        text_format.Merge(f.read(), net)
+    if len(net.layers):
+        net = caffe.cost.upgrade_v1_net(net)
+    if args.end is not None:
+        names = [layer.name for layer in net.layer]
+        del net.layer[names.index(args.end) + 1:]
+    input_hw = None
+    if args.input_dim is not None:
+        input_hw = [int(s) for s in args.input_dim.split(',')]
+
+    costs = caffe.cost.get_net_costs(net, input_hw=input_hw)
+    print(caffe.cost.format_cost_table(costs))
+    if args.device_gflops:
+        flops = 3 * sum(cost.flops for cost in costs)
+        print('estimated iteration time: %.3f s'
+              % (flops / (args.device_gflops * 1e9)))
+    if args.draw is not None:
+        # pydot is only needed for drawing
+        from caffe.draw import draw_net_to_file
+        draw_net_to_file(net, args.draw, args.rankdir, layer_costs=costs)
+
+
+if __name__ == '__main__':
+    run()